@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+Fixtures reproducibles para los benchmarks
+JPEG sintéticos deterministas (escena con fondo, siluetas y ruido de sensor,
+semilla fija), streams multipart como los de la ESP32-CAM, multitudes que se
+mueven entre frames y grabaciones reales del stream (fixtures/*.mjpeg)
+"""
+
+import glob
+import os
+import time
+
+import cv2
+import numpy as np
+import requests
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+BOUNDARY = b'--1234567890000000000009876543'
+
+# Resoluciones del OV2640 usadas en vuelo (ver quality_controller.QUALITY_LEVELS)
+SYNTHETIC_SIZES = {
+    'QVGA': (320, 240),
+    'CIF': (400, 296),
+    'VGA': (640, 480),
+    'SVGA': (800, 600),
+    'UXGA': (1600, 1200),
+}
+
+
+def synthetic_frame(width, height, people=3, seed=0):
+    """Escena determinista: degradado tipo terreno, siluetas de personas y ruido de sensor"""
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:height, 0:width].astype(np.float32)
+    frame = np.empty((height, width, 3), dtype=np.float32)
+    frame[..., 0] = 60 + 40 * xx / width
+    frame[..., 1] = 90 + 60 * yy / height
+    frame[..., 2] = 70 + 30 * np.sin(xx / 23.0) * np.cos(yy / 17.0)
+    for _ in range(people):
+        w = int(rng.integers(width // 20, width // 8))
+        h = int(w * rng.uniform(2.0, 3.0))
+        x = int(rng.integers(0, max(1, width - w)))
+        y = int(rng.integers(0, max(1, height - h)))
+        color = rng.integers(20, 230, 3).tolist()
+        cv2.rectangle(frame, (x, y + h // 5), (x + w, y + h), color, -1)
+        cv2.circle(frame, (x + w // 2, y + h // 10), max(2, w // 3), color, -1)
+    frame += rng.normal(0, 6, frame.shape)
+    return np.clip(frame, 0, 255).astype(np.uint8)
+
+
+def synthetic_jpeg(width, height, quality=14, people=3, seed=0):
+    """JPEG de la escena sintética; 'quality' en la escala del ESP32 (0-63, menor = mejor)"""
+    cv_quality = int(np.clip(100 - quality * 1.5, 10, 95))
+    ok, buf = cv2.imencode('.jpg', synthetic_frame(width, height, people, seed),
+                           [cv2.IMWRITE_JPEG_QUALITY, cv_quality])
+    if not ok:
+        raise RuntimeError("No se pudo codificar el JPEG sintético")
+    return buf.tobytes()
+
+
+def multipart_stream(jpegs, boundary=BOUNDARY):
+    """Bytes de un stream multipart/x-mixed-replace con los JPEG dados (formato CameraWebServer)"""
+    parts = []
+    for jpg in jpegs:
+        parts.append(boundary + b'\r\nContent-Type: image/jpeg\r\nContent-Length: '
+                     + str(len(jpg)).encode() + b'\r\n\r\n' + jpg + b'\r\n')
+    return b''.join(parts)
+
+
+def chunked(data, chunk_size):
+    """Divide 'data' en chunks como los entregaría iter_content"""
+    return [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+
+
+def crowd_sequence(n_people, n_frames=50, width=400, height=300, seed=0):
+    """
+    Detecciones ((x, y, w, h), conf) por frame de 'n_people' personas caminando,
+    con ruido de caja y alguna detección perdida (como la salida de YOLO)
+    """
+    rng = np.random.default_rng(seed)
+    sizes = rng.uniform(18, 40, (n_people, 1)) * np.array([1.0, 2.4])
+    pos = rng.uniform([0, 0], [width - 40, height - 96], (n_people, 2))
+    vel = rng.normal(0, 3, (n_people, 2))
+    frames = []
+    for _ in range(n_frames):
+        pos = np.clip(pos + vel, 0, [width - 40, height - 96])
+        noisy = pos + rng.normal(0, 1.5, pos.shape)
+        visible = rng.random(n_people) > 0.05
+        frames.append([((int(x), int(y), int(w), int(h)), float(c))
+                       for (x, y), (w, h), c, v in zip(noisy, sizes, rng.uniform(0.35, 0.95, n_people), visible) if v])
+    return frames
+
+
+def recorded_streams():
+    """Grabaciones reales en fixtures/*.mjpeg: {nombre: bytes}"""
+    streams = {}
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, '*.mjpeg'))):
+        with open(path, 'rb') as f:
+            streams[os.path.splitext(os.path.basename(path))[0]] = f.read()
+    return streams
+
+
+def record_stream(url, seconds=10.0, path=None, chunk_size=4096):
+    """Graba los bytes crudos del stream MJPEG durante 'seconds' en fixtures/ (retorna la ruta)"""
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    path = path or os.path.join(FIXTURES_DIR, time.strftime('esp32_%Y%m%d_%H%M%S.mjpeg'))
+    response = requests.get(url, stream=True, timeout=(10, 30))
+    total = 0
+    try:
+        with open(path, 'wb') as f:
+            start = time.time()
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                f.write(chunk)
+                total += len(chunk)
+                if time.time() - start >= seconds:
+                    break
+    finally:
+        response.close()
+    print(f"💾 {total / 1024:.0f} KB grabados en {path}")
+    return path
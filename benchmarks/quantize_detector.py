@@ -0,0 +1,431 @@
+# -*- coding: utf-8 -*-
+"""
+Cuantización INT8 estática del detector con ONNX Runtime, calibrada con frames de la ESP32
+1. Extrae los frames de las grabaciones (fixtures/*.mjpeg o carpetas con .jpg) y
+   separa por bloques temporales: calibración (primer 80% de cada grabación) y
+   validación (último 20%, frames que la calibración nunca vio)
+2. Exporta yolov8n.pt a ONNX con la entrada fija de camera_stream (TARGET_SIZE)
+3. Cuantiza a INT8 (QDQ, pesos por canal) dejando la cabeza Detect en FP32
+4. Reporta el mAP de personas (contra etiquetas YOLO si las hay, si no contra
+   las detecciones del FP32) y la latencia por frame de cada variante
+
+Uso:
+    python benchmarks/quantize_detector.py                        # fixtures/*.mjpeg -> models/yolov8n_int8.onnx + reporte
+    python benchmarks/quantize_detector.py --source vuelo1.mjpeg frames/ --labels etiquetas/
+    python benchmarks/quantize_detector.py --report-only          # re-evaluar los modelos ya generados
+
+Luego, en src/camera_stream.py: DETECTOR_BACKEND = "onnx_int8"
+"""
+
+import argparse
+import glob
+import json
+import os
+import shutil
+import sys
+import time
+
+import cv2
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, 'src'))
+
+import fixtures  # noqa: E402
+from jpeg_decoder import JPEGDecoder  # noqa: E402
+from mjpeg_stream import MJPEGDemuxer  # noqa: E402
+from run_benchmarks import TARGET_SIZE, DISPLAY_SIZE, MODEL_PATH, _git_commit, _machine  # noqa: E402
+
+try:
+    import onnx
+    import onnxruntime as ort
+    from onnxruntime.quantization import (CalibrationDataReader, CalibrationMethod, QuantFormat,
+                                          QuantType, quantize_static)
+except ImportError:
+    ort = None
+    CalibrationDataReader = object
+
+INT8_PATH = os.path.join(REPO_DIR, 'models', 'yolov8n_int8.onnx')
+PERSON_CLASS = 0
+CONF_THRESHOLD = 0.35      # Umbral de camera_stream (para las pseudo-etiquetas del FP32)
+EVAL_CONF = 0.001          # Umbral bajo para la curva precisión/recall (como ultralytics val)
+NMS_IOU = 0.7
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+
+
+# ===== Frames =====
+
+def load_recordings(sources):
+    """{nombre: [(clave, jpeg)]} desde archivos .mjpeg (demultiplexados) o carpetas con .jpg"""
+    recordings = {}
+    for source in sources:
+        if os.path.isdir(source):
+            paths = sorted(glob.glob(os.path.join(source, '*.jpg')) + glob.glob(os.path.join(source, '*.jpeg')))
+            frames = []
+            for path in paths:
+                with open(path, 'rb') as f:
+                    frames.append((os.path.splitext(os.path.basename(path))[0], f.read()))
+            if frames:
+                recordings[os.path.basename(os.path.normpath(source))] = frames
+        elif os.path.isfile(source):
+            name = os.path.splitext(os.path.basename(source))[0]
+            with open(source, 'rb') as f:
+                data = f.read()
+            demuxer = MJPEGDemuxer(fixtures.BOUNDARY, buffer_max=1 << 22, buffer_keep=1 << 21)
+            jpegs = []
+            for chunk in fixtures.chunked(data, 1 << 16):
+                jpegs.extend(demuxer.feed(chunk))
+            if jpegs:
+                recordings[name] = [(f"{name}_{i:05d}", jpg) for i, jpg in enumerate(jpegs)]
+        else:
+            print(f"⚠️  No existe: {source}")
+    return recordings
+
+
+def split_recordings(recordings, holdout=0.2):
+    """
+    Calibración = primer tramo de cada grabación, validación = último tramo. Frames consecutivos
+    son casi idénticos: intercalarlos filtraría la validación hacia la calibración
+    """
+    calibration, validation = [], []
+    for frames in recordings.values():
+        cut = int(round(len(frames) * (1 - holdout)))
+        cut = min(max(cut, 1), len(frames) - 1) if len(frames) > 1 else len(frames)
+        calibration.extend(frames[:cut])
+        validation.extend(frames[cut:])
+    return calibration, validation
+
+
+def preprocess(jpg, decoder):
+    """Mismo camino que camera_stream: decodificar, pantalla 400x300, TARGET_SIZE; retorna 1x3xHxW RGB 0-1"""
+    frame = decoder.decode(jpg)
+    if frame is None:
+        return None
+    display = cv2.resize(frame, DISPLAY_SIZE)
+    resized = cv2.resize(display, TARGET_SIZE, interpolation=cv2.INTER_AREA)
+    return np.ascontiguousarray(resized[:, :, ::-1].transpose(2, 0, 1)[None], dtype=np.float32) / 255.0
+
+
+def prepare(frames, decoder):
+    """[(clave, tensor)] omitiendo JPEG que no decodifican"""
+    prepared = []
+    for key, jpg in frames:
+        tensor = preprocess(jpg, decoder)
+        if tensor is not None:
+            prepared.append((key, tensor))
+    return prepared
+
+
+class FrameCalibrationReader(CalibrationDataReader):
+    """Entrega los frames de calibración a quantize_static (uno por llamada)"""
+
+    def __init__(self, input_name, tensors):
+        self.input_name = input_name
+        self.tensors = tensors
+        self._index = 0
+
+    def get_next(self):
+        if self._index >= len(self.tensors):
+            return None
+        tensor = self.tensors[self._index]
+        self._index += 1
+        return {self.input_name: tensor}
+
+    def rewind(self):
+        self._index = 0
+
+
+# ===== Modelos =====
+
+def export_onnx(model_path, output_path):
+    """yolov8n.pt -> ONNX con entrada fija (1, 3, alto, ancho) = TARGET_SIZE"""
+    from ultralytics import YOLO
+    exported = YOLO(model_path).export(format='onnx', imgsz=(TARGET_SIZE[1], TARGET_SIZE[0]),
+                                       dynamic=False, simplify=True, opset=17)
+    if os.path.abspath(exported) != os.path.abspath(output_path):
+        shutil.move(exported, output_path)
+    return output_path
+
+
+def head_nodes(model_path):
+    """Nodos de la cabeza Detect (último módulo '/model.N/'): la decodificación de cajas pierde mucho en INT8"""
+    model = onnx.load(model_path)
+    indices = {}
+    for node in model.graph.node:
+        parts = node.name.split('/')
+        if len(parts) > 2 and parts[1].startswith('model.') and parts[1][6:].isdigit():
+            indices.setdefault(int(parts[1][6:]), []).append(node.name)
+    return indices[max(indices)] if indices else []
+
+
+def quantize(fp32_path, int8_path, tensors, method='minmax', keep_head_fp32=True):
+    """Cuantización estática QDQ: activaciones uint8 calibradas con 'tensors', pesos int8 por canal"""
+    methods = {'minmax': CalibrationMethod.MinMax, 'entropy': CalibrationMethod.Entropy,
+               'percentile': CalibrationMethod.Percentile}
+    source = fp32_path
+    try:
+        # Inferencia de shapes + optimización previa recomendada por ONNX Runtime
+        from onnxruntime.quantization.shape_inference import quant_pre_process
+        source = fp32_path.replace('.onnx', '_prep.onnx')
+        quant_pre_process(fp32_path, source)
+    except Exception as e:
+        print(f"⚠️  Sin pre-procesamiento del grafo ({e}); se cuantiza el modelo exportado")
+        source = fp32_path
+    input_name = ort.InferenceSession(source, providers=['CPUExecutionProvider']).get_inputs()[0].name
+    excluded = head_nodes(source) if keep_head_fp32 else []
+    quantize_static(source, int8_path, FrameCalibrationReader(input_name, tensors),
+                    quant_format=QuantFormat.QDQ, per_channel=True,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8,
+                    calibrate_method=methods[method], nodes_to_exclude=excluded)
+    if source != fp32_path:
+        os.remove(source)
+    # Conservar los metadatos de ultralytics (clases, stride, imgsz) para cargarlo con YOLO(...)
+    original, quantized = onnx.load(fp32_path), onnx.load(int8_path)
+    del quantized.metadata_props[:]
+    quantized.metadata_props.extend(original.metadata_props)
+    onnx.save(quantized, int8_path)
+    return len(excluded)
+
+
+def session(path, threads=None):
+    options = ort.SessionOptions()
+    if threads:
+        options.intra_op_num_threads = threads
+    return ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+
+
+# ===== Evaluación =====
+
+def detect_persons(sess, tensor, conf=EVAL_CONF):
+    """Salida YOLOv8 (1, 4 + clases, N) -> cajas xyxy y scores de personas tras NMS"""
+    output = sess.run(None, {sess.get_inputs()[0].name: tensor})[0][0]
+    scores = output[4 + PERSON_CLASS]
+    keep = scores >= conf
+    if not keep.any():
+        return np.zeros((0, 4), dtype=np.float32), np.zeros(0, dtype=np.float32)
+    cx, cy, w, h = output[:4, keep]
+    scores = scores[keep]
+    boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+    indices = cv2.dnn.NMSBoxes(np.stack([boxes[:, 0], boxes[:, 1], w, h], axis=1).tolist(),
+                               scores.tolist(), conf, NMS_IOU)
+    indices = np.array(indices, dtype=np.int64).reshape(-1)
+    return boxes[indices].astype(np.float32), scores[indices].astype(np.float32)
+
+
+def load_labels(labels_dir, keys):
+    """Etiquetas YOLO (clase cx cy w h normalizados) de personas -> {clave: cajas xyxy en TARGET_SIZE}"""
+    width, height = TARGET_SIZE
+    labels = {}
+    for key in keys:
+        path = os.path.join(labels_dir, f"{key}.txt")
+        boxes = []
+        if os.path.exists(path):
+            for line in open(path, encoding='utf-8'):
+                values = line.split()
+                if len(values) >= 5 and int(float(values[0])) == PERSON_CLASS:
+                    cx, cy, w, h = (float(v) for v in values[1:5])
+                    boxes.append(((cx - w / 2) * width, (cy - h / 2) * height,
+                                  (cx + w / 2) * width, (cy + h / 2) * height))
+        labels[key] = np.array(boxes, dtype=np.float32).reshape(-1, 4)
+    return labels
+
+
+def box_iou(box, boxes):
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return inter / np.maximum(area + areas - inter, 1e-9)
+
+
+def average_precision(predictions, ground_truth, iou_threshold):
+    """AP (101 puntos, estilo COCO) de una clase; predictions/ground_truth: {clave: ...}"""
+    total_gt = sum(len(boxes) for boxes in ground_truth.values())
+    if total_gt == 0:
+        return float('nan')
+    ranked = sorted(((score, key, box) for key, (boxes, scores) in predictions.items()
+                     for box, score in zip(boxes, scores)), key=lambda item: -item[0])
+    matched = {key: np.zeros(len(boxes), dtype=bool) for key, boxes in ground_truth.items()}
+    hits = np.zeros(len(ranked))
+    for i, (_, key, box) in enumerate(ranked):
+        gt = ground_truth.get(key)
+        if gt is None or not len(gt):
+            continue
+        ious = box_iou(box, gt)
+        ious[matched[key]] = -1
+        best = int(np.argmax(ious))
+        if ious[best] >= iou_threshold:
+            matched[key][best] = True
+            hits[i] = 1
+    true_pos = np.cumsum(hits)
+    recall = true_pos / total_gt
+    precision = true_pos / np.arange(1, len(ranked) + 1)
+    # Envolvente de precisión decreciente y muestreo en 101 niveles de recall
+    precision = np.maximum.accumulate(precision[::-1])[::-1] if len(precision) else precision
+    sampled = []
+    for level in np.linspace(0, 1, 101):
+        index = np.searchsorted(recall, level, side='left')
+        sampled.append(precision[index] if index < len(precision) else 0.0)
+    return float(np.mean(sampled))
+
+
+def evaluate(sess, validation, ground_truth):
+    """mAP50 y mAP50-95 de personas + latencia de sess.run por frame (ms)"""
+    predictions = {}
+    times = []
+    tensor = validation[0][1]
+    for _ in range(5):  # Calentamiento
+        sess.run(None, {sess.get_inputs()[0].name: tensor})
+    for key, tensor in validation:
+        start = time.perf_counter()
+        predictions[key] = detect_persons(sess, tensor)
+        times.append((time.perf_counter() - start) * 1000)
+    aps = [average_precision(predictions, ground_truth, t) for t in IOU_THRESHOLDS]
+    return {
+        'map50': aps[0],
+        'map50_95': float(np.mean(aps)),
+        'latency_ms': {'median': float(np.median(times)), 'p90': float(np.percentile(times, 90)),
+                       'mean': float(np.mean(times))},
+    }
+
+
+def pipeline_latency(model_path, validation, **kwargs):
+    """Latencia por frame vía ultralytics (pre + inferencia + post), como la ve camera_stream"""
+    try:
+        from ultralytics import YOLO
+    except ImportError:
+        return None
+    model = YOLO(model_path, task='detect')
+    images = [np.ascontiguousarray((t[0].transpose(1, 2, 0)[:, :, ::-1] * 255).astype(np.uint8))
+              for _, t in validation]
+    for image in images[:5]:
+        model(image, verbose=False, **kwargs)
+    times = []
+    for image in images:
+        start = time.perf_counter()
+        model(image, verbose=False, **kwargs)
+        times.append((time.perf_counter() - start) * 1000)
+    return {'median': float(np.median(times)), 'p90': float(np.percentile(times, 90))}
+
+
+def print_report(report):
+    print("-" * 72)
+    print(f"📊 INT8 vs FP32 — {report['frames']['validation']} frames de validación "
+          f"(referencia: {report['reference']})")
+    print(f"{'Modelo':14s} {'mAP50':>8s} {'mAP50-95':>9s} {'p50 ms':>8s} {'p90 ms':>8s}")
+    for name in ('fp32', 'int8'):
+        r = report['models'][name]
+        print(f"{name:14s} {r['map50']:8.3f} {r['map50_95']:9.3f} "
+              f"{r['latency_ms']['median']:8.2f} {r['latency_ms']['p90']:8.2f}")
+    delta = report['delta']
+    print(f"📉 Caída de mAP50: {delta['map50']:+.3f} | mAP50-95: {delta['map50_95']:+.3f}")
+    print(f"⚡ Aceleración por frame: x{delta['speedup']:.2f} "
+          f"({delta['latency_saved_ms']:.2f} ms menos en la mediana)")
+    for name, latency in report.get('pipeline_ms', {}).items():
+        if latency:
+            print(f"🎬 Vía ultralytics ({name}): p50 {latency['median']:.2f} ms | p90 {latency['p90']:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cuantización INT8 del detector calibrada con frames de la ESP32")
+    parser.add_argument('--model', default=MODEL_PATH, help="Modelo PyTorch de partida (yolov8n.pt)")
+    parser.add_argument('--output', default=INT8_PATH, help="Modelo INT8 resultante (.onnx)")
+    parser.add_argument('--source', nargs='*', default=None,
+                        help="Grabaciones .mjpeg o carpetas con .jpg (por defecto benchmarks/fixtures/*.mjpeg)")
+    parser.add_argument('--labels', default=None,
+                        help="Carpeta con etiquetas YOLO <frame>.txt; sin ella la referencia es el modelo FP32")
+    parser.add_argument('--holdout', type=float, default=0.2, help="Fracción final de cada grabación para validar")
+    parser.add_argument('--max-calib', type=int, default=300, help="Máximo de frames de calibración")
+    parser.add_argument('--calibration', choices=('minmax', 'entropy', 'percentile'), default='minmax')
+    parser.add_argument('--quantize-head', action='store_true', help="Cuantizar también la cabeza Detect")
+    parser.add_argument('--threads', type=int, default=None, help="Hilos de ONNX Runtime (por defecto todos)")
+    parser.add_argument('--report-only', action='store_true', help="No exportar ni cuantizar; solo evaluar")
+    args = parser.parse_args()
+
+    if ort is None:
+        print("❌ Requiere onnx y onnxruntime (pip install onnx onnxruntime)")
+        return 1
+    sources = args.source or sorted(glob.glob(os.path.join(fixtures.FIXTURES_DIR, '*.mjpeg')))
+    recordings = load_recordings(sources)
+    if not recordings:
+        print("❌ No hay frames. Grabar el stream real con:")
+        print("   python benchmarks/run_benchmarks.py --record http://IP:81/stream --seconds 60")
+        return 1
+    calibration, validation = split_recordings(recordings, args.holdout)
+    decoder = JPEGDecoder(target_size=DISPLAY_SIZE, reuse_buffer=False)
+    step = max(1, len(calibration) // args.max_calib)
+    calibration = prepare(calibration[::step][:args.max_calib], decoder)
+    validation = prepare(validation, decoder)
+    if not calibration or not validation:
+        print("❌ Frames insuficientes para calibrar y validar")
+        return 1
+    print(f"🎞️  {len(recordings)} grabaciones: {len(calibration)} frames de calibración, "
+          f"{len(validation)} de validación")
+
+    fp32_path = args.output.replace('.onnx', '') + '_fp32.onnx'
+    if not args.report_only:
+        print(f"📦 Exportando {args.model} a ONNX ({TARGET_SIZE[0]}x{TARGET_SIZE[1]})...")
+        export_onnx(args.model, fp32_path)
+        print(f"🔧 Cuantizando a INT8 (calibración {args.calibration})...")
+        excluded = quantize(fp32_path, args.output, [t for _, t in calibration], args.calibration,
+                            keep_head_fp32=not args.quantize_head)
+        print(f"💾 {args.output} ({os.path.getsize(args.output) / 1e6:.1f} MB, "
+              f"{excluded} nodos de la cabeza en FP32)")
+    for path in (fp32_path, args.output):
+        if not os.path.exists(path):
+            print(f"❌ No existe {path}")
+            return 1
+
+    fp32 = session(fp32_path, args.threads)
+    int8 = session(args.output, args.threads)
+    keys = [key for key, _ in validation]
+    if args.labels:
+        ground_truth = load_labels(args.labels, keys)
+        reference = f"etiquetas de {args.labels}"
+    else:
+        # Sin etiquetas: las detecciones del FP32 al umbral de camera_stream son la referencia
+        ground_truth = {key: detect_persons(fp32, tensor, CONF_THRESHOLD)[0] for key, tensor in validation}
+        reference = f"detecciones FP32 (conf >= {CONF_THRESHOLD})"
+    if not sum(len(boxes) for boxes in ground_truth.values()):
+        print("⚠️  No hay personas en los frames de validación: el mAP no es calculable (solo latencia)")
+
+    results = {'fp32': evaluate(fp32, validation, ground_truth), 'int8': evaluate(int8, validation, ground_truth)}
+    fp32_ms = results['fp32']['latency_ms']['median']
+    int8_ms = results['int8']['latency_ms']['median']
+    report = {
+        'commit': _git_commit(),
+        'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'machine': _machine(),
+        'onnxruntime': ort.__version__,
+        'input_size': list(TARGET_SIZE),
+        'calibration_method': args.calibration,
+        'head_fp32': not args.quantize_head,
+        'sources': list(recordings),
+        'frames': {'calibration': len(calibration), 'validation': len(validation)},
+        'reference': reference,
+        'models': results,
+        'delta': {
+            'map50': results['int8']['map50'] - results['fp32']['map50'],
+            'map50_95': results['int8']['map50_95'] - results['fp32']['map50_95'],
+            'speedup': fp32_ms / int8_ms if int8_ms else 0.0,
+            'latency_saved_ms': fp32_ms - int8_ms,
+        },
+        'pipeline_ms': {
+            'pytorch_fp32': pipeline_latency(args.model, validation, device='cpu') if os.path.exists(args.model) else None,
+            'onnx_int8': pipeline_latency(args.output, validation, device='cpu', imgsz=(TARGET_SIZE[1], TARGET_SIZE[0])),
+        },
+    }
+    print_report(report)
+    report_path = args.output.replace('.onnx', '') + '_report.json'
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"💾 Reporte guardado en {report_path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,392 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks de los caminos calientes de camera_stream.py
+Demultiplexado MJPEG, cv2.imdecode + resize, preprocesamiento CPU/GPU,
+inferencia YOLO a TARGET_SIZE, DetectionTracker.update con distintas
+multitudes, conteo por zonas/líneas y dibujo del canvas, sobre fixtures sintéticos deterministas y
+grabaciones reales (fixtures/*.mjpeg).
+Cada corrida se guarda en results/<fecha>_<commit>.json y se compara con la
+anterior para que las regresiones entre commits queden a la vista
+
+Uso:
+    python benchmarks/run_benchmarks.py                    # todo; guarda y compara con la corrida previa
+    python benchmarks/run_benchmarks.py -k tracker         # solo casos cuyo nombre contenga 'tracker'
+    python benchmarks/run_benchmarks.py --compare A.json B.json
+    python benchmarks/run_benchmarks.py --record http://IP:81/stream --seconds 10
+"""
+
+import argparse
+import glob
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import timeit
+import tracemalloc
+
+import cv2
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+sys.path.insert(0, os.path.join(REPO_DIR, 'src'))
+
+import fixtures  # noqa: E402
+from appearance import AppearanceEncoder  # noqa: E402
+from canvas_render import CanvasLayout, draw_detections  # noqa: E402
+from detection_tracker import DetectionTracker  # noqa: E402
+from gpu_preprocess import CUDAPreprocessor  # noqa: E402
+from jpeg_decoder import JPEGDecoder  # noqa: E402
+from mjpeg_stream import MJPEGDemuxer  # noqa: E402
+from reid_store import ReIDStore  # noqa: E402
+from zones import ZoneCounter  # noqa: E402
+
+# Mismos valores que camera_stream.py (importarlo cargaría torch y el modelo)
+TARGET_SIZE = (384, 288)
+DISPLAY_SIZE = (400, 300)
+MODEL_PATH = os.path.join(REPO_DIR, 'models', 'yolov8n.pt')
+CHUNK_SIZE = 4096
+CROWD_SIZES = (1, 5, 20, 50)
+
+
+# ===== Casos =====
+# Cada generador produce (nombre, función sin argumentos, ítems por llamada, parámetros)
+# o (nombre, None, 0, {'skipped': motivo}) si el caso no puede correr aquí
+
+def _streams():
+    """Stream sintético (CIF, 30 frames distintos) + grabaciones reales"""
+    jpegs = [fixtures.synthetic_jpeg(400, 296, seed=i) for i in range(30)]
+    streams = {'synthetic_CIF': fixtures.multipart_stream(jpegs)}
+    streams.update(fixtures.recorded_streams())
+    return streams
+
+
+def _frames_of(stream):
+    demuxer = MJPEGDemuxer(fixtures.BOUNDARY, buffer_max=1 << 22, buffer_keep=1 << 21)
+    return demuxer.feed(stream)
+
+
+def bench_demux():
+    for name, data in _streams().items():
+        chunks = fixtures.chunked(data, CHUNK_SIZE)
+        n_frames = len(_frames_of(data))
+
+        def run(chunks=chunks):
+            demuxer = MJPEGDemuxer(fixtures.BOUNDARY)
+            for chunk in chunks:
+                demuxer.feed(chunk)
+
+        yield f"demux[{name}]", run, n_frames, {'chunk_size': CHUNK_SIZE, 'bytes': len(data)}
+
+
+def bench_decode_resize():
+    inputs = {size: [fixtures.synthetic_jpeg(w, h)] for size, (w, h) in fixtures.SYNTHETIC_SIZES.items()}
+    for name, data in fixtures.recorded_streams().items():
+        inputs[name] = _frames_of(data)[:30]
+    for name, jpegs in inputs.items():
+        if not jpegs:
+            continue
+
+        def run(jpegs=jpegs):
+            # Igual que el bucle de camera_stream: decodificar, escalar a pantalla y a TARGET_SIZE
+            for jpg in jpegs:
+                frame = cv2.imdecode(np.frombuffer(jpg, dtype=np.uint8), cv2.IMREAD_COLOR)
+                display = cv2.resize(frame, DISPLAY_SIZE)
+                cv2.resize(display, TARGET_SIZE, interpolation=cv2.INTER_AREA)
+
+        yield f"decode_resize[{name}]", run, len(jpegs), {'jpeg_bytes': int(np.mean([len(j) for j in jpegs]))}
+
+
+def _alloc_peak(func, calls=10):
+    """Bytes nuevos reservados por llamada (pico sobre lo ya reservado, con tracemalloc)"""
+    func()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    for _ in range(calls):
+        func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return max(0, peak - base)
+
+
+def bench_decoder():
+    """cv2.imdecode completo vs JPEGDecoder (escalado DCT) por backend, con bytes reservados por frame"""
+    for size, (w, h) in fixtures.SYNTHETIC_SIZES.items():
+        jpg = fixtures.synthetic_jpeg(w, h)
+        turbo = JPEGDecoder(target_size=DISPLAY_SIZE)
+        variants = {
+            'opencv_full': lambda jpg: cv2.imdecode(np.frombuffer(jpg, dtype=np.uint8), cv2.IMREAD_COLOR),
+            'opencv_scaled': JPEGDecoder(target_size=DISPLAY_SIZE, prefer_turbojpeg=False).decode,
+            'turbojpeg_scaled': turbo.decode if turbo.backend == 'turbojpeg' else None,
+        }
+        for variant, decode in variants.items():
+            name = f"decode[{size},{variant}]"
+            if decode is None:
+                yield name, None, 0, {'skipped': 'PyTurboJPEG/libturbojpeg no disponible'}
+                continue
+
+            def run(decode=decode, jpg=jpg):
+                return decode(jpg)
+
+            out = run()
+            yield name, run, 1, {'output': f"{out.shape[1]}x{out.shape[0]}", 'alloc_bytes_per_frame': _alloc_peak(run)}
+
+
+def bench_preprocess():
+    """Entrada de YOLO: resize en CPU (NumPy) vs subida pinned + preprocesamiento en GPU (incluye sincronizar)"""
+    for size in ('CIF', 'VGA'):
+        frame = fixtures.synthetic_frame(*fixtures.SYNTHETIC_SIZES[size])
+        yield (f"preprocess[{size},cpu]",
+               lambda frame=frame: cv2.resize(frame, TARGET_SIZE, interpolation=cv2.INTER_AREA), 1, {})
+        gpu = CUDAPreprocessor(TARGET_SIZE)
+        if not gpu.enabled:
+            yield f"preprocess[{size},cuda]", None, 0, {'skipped': 'torch con CUDA no disponible'}
+            continue
+
+        def run(gpu=gpu, frame=frame):
+            tensor = gpu.tensor(gpu.submit(frame))
+            tensor.cpu()  # Esperar a la GPU para medir el camino completo
+
+        yield f"preprocess[{size},cuda]", run, 1, {'backend': gpu.backend}
+
+
+def bench_yolo():
+    name = f"yolo[{TARGET_SIZE[0]}x{TARGET_SIZE[1]}]"
+    try:
+        from ultralytics import YOLO
+    except ImportError:
+        yield name, None, 0, {'skipped': 'ultralytics no instalado'}
+        return
+    if not os.path.exists(MODEL_PATH):
+        yield name, None, 0, {'skipped': f'modelo no encontrado: {MODEL_PATH}'}
+        return
+    model = YOLO(MODEL_PATH)
+    frame = cv2.resize(fixtures.synthetic_frame(*DISPLAY_SIZE, people=5), TARGET_SIZE, interpolation=cv2.INTER_AREA)
+    model(frame, verbose=False)  # Calentamiento (carga de pesos, kernels CUDA)
+    device = str(next(model.model.parameters()).device) if hasattr(model, 'model') else 'desconocido'
+    yield name, lambda: model(frame, verbose=False), 1, {'device': device}
+
+
+def bench_tracker():
+    frame = fixtures.synthetic_frame(*DISPLAY_SIZE, people=0)
+    for n_people in CROWD_SIZES:
+        sequence = fixtures.crowd_sequence(n_people, n_frames=50, width=DISPLAY_SIZE[0], height=DISPLAY_SIZE[1])
+        for appearance in (False, True):
+
+            def run(sequence=sequence, appearance=appearance):
+                # Misma configuración que camera_stream (con apariencia y re-identificación) o solo distancia
+                tracker = DetectionTracker(reid_store=ReIDStore() if appearance else None,
+                                           appearance_encoder=AppearanceEncoder() if appearance else None,
+                                           appearance_weight=0.5 if appearance else 0.0)
+                for detections in sequence:
+                    tracker.update(detections, frame=frame)
+                    tracker.get_smoothed_detections()
+
+            variant = 'apariencia' if appearance else 'distancia'
+            yield f"tracker_update[{n_people}p,{variant}]", run, len(sequence), {'people': n_people}
+
+
+def bench_zones():
+    width, height = DISPLAY_SIZE
+    rng = np.random.default_rng(0)
+    for n_zones in (1, 4, 16):
+        # Polígonos de 6 vértices repartidos en el cuadro + una línea por zona
+        centers = rng.uniform((40, 40), (width - 40, height - 40), (n_zones, 2))
+        angles = np.linspace(0, 2 * np.pi, 6, endpoint=False)
+        zones = {f"z{i}": [tuple(c + 35 * np.array([np.cos(a), np.sin(a)])) for a in angles] for i, c in enumerate(centers)}
+        lines = {f"l{i}": (tuple(c - (40, 0)), tuple(c + (40, 0))) for i, c in enumerate(centers)}
+        for n_people in CROWD_SIZES:
+            steps = [rng.uniform((0, 0), (width, height), (n_people, 2))]
+            for _ in range(49):
+                steps.append(steps[-1] + rng.normal(0, 4, (n_people, 2)))
+            ids = np.arange(n_people)
+
+            def run(zones=zones, lines=lines, steps=steps, ids=ids):
+                counter = ZoneCounter(zones, lines)
+                for points in steps:
+                    counter.update(ids, points)
+
+            yield f"zones[{n_people}p,{n_zones}z]", run, len(steps), {'people': n_people, 'zones': n_zones}
+
+
+def bench_render():
+    frame = fixtures.synthetic_frame(*DISPLAY_SIZE)
+    layout = CanvasLayout(*DISPLAY_SIZE)
+    for n_people in (0,) + CROWD_SIZES:
+        detections = fixtures.crowd_sequence(n_people, n_frames=1, width=DISPLAY_SIZE[0], height=DISPLAY_SIZE[1])[0] if n_people else []
+
+        def run(detections=detections):
+            processed = frame.copy()
+            raw = frame.copy()
+            draw_detections(processed, detections)
+            layout.compose(processed, raw, 300)
+
+        yield f"render[{n_people}p]", run, 1, {'people': n_people}
+
+
+SUITES = (bench_demux, bench_decode_resize, bench_decoder, bench_preprocess, bench_yolo, bench_tracker, bench_zones, bench_render)
+
+
+# ===== Medición =====
+
+def measure(func, repeat=7, min_round_sec=0.1):
+    """Tiempos por llamada (s): 'number' llamadas por ronda calibradas a ~min_round_sec, 'repeat' rondas"""
+    timer = timeit.Timer(func)
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_round_sec or number >= 1 << 20:
+            break
+        number *= 2 if elapsed <= 0 else max(2, min(10, int(min_round_sec / elapsed) + 1))
+    rounds = [t / number for t in timer.repeat(repeat, number)]
+    return {
+        'median_s': statistics.median(rounds),
+        'min_s': min(rounds),
+        'mean_s': statistics.fmean(rounds),
+        'stdev_s': statistics.pstdev(rounds),
+        'number': number,
+        'repeat': repeat,
+    }
+
+
+def _git_commit():
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                                         stderr=subprocess.DEVNULL, text=True).strip()
+        dirty = subprocess.call(['git', 'diff', '--quiet', 'HEAD', '--', 'src', 'benchmarks'], cwd=REPO_DIR,
+                                stderr=subprocess.DEVNULL)
+        return commit + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return 'desconocido'
+
+
+def _machine():
+    info = {
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+        'opencv_threads': cv2.getNumThreads(),
+    }
+    try:
+        import torch
+        info['torch'] = torch.__version__
+        info['cuda'] = torch.cuda.get_device_name(0) if torch.cuda.is_available() else None
+    except ImportError:
+        pass
+    return info
+
+
+def _format_time(seconds):
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:8.2f} ms"
+    return f"{seconds * 1e6:8.1f} µs"
+
+
+def run_suite(keyword=None, repeat=7):
+    results = {}
+    for suite in SUITES:
+        for name, func, items, params in suite():
+            if keyword and keyword not in name:
+                continue
+            if func is None:
+                print(f"⏭️  {name:40s} omitido: {params['skipped']}")
+                results[name] = dict(params)
+                continue
+            stats = measure(func, repeat=repeat)
+            stats['items'] = items
+            # Tiempo por ítem (frame, update...): comparable entre fixtures de distinto largo
+            stats['per_item_s'] = stats['median_s'] / items if items else stats['median_s']
+            stats.update(params)
+            results[name] = stats
+            print(f"⏱️  {name:40s} {_format_time(stats['per_item_s'])} por ítem "
+                  f"(±{100 * stats['stdev_s'] / stats['mean_s']:.1f}%, {items} ítems)")
+    return results
+
+
+def save_results(results, path=None):
+    commit = _git_commit()
+    document = {
+        'commit': commit,
+        'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'machine': _machine(),
+        'benchmarks': results,
+    }
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = path or os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d_%H%M%S')}_{commit}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(document, f, indent=2, ensure_ascii=False)
+    print(f"💾 Resultados guardados en {path}")
+    return path
+
+
+def compare(old_path, new_path, threshold=0.10):
+    """Tabla de cambios por caso (tiempo por ítem); retorna la lista de regresiones"""
+    with open(old_path, encoding='utf-8') as f:
+        old = json.load(f)
+    with open(new_path, encoding='utf-8') as f:
+        new = json.load(f)
+    print(f"\n📊 {old['commit']} ({old['date']}) -> {new['commit']} ({new['date']})")
+    if old.get('machine', {}).get('platform') != new.get('machine', {}).get('platform'):
+        print("⚠️  Corridas de máquinas distintas: los tiempos no son comparables directamente")
+    regressions = []
+    for name, after in new['benchmarks'].items():
+        before = old['benchmarks'].get(name)
+        if not before or 'per_item_s' not in before or 'per_item_s' not in after:
+            continue
+        ratio = after['per_item_s'] / before['per_item_s']
+        # Un cambio dentro del ruido medido de ambas corridas no cuenta
+        noise = max(threshold, 2 * (before['stdev_s'] / before['mean_s'] + after['stdev_s'] / after['mean_s']))
+        if ratio > 1 + noise:
+            mark = '🔴'
+            regressions.append((name, ratio))
+        elif ratio < 1 - noise:
+            mark = '🟢'
+        else:
+            mark = '  '
+        print(f"{mark} {name:40s} {_format_time(before['per_item_s'])} -> {_format_time(after['per_item_s'])} "
+              f"({(ratio - 1) * 100:+.1f}%)")
+    if regressions:
+        print(f"\n🔴 {len(regressions)} regresión(es) sobre {threshold * 100:.0f}%")
+    return regressions
+
+
+def latest_result(exclude=None):
+    paths = sorted(p for p in glob.glob(os.path.join(RESULTS_DIR, '*.json')) if p != exclude)
+    return paths[-1] if paths else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de los caminos calientes de camera_stream")
+    parser.add_argument('-k', dest='keyword', help="Solo casos cuyo nombre contenga este texto")
+    parser.add_argument('--repeat', type=int, default=7, help="Rondas por caso (default: 7)")
+    parser.add_argument('--output', help="Ruta del JSON de resultados (default: results/<fecha>_<commit>.json)")
+    parser.add_argument('--compare', nargs=2, metavar=('ANTERIOR', 'NUEVO'), help="Comparar dos resultados y salir")
+    parser.add_argument('--threshold', type=float, default=0.10, help="Cambio relativo considerado regresión (default: 0.10)")
+    parser.add_argument('--fail-on-regression', action='store_true', help="Código de salida 1 si hay regresiones")
+    parser.add_argument('--record', metavar='URL', help="Grabar el stream en fixtures/ y salir")
+    parser.add_argument('--seconds', type=float, default=10.0, help="Duración de la grabación (default: 10)")
+    args = parser.parse_args()
+
+    if args.record:
+        fixtures.record_stream(args.record, args.seconds)
+        return 0
+    if args.compare:
+        regressions = compare(*args.compare, threshold=args.threshold)
+        return 1 if regressions and args.fail_on_regression else 0
+
+    cv2.setRNGSeed(0)
+    previous = latest_result()
+    path = save_results(run_suite(args.keyword, args.repeat), args.output)
+    regressions = compare(previous, path, args.threshold) if previous and previous != path else []
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
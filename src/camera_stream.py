@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*- 
 # camera_stream.py
+import json
 import os
+import signal
 import sys
 
 # Configurar variables de entorno ANTES de importar torch/ultralytics
@@ -20,19 +22,65 @@ import requests
 from requests.exceptions import RequestException
 import torch
 from ultralytics import YOLO
+import threading
 import time
 from datetime import datetime
+from geo_projection import GeoProjector
+from mjpeg_stream import MJPEGDemuxer, CORRUPTION_TYPES
+from network_tuner import NetworkAutoTuner
+from quality_controller import QualityController, control_url_from_stream, network_latency_ms
+from reid_store import ReIDStore
+from appearance import AppearanceEncoder
+from detection_tracker import DetectionTracker
+from canvas_render import CanvasLayout, FONT, COLOR_TITULO, COLOR_TEXTO, draw_detections, draw_zones
+from frame_trace import (FrameTracer, JPEG_COMPLETE, DEQUEUED, DECODED, PREPROCESSED,
+                         INFERENCE_START, INFERENCE_END, TRACKED, DISPLAYED)
+from metrics import MetricsRegistry, start_metrics_server
+from sampling_profiler import SamplingProfiler
+from mjpeg_server import MJPEGRestreamServer
+from jpeg_decoder import JPEGDecoder
+from lazy_frames import LatestFrameQueue
+from gpu_preprocess import CUDAPreprocessor
+from face_fallback import FaceFallbackWorker
+from track_events import TrackEventBus, EVENT_TYPES, start_consumer
+from zones import ZoneCounter, DIRECTIONS
 
 # Configuración de detección (ajustada para mayor sensibilidad)
-CONFIDENCE_THRESHOLD = 0.35  # Umbral base de confianza para detecciones
+CONFIDENCE_THRESHOLD = 0.35  # Confianza mínima para crear (y confirmar) un track
+TRACK_LOW_THRESHOLD = 0.15   # Confianza mínima para sostener un track ya confirmado (asociación en dos etapas)
+TRACK_CONFIRM_HITS = 3       # Asociaciones con confianza alta para confirmar un track nuevo
 MIN_BOX_AREA = 400          # Área mínima de caja para filtrar ruido
 MAX_BOX_AREA = 500000       # Área máxima aceptada
-MAX_NO_DETECT_FRAMES = 10   # Frames consecutivos sin detectar para bajar conf adaptativamente
+MAX_NO_DETECT_FRAMES = 10   # Frames consecutivos sin detectar para activar el fallback de rostro
 MAX_FRAMES_HISTORY = 5      # Número de frames para promediar
 # PROCESS_EVERY_N_FRAMES se configura dinámicamente según la red (ver más abajo)
 TARGET_SIZE = (384, 288)    # Tamaño para procesamiento YOLO
 FACE_FALLBACK_ENABLED = True  # Activar fallback de detección de rostro si no hay persona
 FACE_FALLBACK_COOLDOWN = 5    # Intentar fallback cada N frames cuando corresponda
+FACE_FALLBACK_BUDGET_MS = 15   # Presupuesto por búsqueda (hilo aparte, solo alrededor de tracks perdidos)
+FACE_FALLBACK_LOST_SEC = 3.0   # Buscar donde se perdieron personas hace menos de N segundos
+GEO_PROJECTION_ENABLED = True  # Proyectar detecciones a lat/lon cuando haya telemetría
+CAMERA_HFOV_DEG = 66.0         # Campo de visión horizontal del OV2640 (lente estándar)
+REID_ENABLED = True            # Re-identificar personas que salen y vuelven a entrar al cuadro
+APPEARANCE_MATCHING_ENABLED = True  # Usar apariencia (HSV) además de distancia al asociar tracks
+APPEARANCE_WEIGHT = 0.5        # Peso de la distancia coseno en el costo de asignación
+EMBEDDING_REFRESH = 5          # Recalcular embedding de cada track cada N frames
+FRAME_TRACE_ENABLED = True     # Trazas de latencia por etapa (desglose en el panel, tecla 't' exporta)
+FRAME_TRACE_EXPORT_PATH = None # Ej: 'frame_trace.json' para exportar al salir (Chrome trace-event)
+METRICS_ENABLED = True         # Exponer métricas Prometheus en http://127.0.0.1:METRICS_PORT/metrics
+METRICS_PORT = 9108
+PROFILER_DURATION_SEC = 10     # Tecla 'p' (o SIGUSR1 sin ventana) perfila N s y guarda profile_*.folded
+PROFILER_INTERVAL_MS = 5       # Intervalo de muestreo de pilas
+RESTREAM_ENABLED = False       # Retransmitir el canvas anotado en http://<esta-PC>:RESTREAM_PORT/stream
+RESTREAM_PORT = 8090
+RESTREAM_QUALITY = 80          # Calidad JPEG de la retransmisión (0-100)
+GPU_PREPROCESS_ENABLED = True  # En CUDA: subir el frame vía memoria pinned y preprocesar en la GPU
+DETECTOR_BACKEND = "pytorch"   # "pytorch" (yolov8n.pt, FP16 en CUDA) u "onnx_int8" (CPU; ver benchmarks/quantize_detector.py)
+INT8_MODEL_PATH = '../models/yolov8n_int8.onnx'
+# Conteo por área en coordenadas del video mostrado (400x300); vacíos = desactivado
+COUNT_ZONES = {}               # Ej: {'aterrizaje': [(150, 100), (250, 100), (250, 200), (150, 200)]}
+COUNT_LINES = {}               # Ej: {'perimetro': ((0, 250), (400, 250))}; 'in' = de izquierda a derecha mirando de A a B
+TRACK_EVENTS_LOG = None        # Ej: 'track_events.jsonl' para guardar nacimientos/pérdidas/permanencia de cada track
 
 # Verificar disponibilidad de CUDA
 print("PyTorch versión:", torch.__version__)
@@ -84,6 +132,14 @@ elif USE_NETWORK == "PUCP":
 else:
     raise ValueError(f"Red desconocida: {USE_NETWORK}")
 
+# Auto-ajuste: los valores de arriba solo son el punto de partida; en ejecución se miden
+# RTT, throughput y jitter y se ajustan chunk/buffer/skip/timeouts (perfil guardado por URL)
+NETWORK_AUTOTUNE = True
+
+# Control de calidad: bajar/subir resolución y calidad JPEG de la ESP32 (vía /control) según latencia
+QUALITY_CONTROL_ENABLED = True
+QUALITY_START_LEVEL = 3  # Índice en quality_controller.QUALITY_LEVELS (3 = CIF q14)
+
 print(f"[CONFIG] Red seleccionada: {USE_NETWORK}")
 print(f"[CONFIG] URL: {ESP32_URL_PROCESSED}")
 print(f"[CONFIG] Chunk size: {CHUNK_SIZE} bytes")
@@ -93,15 +149,26 @@ print(f"[CONFIG] Procesar 1 de cada {PROCESS_SKIP} frames")
 BOUNDARY = b'--1234567890000000000009876543'
 
 # Cargar y configurar modelo YOLO
-model = YOLO('../models/yolov8n.pt')  # Modelo pequeño y rápido
-model.to(device)
-if torch.cuda.is_available():
-    model.fuse()  # Fusionar capas para mejor rendimiento en GPU
+DETECTOR_KWARGS = {}  # Argumentos extra de inferencia según el backend
+if DETECTOR_BACKEND == "onnx_int8" and os.path.exists(INT8_MODEL_PATH):
+    # Modelo INT8 cuantizado con ONNX Runtime (CPU); entrada fija = TARGET_SIZE (alto, ancho)
+    model = YOLO(INT8_MODEL_PATH, task='detect')
+    device = "cpu"
+    DETECTOR_KWARGS = {'imgsz': (TARGET_SIZE[1], TARGET_SIZE[0]), 'device': 'cpu'}
+    print(f"[CONFIG] Detector: INT8 ONNX ({INT8_MODEL_PATH})")
+else:
+    if DETECTOR_BACKEND == "onnx_int8":
+        print(f"[WARN] No existe {INT8_MODEL_PATH} (generarlo con benchmarks/quantize_detector.py); usando yolov8n.pt")
+    DETECTOR_BACKEND = "pytorch"
+    model = YOLO('../models/yolov8n.pt')  # Modelo pequeño y rápido
+    model.to(device)
+    if torch.cuda.is_available():
+        model.fuse()  # Fusionar capas para mejor rendimiento en GPU
 
 # Intentar usar FP16 en CUDA
 USE_FP16 = False
 try:
-    if device == "cuda" and hasattr(model, 'model'):
+    if DETECTOR_BACKEND == "pytorch" and device == "cuda" and hasattr(model, 'model'):
         model.model.half()
         USE_FP16 = True
 except Exception:
@@ -115,6 +182,10 @@ try:
 except Exception:
     pass
 
+# Preprocesamiento para YOLO en GPU (resize, RGB, 0-1, FP16); en máquinas sin CUDA queda inactivo
+gpu_preprocessor = CUDAPreprocessor(TARGET_SIZE, device=device if GPU_PREPROCESS_ENABLED else 'cpu', half=USE_FP16)
+print(f"[CONFIG] Preprocesamiento YOLO: {gpu_preprocessor.backend}")
+
 # Cargador de detección de rostro (fallback)
 FACE_CASCADE = None
 try:
@@ -123,203 +194,85 @@ try:
         FACE_CASCADE = cv2.CascadeClassifier(cascade_path)
 except Exception:
     FACE_CASCADE = None
+face_worker = None
+if FACE_FALLBACK_ENABLED and FACE_CASCADE is not None:
+    face_worker = FaceFallbackWorker(FACE_CASCADE, time_budget_ms=FACE_FALLBACK_BUDGET_MS)
 
 
-# --- Simple Centroid Tracker for Unique Person Counting ---
-import math
-class DetectionTracker:
-    def __init__(self, max_history=MAX_FRAMES_HISTORY, max_lost=8, dist_thresh=200):
-        # dist_thresh: distancia máxima (en píxeles) para considerar que una detección es la misma persona entre frames.
-        self.max_history = max_history
-        self.detection_history = []
-        self.last_count = 0
-        self.frame_latency_history = []
-        self.rtt_history = []
-        self.last_frame_time = time.time()
-        self.last_request_time = time.time()
-        self.start_time = time.time()
-        self.frame_count = 0
-        self.last_fps_update = time.time()
-        self.current_fps = 0
-        # Tracker state
-        self.next_id = 1
-        self.tracks = {}  # id: {'centroid': (x, y), 'box': (x, y, w, h), 'conf': float, 'lost': 0}
-        self.max_lost = max_lost  # Frames máximos sin detección antes de eliminar (balance entre estabilidad y reactividad)
-        self.dist_thresh = dist_thresh  # Distancia aumentada para tracking más robusto
-        self.unique_ids = set()
-        # Suavizado de métricas (ventana más grande para estabilidad)
-        self.latency_window_size = 30  # 30 frames para latencia
-        self.rtt_window_size = 30      # 30 frames para RTT
-        # Suavizado de cajas de detección (alpha para EMA - Exponential Moving Average)
-        self.box_smoothing_alpha = 0.4  # 0.4 = buen balance entre suavizado y reactividad
-
-    def _centroid(self, box):
-        x, y, w, h = box
-        return (x + w // 2, y + h // 2)
-    
-    def _iou(self, box1, box2):
-        """Calcular Intersection over Union entre dos cajas"""
-        x1, y1, w1, h1 = box1
-        x2, y2, w2, h2 = box2
-        
-        # Calcular coordenadas de intersección
-        x_left = max(x1, x2)
-        y_top = max(y1, y2)
-        x_right = min(x1 + w1, x2 + w2)
-        y_bottom = min(y1 + h1, y2 + h2)
-        
-        if x_right < x_left or y_bottom < y_top:
-            return 0.0
-        
-        # Área de intersección
-        intersection_area = (x_right - x_left) * (y_bottom - y_top)
-        
-        # Área de cada caja
-        box1_area = w1 * h1
-        box2_area = w2 * h2
-        
-        # IoU
-        iou = intersection_area / float(box1_area + box2_area - intersection_area + 1e-6)
-        return iou
-    
-    def update(self, current_detections, is_new_frame=True):
-        current_time = time.time()
-        if is_new_frame:
-            self.frame_count += 1
-            time_elapsed = current_time - self.last_fps_update
-            if time_elapsed >= 1.0:
-                self.current_fps = self.frame_count / time_elapsed
-                self.frame_count = 0
-                self.last_fps_update = current_time
-            frame_latency = current_time - self.last_frame_time
-            if frame_latency > 0:
-                self.frame_latency_history.append(frame_latency * 1000)
-                if len(self.frame_latency_history) > self.latency_window_size:
-                    self.frame_latency_history.pop(0)
-            self.last_frame_time = current_time
-        rtt = current_time - self.last_request_time
-        self.last_request_time = current_time
-        if rtt > 0:
-            self.rtt_history.append(rtt * 1000)
-            if len(self.rtt_history) > self.rtt_window_size:
-                self.rtt_history.pop(0)
-
-        # --- Centroid tracking logic con suavizado de cajas ---
-        detections = [d[0] for d in current_detections]  # [(x, y, w, h), ...]
-        confidences = [d[1] for d in current_detections]  # [conf, ...]
-        det_centroids = [self._centroid(box) for box in detections]
-        assigned = set()
-        updated_tracks = {}
-        
-        # Match detections to existing tracks
-        for tid, tinfo in self.tracks.items():
-            tcent = tinfo['centroid']
-            min_dist = float('inf')
-            min_idx = -1
-            for idx, cent in enumerate(det_centroids):
-                if idx in assigned:
-                    continue
-                dist = math.hypot(cent[0] - tcent[0], cent[1] - tcent[1])
-                if dist < min_dist:
-                    min_dist = dist
-                    min_idx = idx
-            
-            if min_idx != -1 and min_dist < self.dist_thresh:
-                # Update track con suavizado de caja (EMA)
-                new_box = detections[min_idx]
-                old_box = tinfo.get('box', new_box)
-                
-                # Aplicar suavizado exponencial a las coordenadas de la caja
-                alpha = self.box_smoothing_alpha
-                smoothed_box = (
-                    int(alpha * new_box[0] + (1 - alpha) * old_box[0]),  # x
-                    int(alpha * new_box[1] + (1 - alpha) * old_box[1]),  # y
-                    int(alpha * new_box[2] + (1 - alpha) * old_box[2]),  # w
-                    int(alpha * new_box[3] + (1 - alpha) * old_box[3])   # h
-                )
-                
-                updated_tracks[tid] = {
-                    'centroid': det_centroids[min_idx],
-                    'box': smoothed_box,
-                    'conf': confidences[min_idx],
-                    'lost': 0
-                }
-                assigned.add(min_idx)
-            else:
-                # Mark as lost - mantener última caja conocida
-                if tinfo['lost'] + 1 < self.max_lost:
-                    updated_tracks[tid] = {
-                        'centroid': tcent,
-                        'box': tinfo.get('box', (0, 0, 0, 0)),
-                        'conf': tinfo.get('conf', None),
-                        'lost': tinfo['lost'] + 1
-                    }
-        
-        # Add new tracks for unassigned detections
-        for idx, cent in enumerate(det_centroids):
-            if idx not in assigned:
-                new_box = detections[idx]
-                
-                # Verificar si esta nueva detección se superpone significativamente con algún track perdido
-                overlapping_tracks = []
-                for tid, tinfo in updated_tracks.items():
-                    if tinfo['lost'] > 0:  # Solo verificar tracks perdidos
-                        iou = self._iou(new_box, tinfo['box'])
-                        if iou > 0.5:  # Si hay más de 50% de superposición
-                            overlapping_tracks.append((tid, iou, tinfo['lost']))
-                
-                # Si hay superposición, eliminar el track antiguo y crear uno nuevo
-                if overlapping_tracks:
-                    # Ordenar por IoU descendente y lost ascendente (preferir eliminar los más perdidos)
-                    overlapping_tracks.sort(key=lambda x: (-x[2], -x[1]))
-                    # Eliminar el track más perdido que se superpone
-                    tid_to_remove = overlapping_tracks[0][0]
-                    del updated_tracks[tid_to_remove]
-                
-                # Crear nuevo track
-                updated_tracks[self.next_id] = {
-                    'centroid': cent,
-                    'box': new_box,
-                    'conf': confidences[idx],
-                    'lost': 0
-                }
-                self.unique_ids.add(self.next_id)
-                self.next_id += 1
-        
-        # Remove tracks lost for too long
-        self.tracks = {tid: tinfo for tid, tinfo in updated_tracks.items() if tinfo['lost'] < self.max_lost}
-        # Count current unique persons (active tracks)
-        current_ids = list(self.tracks.keys())
-        self.last_count = len(current_ids)
-        # History for smoothing (not used for unique count)
-        self.detection_history.append(current_detections)
-        if len(self.detection_history) > self.max_history:
-            self.detection_history.pop(0)
-        avg_fps = round(self.current_fps, 1)
-        avg_frame_latency = round(sum(self.frame_latency_history) / len(self.frame_latency_history), 1) if self.frame_latency_history else 0
-        avg_rtt = round(sum(self.rtt_history) / len(self.rtt_history), 1) if self.rtt_history else 0
-        stats = {
-            'fps': avg_fps,
-            'frame_latency': avg_frame_latency,
-            'rtt': avg_rtt,
-            'tiempo_total': round(current_time - self.start_time, 1),
-            'detecciones_totales': len(self.unique_ids),
-            'personas_actuales': self.last_count
-        }
-        return self.last_count, stats
-    
-    def get_smoothed_detections(self):
-        """Retorna las cajas de detección suavizadas de todos los tracks activos"""
-        smoothed_dets = []
-        for tid, tinfo in self.tracks.items():
-            box = tinfo.get('box', None)
-            conf = tinfo.get('conf', None)
-            if box and box != (0, 0, 0, 0):
-                smoothed_dets.append((box, conf))
-        return smoothed_dets
+# Eventos del ciclo de vida de los tracks (métricas, log JSONL y cualquier otro suscriptor)
+track_event_bus = TrackEventBus()
+
+# Ocupación por zona y cruces por línea de los tracks confirmados
+zone_counter = ZoneCounter(COUNT_ZONES, COUNT_LINES)
 
 # Crear instancia del tracker
-tracker = DetectionTracker()
+tracker = DetectionTracker(
+    max_history=MAX_FRAMES_HISTORY,
+    reid_store=ReIDStore() if REID_ENABLED else None,
+    appearance_encoder=AppearanceEncoder() if (REID_ENABLED or APPEARANCE_MATCHING_ENABLED) else None,
+    appearance_weight=APPEARANCE_WEIGHT if APPEARANCE_MATCHING_ENABLED else 0.0,
+    embedding_refresh=EMBEDDING_REFRESH,
+    high_thresh=CONFIDENCE_THRESHOLD,
+    low_thresh=TRACK_LOW_THRESHOLD,
+    min_hits=TRACK_CONFIRM_HITS,
+    event_bus=track_event_bus
+)
+
+# Última telemetría del dron: dict con 'lat', 'lon', 'alt' (m sobre el terreno), 'roll', 'pitch', 'yaw' (grados)
+# Se actualizará desde el lector MAVLink (próximamente); None = sin telemetría
+TELEMETRIA_ACTUAL = None
+geo_projector = GeoProjector(image_width=400, image_height=300, hfov_deg=CAMERA_HFOV_DEG)
+
+# Trazas por frame: primer byte -> JPEG completo -> ... -> mostrado
+frame_tracer = FrameTracer(enabled=FRAME_TRACE_ENABLED)
+
+# Decodificador JPEG (libjpeg-turbo si está instalado): reduce en el dominio DCT hasta el tamaño de pantalla,
+# el consumidor más grande (YOLO usa TARGET_SIZE, menor)
+jpeg_decoder = JPEGDecoder(target_size=(400, 300))
+print(f"[CONFIG] Decodificador JPEG: {jpeg_decoder.backend}")
+
+# Perfilador por muestreo activable sin reiniciar el stream (flamegraph del momento en que cae el FPS)
+sampling_profiler = SamplingProfiler(interval_sec=PROFILER_INTERVAL_MS / 1000, duration_sec=PROFILER_DURATION_SEC)
+
+# Métricas del servicio (se actualizan siempre; el endpoint HTTP solo si METRICS_ENABLED)
+metrics_registry = MetricsRegistry()
+frames_received_total = metrics_registry.counter('esp32_frames_received_total', 'Frames JPEG completos extraidos del stream')
+frames_decoded_total = metrics_registry.counter('esp32_frames_decoded_total', 'Frames decodificados correctamente')
+frames_dropped_total = metrics_registry.counter('esp32_frames_dropped_total', 'Frames descartados', ['reason'])
+frames_dropped_decode = frames_dropped_total.labels(reason='decode_error')
+frames_dropped_size = frames_dropped_total.labels(reason='invalid_size')
+frames_dropped_stale = frames_dropped_total.labels(reason='stale')  # Descartados sin decodificar (decodificación evitada)
+frames_corrupt_total = metrics_registry.counter('esp32_frames_corrupt_total',
+                                                'Frames rechazados antes de decodificar por JPEG/parte multipart invalida', ['type'])
+for _tipo in CORRUPTION_TYPES:
+    frames_corrupt_total.labels(type=_tipo)  # Exponer todas las clases desde el arranque (en 0)
+bytes_discarded_total = metrics_registry.counter('esp32_stream_bytes_discarded_total', 'Bytes recortados por el buffer del demultiplexor')
+stream_connections_total = metrics_registry.counter('esp32_stream_connections_total', 'Conexiones al stream establecidas (mas de 1 = reconexiones)')
+stream_errors_total = metrics_registry.counter('esp32_stream_errors_total', 'Errores que cortaron el stream', ['type'])
+inference_seconds = metrics_registry.histogram('yolo_inference_seconds', 'Duracion de la inferencia YOLO',
+                                               buckets=(0.01, 0.02, 0.03, 0.05, 0.075, 0.1, 0.15, 0.25, 0.5, 1.0))
+frame_latency_seconds = metrics_registry.histogram('frame_latency_seconds', 'Latencia primer byte -> mostrado',
+                                                   buckets=(0.025, 0.05, 0.1, 0.15, 0.2, 0.3, 0.5, 1.0, 2.0))
+buffer_bytes = metrics_registry.gauge('esp32_stream_buffer_bytes', 'Bytes pendientes en el buffer del demultiplexor')
+pending_frames = metrics_registry.gauge('esp32_stream_pending_frames', 'Frames JPEG en cola (comprimidos) aun sin procesar')
+tracked_persons = metrics_registry.gauge('tracked_persons', 'Personas seguidas en el frame actual')
+process_skip_gauge = metrics_registry.gauge('process_skip', 'Se infiere 1 de cada N frames')
+quality_level_gauge = metrics_registry.gauge('esp32_quality_level', 'Escalon de calidad de la camara (0 = mejor)')
+restream_clients = metrics_registry.gauge('restream_clients', 'Espectadores conectados a la retransmision MJPEG')
+track_events_total = metrics_registry.counter('track_events_total', 'Eventos del ciclo de vida de los tracks', ['type'])
+for _tipo in EVENT_TYPES:
+    track_events_total.labels(type=_tipo)
+zone_occupancy = metrics_registry.gauge('zone_occupancy', 'Personas dentro de cada zona de conteo', ['zone'])
+zone_entries_total = metrics_registry.counter('zone_entries_total', 'Tracks que entraron a cada zona de conteo', ['zone'])
+line_crossings_total = metrics_registry.counter('line_crossings_total', 'Cruces de cada linea de conteo', ['line', 'direction'])
+for _zona in zone_counter.zone_names:
+    zone_occupancy.labels(zone=_zona)
+    zone_entries_total.labels(zone=_zona)
+for _linea in zone_counter.line_names:
+    for _sentido in DIRECTIONS:
+        line_crossings_total.labels(line=_linea, direction=_sentido)
+track_dwell_seconds = metrics_registry.histogram('track_dwell_seconds', 'Permanencia de cada persona confirmada (nacimiento -> fin)',
+                                                 buckets=(1, 2, 5, 10, 20, 30, 60, 120, 300, 600))
 
 def mostrar_pantalla_inicio():
     # Crear una ventana de inicio con espacio para panel lateral
@@ -356,7 +309,60 @@ def mostrar_pantalla_inicio():
     return window_name
 
 def stream_camera():
+    tuner = None
+    quality_controller = None
+    metrics_server = None
+    restream_server = None
+    response = None
+    demuxer = None
+    cola_frames = None
+    track_events_file = None
+    hilo_eventos = None
     try:
+        if METRICS_ENABLED:
+            try:
+                metrics_server = start_metrics_server(metrics_registry, port=METRICS_PORT)
+                print(f"[METRICS] Endpoint en http://127.0.0.1:{METRICS_PORT}/metrics")
+            except OSError as e:
+                print(f"[WARN] No se pudo iniciar el endpoint de métricas: {e}")
+        
+        if RESTREAM_ENABLED:
+            try:
+                restream_server = MJPEGRestreamServer(port=RESTREAM_PORT, quality=RESTREAM_QUALITY).start()
+                print(f"[RESTREAM] Retransmitiendo en http://0.0.0.0:{RESTREAM_PORT}/stream (estado en /stats)")
+            except OSError as e:
+                print(f"[WARN] No se pudo iniciar la retransmisión: {e}")
+        
+        if face_worker is not None:
+            face_worker.start()
+        
+        # Consumidor de eventos de tracks en su propio hilo: el tracker solo encola
+        if TRACK_EVENTS_LOG:
+            try:
+                track_events_file = open(TRACK_EVENTS_LOG, 'a', encoding='utf-8')
+                print(f"[EVENTS] Eventos de tracks en {TRACK_EVENTS_LOG}")
+            except OSError as e:
+                print(f"[WARN] No se pudo abrir {TRACK_EVENTS_LOG}: {e}")
+        
+        def registrar_evento(evento):
+            track_events_total.labels(type=evento['type']).inc()
+            if evento['type'] == 'terminated' and evento.get('confirmed'):
+                track_dwell_seconds.observe(evento['dwell_sec'])
+            if track_events_file is not None:
+                track_events_file.write(json.dumps(evento) + '\n')
+                track_events_file.flush()
+        
+        hilo_eventos = start_consumer(track_event_bus.subscribe('metrics', maxsize=1024), registrar_evento)
+        
+        # En modo headless: 'kill -USR1 <pid>' inicia/detiene el perfilador (POSIX, hilo principal)
+        if hasattr(signal, 'SIGUSR1'):
+            hilo_stream = threading.get_ident()
+            try:
+                signal.signal(signal.SIGUSR1, lambda signum, frame: sampling_profiler.toggle(hilo_stream))
+                print(f"[PROFILE] 'p' en la ventana o 'kill -USR1 {os.getpid()}' para perfilar {PROFILER_DURATION_SEC} s")
+            except ValueError:
+                pass  # stream_camera corriendo fuera del hilo principal: solo la tecla
+        
         # Mostrar pantalla de inicio
         window_name = mostrar_pantalla_inicio()
         print(f"Conectando a {ESP32_URL_PROCESSED}...")
@@ -371,6 +377,18 @@ def stream_camera():
         # Timeout adaptativo según red
         timeout_connect = 10 if USE_NETWORK == "PUCP" else 5
         timeout_read = 30 if USE_NETWORK == "PUCP" else 10
+        process_skip = PROCESS_SKIP
+        
+        if NETWORK_AUTOTUNE:
+            # Arranca del último perfil bueno para esta URL (o de los valores de USE_NETWORK)
+            tuner = NetworkAutoTuner(ESP32_URL_PROCESSED, seed_profile={
+                'chunk_size': CHUNK_SIZE, 'buffer_max': BUFFER_MAX, 'buffer_keep': BUFFER_KEEP,
+                'process_skip': PROCESS_SKIP, 'timeout_connect': timeout_connect, 'timeout_read': timeout_read})
+            rtt_inicial = tuner.probe_rtt()
+            timeout_connect, timeout_read = tuner.timeouts
+            process_skip = tuner.profile['process_skip']
+            rtt_texto = f"{rtt_inicial:.1f} ms" if rtt_inicial is not None else "sin respuesta"
+            print(f"[AUTOTUNE] Perfil inicial ({tuner.source}), RTT {rtt_texto}: {tuner.describe()}")
         
         print(f"[CONFIG] Timeout: connect={timeout_connect}s, read={timeout_read}s")
         
@@ -386,120 +404,157 @@ def stream_camera():
             raise RequestException(f"Error de conexión: código {response.status_code}")
             
         print("[OK] Conexión establecida")
+        stream_connections_total.inc()
         
-        # Buffer para los datos
-        buffer = b''
+        if QUALITY_CONTROL_ENABLED:
+            quality_controller = QualityController(control_url_from_stream(ESP32_URL_PROCESSED),
+                                                   start_level=QUALITY_START_LEVEL)
+            quality_controller.apply()  # Sincronizar la cámara con el escalón inicial (en segundo plano)
+            print(f"[CALIDAD] Control en {quality_controller.control_url}, inicio: {quality_controller.current['nombre']}")
+            quality_level_gauge.set(quality_controller.level)
+        process_skip_gauge.set(process_skip)
+        
+        # Demultiplexor MJPEG (buffer limitado según configuración de red)
+        if tuner is not None:
+            demuxer = MJPEGDemuxer(BOUNDARY, buffer_max=tuner.profile['buffer_max'], buffer_keep=tuner.profile['buffer_keep'])
+        else:
+            demuxer = MJPEGDemuxer(BOUNDARY, buffer_max=BUFFER_MAX, buffer_keep=BUFFER_KEEP)
         
         # Crear ventana para mostrar el video
         cv2.namedWindow('ESP32-CAM Stream', cv2.WINDOW_NORMAL)
         
-        # Dimensiones de los videos
+        # Dimensiones de los videos y geometría del canvas (dos videos + panel lateral)
         video_width = 400
         video_height = 300
+        layout = CanvasLayout(video_width, video_height)
+        panel_x, panel_width = layout.panel_x, layout.panel_width
+        font, color_titulo, color_texto = FONT, COLOR_TITULO, COLOR_TEXTO
         
-        # Usar chunk_size optimizado según la red
-        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
-            if not chunk:
-                continue
-            
-            # Limitar el tamaño del buffer según configuración de red
-            if len(buffer) > BUFFER_MAX:
-                buffer = buffer[-BUFFER_KEEP:]  # Mantener solo los últimos bytes configurados
-            
-            buffer += chunk
-            
-            # Buscar el boundary que separa las imágenes
-            boundary_pos = buffer.find(BOUNDARY)
-            
-            while boundary_pos != -1:
-                # Encontrar el inicio del JPEG
-                jpeg_start = buffer.find(b'\xff\xd8', boundary_pos)
-                if jpeg_start == -1:
-                    break
-                
-                # Encontrar el final del JPEG
-                jpeg_end = buffer.find(b'\xff\xd9', jpeg_start)
-                if jpeg_end == -1:
-                    break
-                
-                # Extraer y decodificar el frame JPEG
-                jpg_data = buffer[jpeg_start:jpeg_end + 2]
-                buffer = buffer[jpeg_end + 2:]
-                
-                # Convertir a imagen
-                frame = cv2.imdecode(np.frombuffer(jpg_data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        # Hilo lector: demultiplexa el stream y encola los JPEG comprimidos. El bucle principal toma
+        # solo el más reciente y lo decodifica recién ahí; si va atrasado, los viejos se descartan sin decodificar
+        cola_frames = LatestFrameQueue(jpeg_decoder)
+        
+        def leer_stream():
+            nonlocal process_skip
+            # Usar chunk_size optimizado según la red (el auto-ajuste lo cambia en caliente)
+            chunks = tuner.iter_chunks(response) if tuner is not None else response.iter_content(chunk_size=CHUNK_SIZE)
+            primer_byte = None  # Llegada del primer byte del frame en curso
+            descartados_previos = 0
+            rechazados_previos = 0
+            try:
+                for chunk in chunks:
+                    if not chunk:
+                        continue
+                    llegada_chunk = time.perf_counter()
+                    if primer_byte is None:
+                        primer_byte = llegada_chunk
+                    
+                    # Extraer cada frame JPEG completo del chunk (sin decodificar)
+                    frames_chunk = demuxer.feed(chunk)
+                    buffer_bytes.set(len(demuxer.buffer))
+                    if demuxer.bytes_discarded > descartados_previos:
+                        bytes_discarded_total.inc(demuxer.bytes_discarded - descartados_previos)
+                        descartados_previos = demuxer.bytes_discarded
+                    if demuxer.frames_rejected > rechazados_previos:
+                        for tipo, n in demuxer.corrupt.items():
+                            frames_corrupt_total.labels(type=tipo).inc(n - frames_corrupt_total.labels(type=tipo).value)
+                        rechazados_previos = demuxer.frames_rejected
+                    for jpg_data in frames_chunk:
+                        frames_received_total.inc()
+                        if tuner is not None:
+                            tuner.on_frame(len(jpg_data), llegada_chunk)
+                        pending_frames.set(cola_frames.push(jpg_data, llegada_chunk, primer_byte))
+                        primer_byte = llegada_chunk  # El siguiente frame del mismo chunk empezó aquí
+                    if frames_chunk:
+                        # Lo que queda en el buffer (salvo el CRLF final) ya es el comienzo del siguiente frame
+                        primer_byte = llegada_chunk if demuxer.buffer.strip() else None
+                    
+                    # Reajuste periódico del perfil (por chunk: también corre si ningún frame llega completo)
+                    if tuner is not None and tuner.update(discarded_bytes=demuxer.bytes_discarded):
+                        demuxer.buffer_max = tuner.profile['buffer_max']
+                        demuxer.buffer_keep = tuner.profile['buffer_keep']
+                        process_skip = tuner.profile['process_skip']
+                        process_skip_gauge.set(process_skip)
+                        print(f"[AUTOTUNE] {tuner.describe()}")
+                cola_frames.close()
+            except Exception as e:
+                cola_frames.close(e)  # Se re-lanza en el bucle principal (manejo de errores de siempre)
+        
+        lector = threading.Thread(target=leer_stream, name='mjpeg-reader', daemon=True)
+        lector.start()
+        desglose = None     # Desglose de latencia por etapa (se recalcula cada 15 frames)
+        while not cola_frames.finished:
+            for frame_lazy in cola_frames.latest(timeout=1.0):
+                inicio_frame = time.perf_counter()
+                jpg_data = frame_lazy.data
+                inicio_red = frame_lazy.first_byte_at
+                frame_tracer.start(inicio_red)
+                frame_tracer.mark(JPEG_COMPLETE, frame_lazy.arrived_at)
+                frame_tracer.mark(DEQUEUED, inicio_frame)
+                
+                # Convertir a imagen recién ahora (el buffer del decodificador se reutiliza: solo se usa hasta el resize)
+                frame = frame_lazy.image
                 if frame is None:
+                    frames_dropped_decode.inc()
                     continue
                 
                 # Validar dimensiones
                 if frame.shape[0] <= 0 or frame.shape[1] <= 0:
+                    frames_dropped_size.inc()
                     continue
+                frame_tracer.mark(DECODED)
+                frames_decoded_total.inc()
                 
                 # Redimensionar una sola vez y crear dos copias en memoria
                 frame_display = cv2.resize(frame, (video_width, video_height))
                 frame_raw = frame_display.copy()  # Copia para video crudo
                 frame_processed = frame_display.copy()  # Copia para procesar
                 
-                # Crear un canvas más grande para ambos videos y el panel lateral
-                canvas_height = 800  # Espacio para dos videos + márgenes
-                canvas_width = 1100  # Espacio para videos + panel
-                canvas = np.zeros((canvas_height, canvas_width, 3), dtype=np.uint8)
-                
                 # Inicializar atributos de stream_camera si no existen
                 if not hasattr(stream_camera, 'frame_count'):
                     stream_camera.frame_count = 0
                     stream_camera.no_detect_frames = 0
-                    stream_camera.conf_current = CONFIDENCE_THRESHOLD
                     stream_camera.last_detecciones = []
                 
                 stream_camera.frame_count += 1
                 
-                # Posiciones de los videos
-                margin_left = 40
-                margin_top = 60
-                video_spacing = 20  # Espaciado entre videos
-                
-                # Posición del video procesado (arriba)
-                processed_y = margin_top
-                processed_x = margin_left
-                
-                # Posición del video crudo (abajo)
-                raw_y = processed_y + video_height + video_spacing
-                raw_x = margin_left
-                
-                # Posición del panel lateral
-                panel_x = margin_left + video_width + 40
-                panel_width = canvas_width - panel_x - 40
-                
                 # Procesar solo 1 de cada N frames (según configuración de red)
                 personas_detectadas = stream_camera.last_detecciones
-                if stream_camera.frame_count % PROCESS_SKIP == 0:
-                    # Redimensionar directamente al tamaño objetivo para procesamiento desde el frame display
-                    frame_resized = cv2.resize(frame_display, TARGET_SIZE, interpolation=cv2.INTER_AREA)
-                else:
-                    # Usar últimas detecciones conocidas
-                    frame_resized = None
+                frame_resized = None
+                frame_gpu = None
+                inferir = stream_camera.frame_count % process_skip == 0
+                if inferir:
+                    # En CUDA: subir el frame decodificado una sola vez (pinned, asíncrono) y preprocesar en la GPU
+                    frame_gpu = gpu_preprocessor.submit(frame)
+                    if frame_gpu is None:
+                        # Redimensionar directamente al tamaño objetivo para procesamiento desde el frame display
+                        frame_resized = cv2.resize(frame_display, TARGET_SIZE, interpolation=cv2.INTER_AREA)
+                # Si no se infiere, se usan las últimas detecciones conocidas
+                frame_tracer.mark(PREPROCESSED)
 
-                # Ajuste adaptativo del umbral si pasaron muchos frames sin detecciones
-                if stream_camera.no_detect_frames >= MAX_NO_DETECT_FRAMES:
-                    threshold_current = max(0.15, CONFIDENCE_THRESHOLD - 0.10)
-                else:
-                    threshold_current = CONFIDENCE_THRESHOLD
-                stream_camera.conf_current = threshold_current
-
-                if frame_resized is not None:
+                if inferir:
                     # Detectar personas con YOLO
+                    frame_tracer.mark(INFERENCE_START)
+                    inicio_inferencia = time.perf_counter()
+                    # En CUDA el tensor 1x3xHxW ya viene normalizado: ultralytics lo usa sin letterbox
+                    entrada = gpu_preprocessor.tensor(frame_gpu) if frame_gpu is not None else frame_resized
                     try:
-                        results = model(frame_resized, verbose=False, half=USE_FP16)
+                        results = model(entrada, verbose=False, half=USE_FP16, **DETECTOR_KWARGS)
                     except TypeError:
                         # Si la versión no soporta 'half' como argumento
-                        results = model(frame_resized, verbose=False)
+                        results = model(entrada, verbose=False, **DETECTOR_KWARGS)
                     except Exception as e:
                         print(f"Error en inferencia YOLO: {e}")
                         results = None
+                        if frame_gpu is not None:
+                            # Versión de ultralytics sin entrada de tensores: los siguientes frames van por la CPU
+                            gpu_preprocessor.disable(e)
+                    fin_inferencia = time.perf_counter()
+                    frame_tracer.mark(INFERENCE_END, fin_inferencia)
+                    inference_seconds.observe(fin_inferencia - inicio_inferencia)
                     
                     if results is not None:
-                        # Filtrar solo detecciones de personas con alta confianza
+                        # Filtrar detecciones de personas; las de confianza baja solo sostienen tracks confirmados
                         detections = results[0].boxes.data
                         nuevas_detecciones = []
                         
@@ -510,7 +565,7 @@ def stream_camera():
                         for det in detections:
                             try:
                                 # Clase 0 es 'person' en COCO
-                                if int(det[5]) == 0 and float(det[4]) >= threshold_current:
+                                if int(det[5]) == 0 and float(det[4]) >= TRACK_LOW_THRESHOLD:
                                     x1, y1, x2, y2, conf = det[:5]
                                     # Convertir coordenadas al formato (x, y, w, h) y escalar al tamaño del video de visualización
                                     x1, y1 = int(x1 * scale_x), int(y1 * scale_y)
@@ -528,22 +583,20 @@ def stream_camera():
                         personas_detectadas = nuevas_detecciones
                         stream_camera.last_detecciones = personas_detectadas
 
-                # Si no hubo detecciones de persona, intentar fallback de rostro
-                if (FACE_FALLBACK_ENABLED and FACE_CASCADE is not None and 
+                # Fallback de rostro asíncrono: incorporar lo que haya terminado (de hace pocos frames) sin esperar
+                if face_worker is not None:
+                    caras = face_worker.poll(stream_camera.frame_count, max_age_frames=FACE_FALLBACK_COOLDOWN)
+                    if caras and len(personas_detectadas) == 0:
+                        personas_detectadas = caras
+                        stream_camera.last_detecciones = personas_detectadas
+                
+                # Si no hubo detecciones de persona, pedir una búsqueda de rostros donde se perdieron tracks
+                if (face_worker is not None and 
                     len(personas_detectadas) == 0 and 
                     stream_camera.no_detect_frames >= MAX_NO_DETECT_FRAMES and 
                     stream_camera.frame_count % FACE_FALLBACK_COOLDOWN == 0):
-                    try:
-                        gray = cv2.cvtColor(frame_display, cv2.COLOR_BGR2GRAY)
-                        faces = FACE_CASCADE.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30))
-                        if len(faces) > 0:
-                            personas_detectadas = []
-                            for (fx, fy, fw, fh) in faces:
-                                # tratar rostro como 1 detección (sin confianza)
-                                personas_detectadas.append(((int(fx), int(fy), int(fw), int(fh)), None))
-                            stream_camera.last_detecciones = personas_detectadas
-                    except Exception as e:
-                        print(f"Error en deteccion de rostro: {e}")
+                    face_worker.submit(frame_display, tracker.lost_regions(FACE_FALLBACK_LOST_SEC),
+                                       stream_camera.frame_count)
 
                 # Actualizar contador de frames sin detecciones
                 if len(personas_detectadas) == 0:
@@ -552,102 +605,41 @@ def stream_camera():
                     stream_camera.no_detect_frames = 0
                 
                 # Actualizar tracker ANTES de dibujar
-                num_personas, stats = tracker.update(personas_detectadas)
+                num_personas, stats = tracker.update(personas_detectadas, frame=frame_display)
+                frame_tracer.mark(TRACKED)
+                tracked_persons.set(num_personas)
+                
+                # Zonas y líneas: una pasada vectorizada sobre los centroides de los tracks confirmados
+                if zone_counter.enabled:
+                    entradas_previas = zone_counter.entries.copy()
+                    for _, linea, sentido in zone_counter.update_tracks(tracker.tracks):
+                        line_crossings_total.labels(line=linea, direction=sentido).inc()
+                    for z, zona in enumerate(zone_counter.zone_names):
+                        zone_occupancy.labels(zone=zona).set(int(zone_counter.occupancy[z]))
+                        if zone_counter.entries[z] > entradas_previas[z]:
+                            zone_entries_total.labels(zone=zona).inc(int(zone_counter.entries[z] - entradas_previas[z]))
                 
                 # Obtener cajas suavizadas del tracker para dibujar
                 detecciones_a_dibujar = tracker.get_smoothed_detections()
                 
-                # Dibujar las detecciones suavizadas en el frame procesado
-                for (x, y, w, h), conf in detecciones_a_dibujar:
+                # Proyectar todas las cajas del frame a lat/lon (una sola operación)
+                posiciones_geo = []
+                if GEO_PROJECTION_ENABLED and TELEMETRIA_ACTUAL is not None:
                     try:
-                        # Validar que las coordenadas están dentro del frame procesado
-                        if x < 0 or y < 0 or x + w > video_width or y + h > video_height:
-                            continue
-                        
-                        # Color base para las detecciones
-                        color_box = (0, 255, 0)
-                        
-                        # Dibujar rectángulo principal
-                        cv2.rectangle(frame_processed, (x, y), (x + w, y + h), color_box, 2)
-                        
-                        # Barra superior con etiqueta y confianza
-                        label_bg_color = (40, 40, 40)
-                        label_height = 25
-                        confianza = f"Persona {conf*100:.0f}%" if conf is not None else "Cara"
-                        
-                        # Fondo de la etiqueta
-                        if y - label_height >= 0:
-                            cv2.rectangle(frame_processed, (x, y - label_height), 
-                                       (x + w, y), label_bg_color, -1)
-                            
-                            # Texto de la etiqueta
-                            cv2.putText(frame_processed, confianza, (x + 5, y - 7),
-                                      cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-                        
-                        # Indicador de esquina superior izquierda
-                        corner_size = min(20, w//4, h//4)
-                        cv2.line(frame_processed, (x, y), 
-                               (x + corner_size, y), color_box, 2)
-                        cv2.line(frame_processed, (x, y), 
-                               (x, y + corner_size), color_box, 2)
-                        
-                        # Indicador de esquina inferior derecha
-                        cv2.line(frame_processed, (x + w - corner_size, y + h), 
-                               (x + w, y + h), color_box, 2)
-                        cv2.line(frame_processed, (x + w, y + h - corner_size), 
-                               (x + w, y + h), color_box, 2)
+                        posiciones_geo = geo_projector.project_detections(detecciones_a_dibujar, TELEMETRIA_ACTUAL)
                     except Exception as e:
-                        print(f"Error dibujando detección: {e}")
-                        continue
-                
-                # Colocar video procesado (con detecciones) en el canvas - ARRIBA
-                try:
-                    canvas[processed_y:processed_y+video_height, processed_x:processed_x+video_width] = frame_processed
-                except ValueError as e:
-                    print(f"Error al copiar frame procesado al canvas: {e}")
-                
-                # Colocar video crudo (sin detecciones) en el canvas - ABAJO
-                try:
-                    canvas[raw_y:raw_y+video_height, raw_x:raw_x+video_width] = frame_raw
-                except ValueError as e:
-                    print(f"Error al copiar frame crudo al canvas: {e}")
-                
-                # Configuración de la interfaz
-                font = cv2.FONT_HERSHEY_SIMPLEX
-                color_titulo = (0, 220, 0)  # Verde claro
-                color_texto = (200, 200, 200)  # Gris claro
-                
-                # Título en la parte superior
-                cv2.putText(canvas, "Sistema de Deteccion de Personas - PUCP", 
-                          (margin_left, 35), font, 0.8, color_titulo, 2)
-                
-                # Etiquetas para los videos
-                cv2.putText(canvas, "Video Procesado (con detecciones)", 
-                          (processed_x, processed_y - 8), font, 0.5, color_titulo, 1)
-                cv2.putText(canvas, "Video Original (sin procesar)", 
-                          (raw_x, raw_y - 8), font, 0.5, (255, 255, 0), 1)
-                
-                # Bordes de los videos
-                cv2.rectangle(canvas, (processed_x-2, processed_y-2), 
-                           (processed_x+video_width+2, processed_y+video_height+2), color_titulo, 2)
-                cv2.rectangle(canvas, (raw_x-2, raw_y-2), 
-                           (raw_x+video_width+2, raw_y+video_height+2), (255, 255, 0), 2)
+                        print(f"Error en geo-proyección: {e}")
                 
-                # Panel de métricas de rendimiento
-                y_pos = processed_y + 10  # Alineado con el video procesado
-                metrics_height = 200
-                
-                # Dibujar fondo para métricas
-                try:
-                    if panel_width > 0 and metrics_height > 0:
-                        metrics_bg = np.zeros((metrics_height, panel_width, 3), dtype=np.uint8)
-                        metrics_bg[:, :] = (30, 30, 30)  # Fondo gris oscuro
-                        canvas[y_pos:y_pos+metrics_height, panel_x:panel_x+panel_width] = metrics_bg
-                except ValueError:
-                    pass  # Si panel_width es inválido, continuar sin fondo
+                # Dibujar las detecciones suavizadas y componer el canvas (videos, títulos, bordes, fondo del panel)
+                draw_detections(frame_processed, detecciones_a_dibujar)
+                if zone_counter.enabled:
+                    draw_zones(frame_processed, zone_counter)
+                metrics_height = 325 if restream_server is not None else 300  # Incluye desglose de latencia (y restream)
+                metrics_height += 25 * (len(zone_counter.zone_names) + len(zone_counter.line_names))
+                canvas = layout.compose(frame_processed, frame_raw, metrics_height)
                 
                 # Panel de métricas reordenado y renombrado
-                y_panel = y_pos + 30
+                y_panel = layout.panel_y + 30
                 cv2.putText(canvas, "Personas detectadas:", 
                           (panel_x + 10, y_panel), font, 0.7, color_texto, 1)
                 cv2.putText(canvas, str(num_personas), 
@@ -661,22 +653,47 @@ def stream_camera():
                 cv2.putText(canvas, fps_text, (panel_x + 10, y_panel), font, 0.7, fps_color, 2)
                 y_panel += 30
                 
-                # Latencia
-                frame_latency = stats['frame_latency']
-                latency_text = f"Latencia: {frame_latency:.1f} ms"
-                latency_color = (0, 255, 0) if frame_latency <= 30 else (0, 255, 255) if frame_latency <= 50 else (0, 0, 255)
-                cv2.putText(canvas, latency_text, (panel_x + 10, y_panel), font, 0.7, latency_color, 2)
-                y_panel += 30
-                
-                # RTT
-                rtt = stats['rtt']
-                rtt_text = f"RTT: {rtt:.1f} ms"
-                rtt_color = (0, 255, 0) if rtt <= 50 else (0, 255, 255) if rtt <= 100 else (0, 0, 255)
-                cv2.putText(canvas, rtt_text, (panel_x + 10, y_panel), font, 0.7, rtt_color, 2)
-                y_panel += 30
-                
-                # Confianza actual
-                cv2.putText(canvas, f"Confianza actual: {stream_camera.conf_current:.2f}", 
+                # Latencia extremo a extremo (primer byte -> mostrado) y desglose por etapa
+                if frame_tracer.frame_id % 15 == 0 or desglose is None:
+                    desglose = frame_tracer.breakdown()
+                if desglose is not None:
+                    frame_latency = desglose['Total']
+                    latency_text = f"Latencia: {frame_latency:.1f} ms"
+                    latency_color = (0, 255, 0) if frame_latency <= 100 else (0, 255, 255) if frame_latency <= 200 else (0, 0, 255)
+                    cv2.putText(canvas, latency_text, (panel_x + 10, y_panel), font, 0.7, latency_color, 2)
+                    y_panel += 25
+                    etapas = [f"{nombre} {ms:.0f}" for nombre, ms in desglose.items() if nombre != 'Total']
+                    for i in range(0, len(etapas), 4):
+                        cv2.putText(canvas, " | ".join(etapas[i:i + 4]), 
+                                  (panel_x + 10, y_panel), font, 0.45, color_texto, 1)
+                        y_panel += 20
+                    y_panel += 10
+                
+                # RTT medido por conexión TCP al ESP32 (auto-ajuste)
+                if tuner is not None and tuner.rtt_ms is not None:
+                    rtt = tuner.rtt_ms
+                    rtt_text = f"RTT: {rtt:.1f} ms"
+                    rtt_color = (0, 255, 0) if rtt <= 50 else (0, 255, 255) if rtt <= 100 else (0, 0, 255)
+                    cv2.putText(canvas, rtt_text, (panel_x + 10, y_panel), font, 0.7, rtt_color, 2)
+                    y_panel += 30
+                
+                # Escalón de calidad actual de la cámara
+                if quality_controller is not None:
+                    cv2.putText(canvas, f"Camara: {quality_controller.current['nombre']}", 
+                              (panel_x + 10, y_panel), font, 0.7, color_texto, 1)
+                    y_panel += 30
+                
+                # Retransmisión: espectadores, tiempo de codificación y peor lag
+                if restream_server is not None:
+                    clientes = restream_server.stats()['clients']
+                    restream_clients.set(len(clientes))
+                    lag_max = max((c['lag_ms'] for c in clientes), default=0.0)
+                    cv2.putText(canvas, f"Restream: {len(clientes)} clientes, enc {restream_server.encode_ms:.0f} ms, lag {lag_max:.0f} ms", 
+                              (panel_x + 10, y_panel), font, 0.5, color_texto, 1)
+                    y_panel += 25
+                
+                # Umbrales de confianza por track (crear / sostener) y tracks aún sin confirmar
+                cv2.putText(canvas, f"Confianza: {CONFIDENCE_THRESHOLD:.2f}/{TRACK_LOW_THRESHOLD:.2f} ({stats['tracks_tentativos']} tent.)", 
                           (panel_x + 10, y_panel), font, 0.7, color_texto, 1)
                 y_panel += 30
                 
@@ -690,22 +707,70 @@ def stream_camera():
                           (panel_x + 10, y_panel), font, 0.7, color_texto, 1)
                 y_panel += 35
                 
+                # Ocupación por zona y cruces por línea
+                for z, zona in enumerate(zone_counter.zone_names):
+                    cv2.putText(canvas, f"Zona {zona}: {zone_counter.occupancy[z]} (entradas {zone_counter.entries[z]})", 
+                              (panel_x + 10, y_panel), font, 0.6, color_texto, 1)
+                    y_panel += 25
+                for l, linea in enumerate(zone_counter.line_names):
+                    cv2.putText(canvas, f"Linea {linea}: {zone_counter.crossings[l, 0]} in / {zone_counter.crossings[l, 1]} out", 
+                              (panel_x + 10, y_panel), font, 0.6, color_texto, 1)
+                    y_panel += 25
+                
+                # Posiciones geo-referenciadas (solo con telemetría)
+                for _, (lat, lon) in posiciones_geo[:3]:
+                    if lat == lat and lon == lon:  # Omitir NaN (sobre el horizonte)
+                        cv2.putText(canvas, f"GPS: {lat:.6f}, {lon:.6f}", 
+                                  (panel_x + 10, y_panel), font, 0.6, color_titulo, 1)
+                        y_panel += 25
+                
                 # Fecha y hora actual
                 tiempo_actual = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                 cv2.putText(canvas, tiempo_actual, (panel_x + 10, y_panel), font, 0.7, color_texto, 1)
                 
-                # Mostrar el canvas completo
+                # Mostrar el canvas completo (y entregarlo a la retransmisión: se codifica en otro hilo)
+                if restream_server is not None:
+                    restream_server.publish(canvas)
                 cv2.imshow('ESP32-CAM Stream', canvas)
                 
                 # Salir con ESC o si la ventana se cierra
                 key = cv2.waitKey(1) & 0xFF
+                mostrado = time.perf_counter()
+                frame_tracer.mark(DISPLAYED, mostrado)
+                frame_tracer.finish()
+                frame_latency_seconds.observe(mostrado - inicio_red)
                 if key == 27 or cv2.getWindowProperty('ESP32-CAM Stream', cv2.WND_PROP_VISIBLE) < 1:
                     return
-                
-                # Buscar el siguiente boundary
-                boundary_pos = buffer.find(BOUNDARY)
-                
+                if key == ord('t') and frame_tracer.count:
+                    ruta = datetime.now().strftime("frame_trace_%Y%m%d_%H%M%S.json")
+                    n = frame_tracer.export_chrome_trace(ruta)
+                    print(f"[TRACE] {n} frames exportados a {ruta} (abrir en chrome://tracing o ui.perfetto.dev)")
+                if key == ord('p'):
+                    sampling_profiler.toggle()
+                
+                # Auto-ajuste: ocupación del bucle principal
+                if tuner is not None:
+                    fin_frame = time.perf_counter()
+                    tuner.on_processed(fin_frame - inicio_frame, fin_frame, inferred=inferir)
+                
+                # Control de calidad: solo la latencia que depende de la cámara (primer byte -> JPEG completo + RTT);
+                # la espera en cola y el procesamiento local siguen al loop, no a la resolución, y no deben bajarla
+                if quality_controller is not None:
+                    latencia_red = network_latency_ms(inicio_red, frame_lazy.arrived_at, tuner.rtt_ms if tuner is not None else None)
+                    cambio = quality_controller.observe(latencia_red, len(jpg_data))
+                    if cambio:
+                        accion = "Subiendo" if cambio > 0 else "Bajando"
+                        print(f"[CALIDAD] {accion} a {quality_controller.current['nombre']} "
+                              f"(latencia de red {latencia_red:.0f} ms)")
+                        quality_level_gauge.set(quality_controller.level)
+            
+            # Frames que quedaron atrás mientras se procesaba el anterior: descartados aún comprimidos
+            if cola_frames.skipped > frames_dropped_stale.value:
+                frames_dropped_stale.inc(cola_frames.skipped - frames_dropped_stale.value)
+        cola_frames.raise_error()
+    
     except RequestException as e:
+        stream_errors_total.labels(type='connection').inc()
         print(f"\n[ERROR] Conexión perdida: {e}")
         print("Verifica:")
         print("  - ESP32-CAM está encendida")
@@ -715,10 +780,44 @@ def stream_camera():
     except KeyboardInterrupt:
         print("\n[INFO] Programa interrumpido por el usuario")
     except Exception as e:
+        stream_errors_total.labels(type='unexpected').inc()
         print(f"\n[ERROR] Error inesperado: {e}")
         import traceback
         traceback.print_exc()
     finally:
+        sampling_profiler.stop()  # Guarda lo muestreado hasta aquí
+        if FRAME_TRACE_EXPORT_PATH and frame_tracer.count:
+            n = frame_tracer.export_chrome_trace(FRAME_TRACE_EXPORT_PATH)
+            print(f"[TRACE] {n} frames exportados a {FRAME_TRACE_EXPORT_PATH}")
+        if tuner is not None and tuner.save():
+            print(f"[AUTOTUNE] Perfil guardado para {ESP32_URL_PROCESSED}: {tuner.describe()}")
+        if cola_frames is not None:
+            cola_frames.close()
+            print(f"[INFO] Decodificaciones evitadas: {cola_frames.skipped} frames viejos descartados sin decodificar "
+                  f"({cola_frames.skipped_bytes / 1024:.0f} KB) de {cola_frames.pushed} recibidos")
+        if demuxer is not None and demuxer.frames_rejected:
+            print(f"[INFO] Frames corruptos descartados antes de decodificar: {demuxer.frames_rejected} "
+                  f"({demuxer.corruption_summary()})")
+        if response is not None:
+            response.close()  # Corta el hilo lector
+        track_event_bus.close()
+        if hilo_eventos is not None:
+            hilo_eventos.join(timeout=2.0)  # Vaciar los eventos pendientes antes de cerrar el log
+        if track_events_file is not None:
+            track_events_file.close()
+        if track_event_bus.published:
+            print(f"[INFO] Eventos de tracks: {track_event_bus.published} publicados")
+        if face_worker is not None:
+            face_worker.stop()
+            if face_worker.searches:
+                fs = face_worker.stats()
+                print(f"[INFO] Fallback de rostro: {fs['searches']} búsquedas ({fs['avg_ms']:.1f} ms promedio, "
+                      f"{fs['rois_skipped']} ROIs fuera de presupuesto), {fs['faces_found']} rostros")
+        if restream_server is not None:
+            restream_server.stop()
+        if metrics_server is not None:
+            metrics_server.shutdown()
+            metrics_server.server_close()
         print("[INFO] Cerrando ventanas...")
         cv2.destroyAllWindows()
         print("[INFO] Programa terminado")
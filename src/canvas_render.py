@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Dibujo del canvas de visualización
+Cajas de detección (y zonas de conteo) sobre el video procesado y composición del canvas
+(video procesado arriba, crudo abajo, títulos, bordes y fondo del panel)
+"""
+
+import cv2
+import numpy as np
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+COLOR_TITULO = (0, 220, 0)     # Verde claro
+COLOR_TEXTO = (200, 200, 200)  # Gris claro
+COLOR_CRUDO = (255, 255, 0)
+
+
+def draw_detections(frame, detections):
+    """Dibuja cajas, etiqueta de confianza y esquinas de cada detección ((x, y, w, h), conf) sobre el frame"""
+    height, width = frame.shape[:2]
+    color_box = (0, 255, 0)
+    label_bg_color = (40, 40, 40)
+    label_height = 25
+    for (x, y, w, h), conf in detections:
+        try:
+            # Validar que las coordenadas están dentro del frame
+            if x < 0 or y < 0 or x + w > width or y + h > height:
+                continue
+
+            # Rectángulo principal
+            cv2.rectangle(frame, (x, y), (x + w, y + h), color_box, 2)
+
+            # Barra superior con etiqueta y confianza
+            confianza = f"Persona {conf*100:.0f}%" if conf is not None else "Cara"
+            if y - label_height >= 0:
+                cv2.rectangle(frame, (x, y - label_height), (x + w, y), label_bg_color, -1)
+                cv2.putText(frame, confianza, (x + 5, y - 7), FONT, 0.5, (255, 255, 255), 1)
+
+            # Indicadores de esquina superior izquierda e inferior derecha
+            corner_size = min(20, w//4, h//4)
+            cv2.line(frame, (x, y), (x + corner_size, y), color_box, 2)
+            cv2.line(frame, (x, y), (x, y + corner_size), color_box, 2)
+            cv2.line(frame, (x + w - corner_size, y + h), (x + w, y + h), color_box, 2)
+            cv2.line(frame, (x + w, y + h - corner_size), (x + w, y + h), color_box, 2)
+        except Exception as e:
+            print(f"Error dibujando detección: {e}")
+            continue
+
+
+def draw_zones(frame, zone_counter, color_zone=(255, 160, 0), color_line=(0, 200, 255)):
+    """Dibuja las zonas (con su ocupación) y las líneas de conteo (con cruces in/out) de un ZoneCounter"""
+    stats = zone_counter.stats()
+    for name, polygon in zip(zone_counter.zone_names, zone_counter.polygons):
+        pts = polygon.astype(np.int32)
+        cv2.polylines(frame, [pts], True, color_zone, 1)
+        x, y = pts.min(axis=0)
+        cv2.putText(frame, f"{name}: {stats['zones'][name]['occupancy']}", (int(x) + 3, int(y) + 14),
+                    FONT, 0.45, color_zone, 1)
+    for name, (ax, ay, bx, by) in zip(zone_counter.line_names, zone_counter.lines.astype(np.int32)):
+        cv2.line(frame, (ax, ay), (bx, by), color_line, 1)
+        counts = stats['lines'][name]
+        cv2.putText(frame, f"{name} {counts['in']}/{counts['out']}", (int(ax) + 3, int(ay) - 4),
+                    FONT, 0.45, color_line, 1)
+
+
+class CanvasLayout:
+    """Geometría del canvas: dos videos apilados a la izquierda y panel de métricas a la derecha"""
+
+    def __init__(self, video_width=400, video_height=300, canvas_width=1100, canvas_height=800,
+                 margin_left=40, margin_top=60, video_spacing=20):
+        self.video_width = video_width
+        self.video_height = video_height
+        self.canvas_width = canvas_width
+        self.canvas_height = canvas_height
+        self.margin_left = margin_left
+        # Video procesado (arriba) y crudo (abajo)
+        self.processed_x = margin_left
+        self.processed_y = margin_top
+        self.raw_x = margin_left
+        self.raw_y = margin_top + video_height + video_spacing
+        # Panel lateral
+        self.panel_x = margin_left + video_width + 40
+        self.panel_width = canvas_width - self.panel_x - 40
+        self.panel_y = self.processed_y + 10  # Alineado con el video procesado
+
+    def compose(self, frame_processed, frame_raw, metrics_height):
+        """Canvas nuevo con ambos videos, títulos, bordes y el fondo del panel (el texto del panel va aparte)"""
+        canvas = np.zeros((self.canvas_height, self.canvas_width, 3), dtype=np.uint8)
+        px, py, rx, ry = self.processed_x, self.processed_y, self.raw_x, self.raw_y
+        vw, vh = self.video_width, self.video_height
+
+        try:
+            canvas[py:py+vh, px:px+vw] = frame_processed
+        except ValueError as e:
+            print(f"Error al copiar frame procesado al canvas: {e}")
+        try:
+            canvas[ry:ry+vh, rx:rx+vw] = frame_raw
+        except ValueError as e:
+            print(f"Error al copiar frame crudo al canvas: {e}")
+
+        # Título y etiquetas de los videos
+        cv2.putText(canvas, "Sistema de Deteccion de Personas - PUCP",
+                  (self.margin_left, 35), FONT, 0.8, COLOR_TITULO, 2)
+        cv2.putText(canvas, "Video Procesado (con detecciones)", (px, py - 8), FONT, 0.5, COLOR_TITULO, 1)
+        cv2.putText(canvas, "Video Original (sin procesar)", (rx, ry - 8), FONT, 0.5, COLOR_CRUDO, 1)
+
+        # Bordes de los videos
+        cv2.rectangle(canvas, (px-2, py-2), (px+vw+2, py+vh+2), COLOR_TITULO, 2)
+        cv2.rectangle(canvas, (rx-2, ry-2), (rx+vw+2, ry+vh+2), COLOR_CRUDO, 2)
+
+        # Fondo gris oscuro del panel de métricas
+        if self.panel_width > 0 and metrics_height > 0:
+            canvas[self.panel_y:self.panel_y+metrics_height, self.panel_x:self.panel_x+self.panel_width] = (30, 30, 30)
+        return canvas
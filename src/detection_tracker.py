@@ -0,0 +1,387 @@
+# -*- coding: utf-8 -*-
+"""
+Tracker de centroides para el conteo de personas únicas
+Asocia detecciones entre frames (distancia + apariencia cuando hay
+ambigüedad), suaviza las cajas con EMA, re-identifica personas que vuelven
+al cuadro y lleva las estadísticas del panel (FPS, latencia, conteos)
+"""
+
+import time
+from collections import deque
+
+import numpy as np
+
+from appearance import cosine_distance
+from track_events import BORN, CONFIRMED, LOST, RECOVERED, TERMINATED, make_event
+
+
+class DetectionTracker:
+    def __init__(self, max_history=5, max_lost=8, dist_thresh=200, reid_store=None,
+                 appearance_encoder=None, appearance_weight=0.5, embedding_refresh=5,
+                 high_thresh=0.35, low_thresh=0.15, min_hits=3, low_iou_thresh=0.3, event_bus=None):
+        # dist_thresh: distancia máxima (en píxeles) para considerar que una detección es la misma persona entre frames.
+        self.max_history = max_history
+        self.detection_history = []
+        self.last_count = 0
+        self.frame_latency_history = []
+        self.rtt_history = []
+        self.last_frame_time = time.time()
+        self.last_request_time = time.time()
+        self.start_time = time.time()
+        self.frame_count = 0
+        self.last_fps_update = time.time()
+        self.current_fps = 0
+        # Tracker state
+        self.next_id = 1
+        self.tracks = {}  # id: {'centroid': (x, y), 'box': (x, y, w, h), 'conf': float, 'lost': 0, 'emb': array|None, 'emb_index': int, 'hits': int, 'confirmed': bool, 'born_at': float, 'last_seen': float}
+        self.max_lost = max_lost  # Frames máximos sin detección antes de eliminar (balance entre estabilidad y reactividad)
+        self.dist_thresh = dist_thresh  # Distancia aumentada para tracking más robusto
+        self.unique_ids = set()
+        # Histéresis de confianza por track (asociación en dos etapas, estilo ByteTrack):
+        # solo detecciones >= high_thresh crean tracks, que se confirman tras min_hits asociaciones;
+        # un track confirmado se sostiene también con detecciones entre low_thresh y high_thresh
+        self.high_thresh = high_thresh
+        self.low_thresh = low_thresh
+        self.min_hits = min_hits
+        self.low_iou_thresh = low_iou_thresh  # IoU mínimo en la segunda etapa (sin apariencia: recortes poco fiables)
+        # Eventos de ciclo de vida (TrackEventBus): nacido, confirmado, perdido, recuperado, terminado
+        self.event_bus = event_bus
+        # Re-identificación a nivel de vuelo (evita contar dos veces a la misma persona)
+        self.reid_store = reid_store
+        self.reid_count = 0
+        # Cajas de tracks retirados recientemente (box, tiempo): dónde buscar con el fallback de rostro
+        self.recently_lost = deque(maxlen=16)
+        self.update_index = 0
+        # Rama de apariencia (DeepSORT simplificado): costo = distancia + peso * distancia coseno
+        self.appearance_encoder = appearance_encoder
+        self.appearance_weight = appearance_weight
+        self.embedding_refresh = embedding_refresh  # Refrescar embedding cacheado de cada track cada N frames
+        self.embedding_alpha = 0.5                  # EMA del embedding al refrescar
+        # Suavizado de métricas (ventana más grande para estabilidad)
+        self.latency_window_size = 30  # 30 frames para latencia
+        self.rtt_window_size = 30      # 30 frames para RTT
+        # Suavizado de cajas de detección (alpha para EMA - Exponential Moving Average)
+        self.box_smoothing_alpha = 0.4  # 0.4 = buen balance entre suavizado y reactividad
+
+    def _centroid(self, box):
+        x, y, w, h = box
+        return (x + w // 2, y + h // 2)
+    
+    def _iou(self, box1, box2):
+        """Calcular Intersection over Union entre dos cajas"""
+        x1, y1, w1, h1 = box1
+        x2, y2, w2, h2 = box2
+        
+        # Calcular coordenadas de intersección
+        x_left = max(x1, x2)
+        y_top = max(y1, y2)
+        x_right = min(x1 + w1, x2 + w2)
+        y_bottom = min(y1 + h1, y2 + h2)
+        
+        if x_right < x_left or y_bottom < y_top:
+            return 0.0
+        
+        # Área de intersección
+        intersection_area = (x_right - x_left) * (y_bottom - y_top)
+        
+        # Área de cada caja
+        box1_area = w1 * h1
+        box2_area = w2 * h2
+        
+        # IoU
+        iou = intersection_area / float(box1_area + box2_area - intersection_area + 1e-6)
+        return iou
+    
+    @staticmethod
+    def _iou_matrix(boxes1, boxes2):
+        """IoU entre todas las cajas (x, y, w, h) de boxes1 (N, 4) y boxes2 (M, 4) -> (N, M)"""
+        x1 = np.maximum(boxes1[:, None, 0], boxes2[None, :, 0])
+        y1 = np.maximum(boxes1[:, None, 1], boxes2[None, :, 1])
+        x2 = np.minimum(boxes1[:, None, 0] + boxes1[:, None, 2], boxes2[None, :, 0] + boxes2[None, :, 2])
+        y2 = np.minimum(boxes1[:, None, 1] + boxes1[:, None, 3], boxes2[None, :, 1] + boxes2[None, :, 3])
+        inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+        area1 = boxes1[:, 2] * boxes1[:, 3]
+        area2 = boxes2[:, 2] * boxes2[:, 3]
+        return inter / (area1[:, None] + area2[None, :] - inter + 1e-6)
+    
+    @staticmethod
+    def _greedy_assign(cost):
+        """Asignación greedy por costo global ascendente; inf = no permitido. Retorna [(fila, columna)]"""
+        pairs = []
+        rows, cols = set(), set()
+        n_cols = cost.shape[1]
+        for flat in np.argsort(cost, axis=None):
+            ri, ci = divmod(int(flat), n_cols)
+            if not np.isfinite(cost[ri, ci]):
+                break
+            if ri in rows or ci in cols:
+                continue
+            pairs.append((ri, ci))
+            rows.add(ri)
+            cols.add(ci)
+        return pairs
+    
+    def _hits_after(self, hits, conf):
+        """
+        Asociaciones acumuladas tras sumar una detección. Los rostros del fallback (conf None) llegan una
+        sola vez y tras varios frames vacíos: confirman el track de inmediato (y pasan por re-identificación)
+        """
+        return max(hits + 1, self.min_hits) if conf is None else hits + 1
+    
+    def _emit(self, event_type, tid, tinfo, now, **extra):
+        """Publica un evento del track si hay suscriptores (sin costo si nadie escucha)"""
+        if self.event_bus is not None and self.event_bus.active:
+            self.event_bus.publish(make_event(event_type, tid, tinfo, now, self.update_index, **extra))
+    
+    def _retire_track(self, tid, tinfo, now, reason='lost'):
+        """Guarda el final de un track en el almacén de re-identificación"""
+        self._emit(TERMINATED, tid, tinfo, now, confirmed=True, reason=reason)
+        self.recently_lost.append((tinfo['box'], now))
+        if self.reid_store is not None:
+            self.reid_store.add(tid, tinfo['centroid'], tinfo.get('emb'), now)
+    
+    def _compute_embeddings(self, frame, detections, det_embs, indices):
+        """Calcula en un solo lote los embeddings de las detecciones aún no calculadas"""
+        indices = [idx for idx in dict.fromkeys(indices) if idx not in det_embs]
+        if not indices:
+            return
+        embs = self.appearance_encoder.extract(frame, [detections[idx] for idx in indices])
+        for idx, emb in zip(indices, embs):
+            det_embs[idx] = emb if emb.any() else None
+    
+    def update(self, current_detections, is_new_frame=True, frame=None):
+        current_time = time.time()
+        self.update_index += 1
+        if is_new_frame:
+            self.frame_count += 1
+            time_elapsed = current_time - self.last_fps_update
+            if time_elapsed >= 1.0:
+                self.current_fps = self.frame_count / time_elapsed
+                self.frame_count = 0
+                self.last_fps_update = current_time
+            frame_latency = current_time - self.last_frame_time
+            if frame_latency > 0:
+                self.frame_latency_history.append(frame_latency * 1000)
+                if len(self.frame_latency_history) > self.latency_window_size:
+                    self.frame_latency_history.pop(0)
+            self.last_frame_time = current_time
+        rtt = current_time - self.last_request_time
+        self.last_request_time = current_time
+        if rtt > 0:
+            self.rtt_history.append(rtt * 1000)
+            if len(self.rtt_history) > self.rtt_window_size:
+                self.rtt_history.pop(0)
+
+        # --- Centroid tracking logic con suavizado de cajas ---
+        detections = [d[0] for d in current_detections]  # [(x, y, w, h), ...]
+        confidences = [d[1] for d in current_detections]  # [conf, ...] (None = rostro del fallback: cuenta como alta)
+        det_centroids = [self._centroid(box) for box in detections]
+        det_embs = {}  # idx: embedding (o None) calculado en este frame
+        assigned = set()
+        updated_tracks = {}
+        
+        # Separar por confianza: altas (asociar y crear tracks) y bajas (solo sostener tracks confirmados)
+        conf_arr = np.array([1.0 if c is None else float(c) for c in confidences], dtype=np.float32)
+        high = np.flatnonzero(conf_arr >= self.high_thresh).tolist()
+        low = np.flatnonzero((conf_arr >= self.low_thresh) & (conf_arr < self.high_thresh)).tolist()
+        
+        # Etapa 1: todos los tracks x detecciones altas; costo = distancia normalizada (vectorizada)
+        matches = {}
+        high_matches = set()  # Tracks asociados a una detección alta (refrescan apariencia)
+        track_ids = list(self.tracks.keys())
+        if track_ids and high:
+            tcents = np.array([self.tracks[tid]['centroid'] for tid in track_ids], dtype=np.float32)
+            dcents = np.array([det_centroids[i] for i in high], dtype=np.float32)
+            dist = np.hypot(tcents[:, None, 0] - dcents[None, :, 0], tcents[:, None, 1] - dcents[None, :, 1])
+            gate = dist < self.dist_thresh
+            cost = dist / self.dist_thresh
+            
+            # Rama de apariencia solo si hay ambigüedad (varias personas dentro del mismo radio, p. ej. al cruzarse)
+            ambiguous = (gate.sum(axis=0) > 1).any() or (gate.sum(axis=1) > 1).any()
+            if ambiguous and self.appearance_weight > 0 and self.appearance_encoder is not None and frame is not None:
+                self._compute_embeddings(frame, detections, det_embs, high)
+                rows = [i for i, tid in enumerate(track_ids) if self.tracks[tid].get('emb') is not None]
+                if rows:
+                    zeros = np.zeros(self.appearance_encoder.dim, dtype=np.float32)
+                    track_mat = np.stack([self.tracks[track_ids[i]]['emb'] for i in rows])
+                    det_mat = np.stack([det_embs[i] if det_embs[i] is not None else zeros for i in high])
+                    cost[rows] += self.appearance_weight * cosine_distance(track_mat, det_mat)
+            
+            for ti, ci in self._greedy_assign(np.where(gate, cost, np.inf)):
+                matches[track_ids[ti]] = high[ci]
+                high_matches.add(track_ids[ti])
+                assigned.add(high[ci])
+        
+        # Etapa 2: tracks confirmados que quedaron sin asociar x detecciones bajas, solo por IoU
+        remaining = [tid for tid in track_ids if tid not in matches and self.tracks[tid]['confirmed']]
+        if remaining and low:
+            tboxes = np.array([self.tracks[tid]['box'] for tid in remaining], dtype=np.float32)
+            dboxes = np.array([detections[i] for i in low], dtype=np.float32)
+            iou = self._iou_matrix(tboxes, dboxes)
+            for ti, ci in self._greedy_assign(np.where(iou >= self.low_iou_thresh, 1.0 - iou, np.inf)):
+                matches[remaining[ti]] = low[ci]
+                assigned.add(low[ci])
+        
+        for tid, tinfo in self.tracks.items():
+            if tid in matches:
+                min_idx = matches[tid]
+                # Update track con suavizado de caja (EMA)
+                new_box = detections[min_idx]
+                old_box = tinfo.get('box', new_box)
+                
+                # Aplicar suavizado exponencial a las coordenadas de la caja
+                alpha = self.box_smoothing_alpha
+                smoothed_box = (
+                    int(alpha * new_box[0] + (1 - alpha) * old_box[0]),  # x
+                    int(alpha * new_box[1] + (1 - alpha) * old_box[1]),  # y
+                    int(alpha * new_box[2] + (1 - alpha) * old_box[2]),  # w
+                    int(alpha * new_box[3] + (1 - alpha) * old_box[3])   # h
+                )
+                
+                updated_tracks[tid] = {
+                    'centroid': det_centroids[min_idx],
+                    'box': smoothed_box,
+                    'conf': confidences[min_idx],
+                    'lost': 0,
+                    'emb': tinfo.get('emb'),
+                    'emb_index': tinfo.get('emb_index', 0),
+                    'hits': self._hits_after(tinfo['hits'], confidences[min_idx]),
+                    'confirmed': tinfo['confirmed'],
+                    'born_at': tinfo['born_at'],
+                    'last_seen': current_time
+                }
+                if tid in high_matches:
+                    updated_tracks[tid]['det_idx'] = min_idx
+                if tinfo['lost'] > 0:
+                    self._emit(RECOVERED, tid, updated_tracks[tid], current_time, lost_frames=tinfo['lost'])
+            elif not tinfo['confirmed']:
+                # Track tentativo sin asociar: falso positivo probable, se descarta sin contarlo
+                self._emit(TERMINATED, tid, tinfo, current_time, confirmed=False, reason='unconfirmed')
+                continue
+            else:
+                # Mark as lost - mantener última caja conocida
+                if tinfo['lost'] + 1 < self.max_lost:
+                    updated_tracks[tid] = dict(tinfo, lost=tinfo['lost'] + 1)
+                    if tinfo['lost'] == 0:
+                        self._emit(LOST, tid, tinfo, current_time)
+                else:
+                    self._retire_track(tid, tinfo, current_time)
+        
+        # Embeddings en un solo lote: detecciones altas nuevas + tracks cuyo embedding cacheado venció
+        if self.appearance_encoder is not None and frame is not None:
+            stale = [tid for tid, tinfo in updated_tracks.items() if 'det_idx' in tinfo and (
+                tinfo['emb'] is None or self.update_index - tinfo['emb_index'] >= self.embedding_refresh)]
+            pending = [idx for idx in high if idx not in assigned]
+            pending += [updated_tracks[tid]['det_idx'] for tid in stale]
+            self._compute_embeddings(frame, detections, det_embs, pending)
+            for tid in stale:
+                tinfo = updated_tracks[tid]
+                det_emb = det_embs.get(tinfo['det_idx'])
+                if det_emb is None:
+                    continue
+                if tinfo['emb'] is not None:
+                    det_emb = self.embedding_alpha * det_emb + (1 - self.embedding_alpha) * tinfo['emb']
+                    det_emb /= max(np.linalg.norm(det_emb), 1e-6)
+                tinfo['emb'] = det_emb
+                tinfo['emb_index'] = self.update_index
+        for tinfo in updated_tracks.values():
+            tinfo.pop('det_idx', None)
+        
+        # Add new tracks for unassigned detections (solo altas; las bajas sin track se descartan)
+        for idx in high:
+            if idx not in assigned:
+                cent = det_centroids[idx]
+                new_box = detections[idx]
+                
+                # Verificar si esta nueva detección se superpone significativamente con algún track perdido
+                overlapping_tracks = []
+                for tid, tinfo in updated_tracks.items():
+                    if tinfo['lost'] > 0:  # Solo verificar tracks perdidos
+                        iou = self._iou(new_box, tinfo['box'])
+                        if iou > 0.5:  # Si hay más de 50% de superposición
+                            overlapping_tracks.append((tid, iou, tinfo['lost']))
+                
+                # Si hay superposición, eliminar el track antiguo y crear uno nuevo
+                if overlapping_tracks:
+                    # Ordenar por IoU descendente y lost ascendente (preferir eliminar los más perdidos)
+                    overlapping_tracks.sort(key=lambda x: (-x[2], -x[1]))
+                    # Eliminar el track más perdido que se superpone
+                    tid_to_remove = overlapping_tracks[0][0]
+                    self._retire_track(tid_to_remove, updated_tracks.pop(tid_to_remove), current_time, reason='replaced')
+                
+                # Crear track tentativo (se cuenta como persona recién al confirmarse)
+                updated_tracks[self.next_id] = {
+                    'centroid': cent,
+                    'box': new_box,
+                    'conf': confidences[idx],
+                    'lost': 0,
+                    'emb': det_embs.get(idx),
+                    'emb_index': self.update_index,
+                    'hits': self._hits_after(0, confidences[idx]),
+                    'confirmed': False,
+                    'born_at': current_time,
+                    'last_seen': current_time
+                }
+                self._emit(BORN, self.next_id, updated_tracks[self.next_id], current_time)
+                self.next_id += 1
+        
+        # Confirmar tracks tentativos con suficientes asociaciones; antes de contar una persona nueva,
+        # buscarla entre los tracks terminados
+        for tid in [tid for tid, tinfo in updated_tracks.items()
+                    if not tinfo['confirmed'] and tinfo['hits'] >= self.min_hits]:
+            tinfo = updated_tracks[tid]
+            tinfo['confirmed'] = True
+            track_id = None
+            if self.reid_store is not None:
+                track_id = self.reid_store.match(tinfo['centroid'], tinfo['emb'], current_time)
+            if track_id is not None and track_id not in updated_tracks:
+                updated_tracks[track_id] = updated_tracks.pop(tid)
+                self.reid_count += 1
+                self._emit(CONFIRMED, track_id, tinfo, current_time, reidentified=True, provisional_id=tid)
+            else:
+                self.unique_ids.add(tid)
+                self._emit(CONFIRMED, tid, tinfo, current_time, reidentified=False)
+        
+        # Remove tracks lost for too long
+        self.tracks = {tid: tinfo for tid, tinfo in updated_tracks.items() if tinfo['lost'] < self.max_lost}
+        # Count current unique persons (active tracks)
+        current_ids = [tid for tid, tinfo in self.tracks.items() if tinfo['confirmed']]
+        self.last_count = len(current_ids)
+        # History for smoothing (not used for unique count)
+        self.detection_history.append(current_detections)
+        if len(self.detection_history) > self.max_history:
+            self.detection_history.pop(0)
+        avg_fps = round(self.current_fps, 1)
+        avg_frame_latency = round(sum(self.frame_latency_history) / len(self.frame_latency_history), 1) if self.frame_latency_history else 0
+        avg_rtt = round(sum(self.rtt_history) / len(self.rtt_history), 1) if self.rtt_history else 0
+        stats = {
+            'fps': avg_fps,
+            'frame_latency': avg_frame_latency,
+            'rtt': avg_rtt,
+            'tiempo_total': round(current_time - self.start_time, 1),
+            'detecciones_totales': len(self.unique_ids),
+            'personas_actuales': self.last_count,
+            'tracks_tentativos': len(self.tracks) - self.last_count,
+            'reidentificaciones': self.reid_count
+        }
+        return self.last_count, stats
+    
+    def lost_regions(self, max_age_sec=3.0, now=None):
+        """Cajas donde se perdieron personas: tracks aún perdidos y retirados hace menos de max_age_sec (recientes primero)"""
+        now = time.time() if now is None else now
+        regions = [tinfo['box'] for tinfo in sorted(self.tracks.values(), key=lambda t: t['lost'])
+                   if tinfo['lost'] > 0 and tinfo['confirmed']]
+        regions += [box for box, retired_at in reversed(self.recently_lost) if now - retired_at <= max_age_sec]
+        return regions
+    
+    def get_smoothed_detections(self):
+        """Retorna las cajas de detección suavizadas de todos los tracks activos confirmados"""
+        smoothed_dets = []
+        for tid, tinfo in self.tracks.items():
+            if not tinfo['confirmed']:
+                continue
+            box = tinfo.get('box', None)
+            conf = tinfo.get('conf', None)
+            if box and box != (0, 0, 0, 0):
+                smoothed_dets.append((box, conf))
+        return smoothed_dets
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+Fallback de detección de rostro asíncrono y acotado
+Cuando YOLO deja de ver personas, busca rostros (Haar multi-escala) solo en
+las regiones donde se perdieron tracks recientemente, en un hilo aparte y con
+un presupuesto de tiempo por búsqueda. El bucle principal entrega los
+recortes y recoge los rostros cuando llegan: nunca espera al detector
+"""
+
+import threading
+import time
+
+import cv2
+
+
+class FaceFallbackWorker:
+    """Detector de rostros en segundo plano sobre ROIs; un solo pedido pendiente (el más nuevo reemplaza al anterior)"""
+
+    def __init__(self, cascade, time_budget_ms=15.0, roi_margin=0.5, max_rois=4,
+                 scale_factor=1.1, min_neighbors=5, min_size=(24, 24)):
+        self.cascade = cascade
+        self.time_budget = time_budget_ms / 1000.0
+        self.roi_margin = roi_margin      # Expansión de cada región perdida (fracción de su tamaño)
+        self.max_rois = max_rois
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+        self._condition = threading.Condition()
+        self._request = None              # (índice de frame, [(x0, y0, recorte BGR)])
+        self._result = None               # (índice de frame, detecciones)
+        self._running = False
+        self._thread = None
+        # Estadísticas
+        self.requests = 0
+        self.replaced = 0                 # Pedidos sobrescritos antes de procesarse
+        self.searches = 0
+        self.rois_searched = 0
+        self.rois_skipped = 0             # ROIs que no entraron en el presupuesto
+        self.faces_found = 0
+        self.stale_results = 0
+        self.busy_time = 0.0
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name='face-fallback', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        with self._condition:
+            self._condition.notify_all()
+
+    def rois_for(self, regions, frame_shape):
+        """Regiones perdidas (x, y, w, h) -> ROIs expandidas y recortadas al frame (x0, y0, x1, y1)"""
+        height, width = frame_shape[:2]
+        rois = []
+        for x, y, w, h in regions[:self.max_rois]:
+            mx, my = int(w * self.roi_margin), int(h * self.roi_margin)
+            x0, y0 = max(0, x - mx), max(0, y - my)
+            x1, y1 = min(width, x + w + mx), min(height, y + h + my)
+            if x1 - x0 >= self.min_size[0] and y1 - y0 >= self.min_size[1]:
+                rois.append((x0, y0, x1, y1))
+        return rois
+
+    def submit(self, frame, regions, frame_index):
+        """
+        Pide una búsqueda alrededor de 'regions' (cajas de tracks perdidos, más recientes primero).
+        Solo copia los recortes; retorna False si no hay ninguna ROI útil
+        """
+        if not self._running:
+            return False
+        crops = [(x0, y0, frame[y0:y1, x0:x1].copy()) for x0, y0, x1, y1 in self.rois_for(regions, frame.shape)]
+        if not crops:
+            return False
+        with self._condition:
+            if self._request is not None:
+                self.replaced += 1
+            self._request = (frame_index, crops)
+            self.requests += 1
+            self._condition.notify()
+        return True
+
+    def poll(self, frame_index=None, max_age_frames=None):
+        """Rostros de la última búsqueda terminada como detecciones ((x, y, w, h), None), una sola vez; None si no hay"""
+        with self._condition:
+            result, self._result = self._result, None
+        if result is None:
+            return None
+        source_index, detections = result
+        if max_age_frames is not None and frame_index is not None and frame_index - source_index > max_age_frames:
+            self.stale_results += 1
+            return None
+        return detections
+
+    def _loop(self):
+        while self._running:
+            with self._condition:
+                while self._request is None and self._running:
+                    self._condition.wait(0.5)
+                if not self._running:
+                    return
+                frame_index, crops = self._request
+                self._request = None
+            detections = self._search(crops)
+            with self._condition:
+                self._result = (frame_index, detections)
+
+    def _search(self, crops):
+        start = time.perf_counter()
+        detections = []
+        for i, (x0, y0, crop) in enumerate(crops):
+            if i and time.perf_counter() - start >= self.time_budget:
+                self.rois_skipped += len(crops) - i
+                break
+            gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+            try:
+                faces = self.cascade.detectMultiScale(gray, scaleFactor=self.scale_factor,
+                                                      minNeighbors=self.min_neighbors, minSize=self.min_size,
+                                                      maxSize=(gray.shape[1], gray.shape[0]))
+            except cv2.error as e:
+                print(f"Error en deteccion de rostro: {e}")
+                continue
+            self.rois_searched += 1
+            for fx, fy, fw, fh in faces:
+                # Rostro tratado como 1 detección (sin confianza), en coordenadas del frame
+                box = (int(x0 + fx), int(y0 + fy), int(fw), int(fh))
+                cx, cy = box[0] + box[2] // 2, box[1] + box[3] // 2
+                # ROIs solapadas pueden encontrar el mismo rostro dos veces
+                if not any(bx <= cx < bx + bw and by <= cy < by + bh for (bx, by, bw, bh), _ in detections):
+                    detections.append((box, None))
+        self.searches += 1
+        self.faces_found += len(detections)
+        self.busy_time += time.perf_counter() - start
+        return detections
+
+    def stats(self):
+        return {
+            'requests': self.requests,
+            'replaced': self.replaced,
+            'searches': self.searches,
+            'rois_searched': self.rois_searched,
+            'rois_skipped': self.rois_skipped,
+            'faces_found': self.faces_found,
+            'stale_results': self.stale_results,
+            'avg_ms': 1000 * self.busy_time / self.searches if self.searches else 0.0,
+        }
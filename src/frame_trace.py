@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Trazas de latencia por frame a lo largo del pipeline
+Cada frame registra marcas de tiempo monotónicas (perf_counter_ns) en cada
+etapa; el colector las guarda en un buffer circular NumPy, calcula el
+desglose por etapa y exporta en formato Chrome trace-event (chrome://tracing)
+"""
+
+import json
+import time
+
+import numpy as np
+
+# Etapas en orden; el tramo de cada etapa va desde la marca anterior hasta la suya
+STAGES = ('first_byte', 'jpeg_complete', 'dequeued', 'decoded', 'preprocessed',
+          'inference_start', 'inference_end', 'tracked', 'displayed')
+(FIRST_BYTE, JPEG_COMPLETE, DEQUEUED, DECODED, PREPROCESSED,
+ INFERENCE_START, INFERENCE_END, TRACKED, DISPLAYED) = range(len(STAGES))
+
+# Nombre del tramo que termina en cada etapa (para el panel y el trace)
+SPAN_LABELS = (None, 'Red', 'Cola', 'Decodif.', 'Preproc.', 'Espera', 'YOLO', 'Tracker', 'Dibujo')
+# Pista del trace: red y cola se solapan con el procesamiento del frame anterior
+SPAN_TRACKS = (None, 1, 2, 3, 3, 3, 3, 3, 3)
+
+
+class FrameTracer:
+    """Colector de trazas de bajo costo: una lista por frame en curso y un ring NumPy"""
+
+    def __init__(self, capacity=2048, enabled=True):
+        self.enabled = enabled
+        self.capacity = capacity
+        self.data = np.zeros((capacity, len(STAGES)), dtype=np.int64)  # 0 = etapa no ocurrida
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.index = 0
+        self.count = 0
+        self.frame_id = 0
+        self._row = [0] * len(STAGES)
+
+    def start(self, first_byte_s=None):
+        """Comienza la traza de un frame; first_byte_s en segundos de perf_counter"""
+        if not self.enabled:
+            return
+        self.frame_id += 1
+        row = self._row
+        for i in range(len(row)):
+            row[i] = 0
+        row[FIRST_BYTE] = int(first_byte_s * 1e9) if first_byte_s is not None else time.perf_counter_ns()
+
+    def mark(self, stage, t_s=None):
+        """Marca una etapa del frame en curso (ahora, o en t_s segundos de perf_counter)"""
+        if self.enabled:
+            self._row[stage] = int(t_s * 1e9) if t_s is not None else time.perf_counter_ns()
+
+    def finish(self):
+        """Cierra el frame en curso y lo guarda en el buffer circular"""
+        if not self.enabled:
+            return
+        self.data[self.index] = self._row
+        self.ids[self.index] = self.frame_id
+        self.index = (self.index + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def _recent(self, last_n=None):
+        """Últimos frames en orden cronológico (ids, marcas)"""
+        n = self.count if last_n is None else min(last_n, self.count)
+        order = (self.index - n + np.arange(n)) % self.capacity
+        return self.ids[order], self.data[order]
+
+    def breakdown(self, last_n=60):
+        """
+        Promedio en ms de cada tramo y del total (primer byte -> mostrado).
+        Las etapas que no ocurrieron (ej. sin inferencia) toman la marca anterior: tramo 0
+        """
+        if self.count == 0:
+            return None
+        _, marks = self._recent(last_n)
+        filled = np.maximum.accumulate(marks, axis=1)
+        spans = np.diff(filled, axis=1) / 1e6
+        result = {SPAN_LABELS[i + 1]: float(spans[:, i].mean()) for i in range(spans.shape[1])}
+        result['Total'] = float((filled[:, -1] - filled[:, 0]).mean() / 1e6)
+        return result
+
+    def export_chrome_trace(self, path):
+        """Guarda los frames del buffer como eventos 'X' (duración) de Chrome trace-event"""
+        ids, marks = self._recent()
+        if not ids.size:
+            return 0
+        origin = int(marks[marks > 0].min())
+        events = [{'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': tid, 'args': {'name': name}}
+                  for tid, name in ((1, 'Red'), (2, 'Cola'), (3, 'Procesamiento'))]
+        for frame_id, row in zip(ids.tolist(), marks.tolist()):
+            previous = row[FIRST_BYTE]
+            for stage in range(1, len(STAGES)):
+                if row[stage] == 0:
+                    continue
+                events.append({
+                    'name': SPAN_LABELS[stage], 'cat': 'frame', 'ph': 'X',
+                    'ts': (previous - origin) / 1000, 'dur': (row[stage] - previous) / 1000,
+                    'pid': 1, 'tid': SPAN_TRACKS[stage], 'args': {'frame': frame_id},
+                })
+                previous = row[stage]
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        return len(ids)
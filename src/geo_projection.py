@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+Geo-proyección de detecciones a coordenadas de terreno
+Convierte las cajas de personas (píxeles) a latitud/longitud usando
+los intrínsecos de la cámara y la telemetría del dron (altitud y actitud)
+"""
+
+import math
+import time
+from functools import lru_cache
+
+import numpy as np
+
+EARTH_RADIUS_M = 6378137.0  # Radio ecuatorial WGS84
+
+# Cámara montada mirando hacia abajo (nadir):
+#   eje x de imagen (derecha) -> eje y del cuerpo (derecha del dron)
+#   eje y de imagen (abajo)   -> eje -x del cuerpo (hacia atrás)
+#   eje óptico z              -> eje z del cuerpo (hacia abajo)
+R_BODY_CAM = np.array([
+    [0.0, -1.0, 0.0],
+    [1.0,  0.0, 0.0],
+    [0.0,  0.0, 1.0],
+])
+
+
+def _rotation_ned_body(roll_deg, pitch_deg, yaw_deg):
+    """Matriz de rotación cuerpo -> NED (convención aeronáutica Z-Y-X)"""
+    r, p, y = np.radians([roll_deg, pitch_deg, yaw_deg])
+    cr, sr = math.cos(r), math.sin(r)
+    cp, sp = math.cos(p), math.sin(p)
+    cy, sy = math.cos(y), math.sin(y)
+    rz = np.array([[cy, -sy, 0.0], [sy, cy, 0.0], [0.0, 0.0, 1.0]])
+    ry = np.array([[cp, 0.0, sp], [0.0, 1.0, 0.0], [-sp, 0.0, cp]])
+    rx = np.array([[1.0, 0.0, 0.0], [0.0, cr, -sr], [0.0, sr, cr]])
+    return rz @ ry @ rx
+
+
+class GeoProjector:
+    """Proyecta cajas de detección al plano del terreno (lat/lon)"""
+
+    def __init__(self, image_width=400, image_height=300, hfov_deg=66.0,
+                 alt_step_m=0.5, angle_step_deg=0.5, cache_size=256):
+        # Intrínsecos a partir del campo de visión horizontal (pinhole, píxeles cuadrados)
+        self.image_width = image_width
+        self.image_height = image_height
+        fx = (image_width / 2.0) / math.tan(math.radians(hfov_deg) / 2.0)
+        self.K = np.array([
+            [fx, 0.0, image_width / 2.0],
+            [0.0, fx, image_height / 2.0],
+            [0.0, 0.0, 1.0],
+        ])
+        self.K_inv = np.linalg.inv(self.K)
+        # Cuantización de la telemetría para reutilizar homografías entre frames
+        self.alt_step_m = alt_step_m
+        self.angle_step_deg = angle_step_deg
+        self._homography = lru_cache(maxsize=cache_size)(self._compute_homography)
+
+    def _compute_homography(self, alt_q, roll_q, pitch_q, yaw_q):
+        """Homografía píxel -> (Norte, Este) en metros relativos al dron"""
+        alt = alt_q * self.alt_step_m
+        step = self.angle_step_deg
+        m = _rotation_ned_body(roll_q * step, pitch_q * step, yaw_q * step) @ R_BODY_CAM @ self.K_inv
+        # Intersección del rayo con el plano z = alt (NED, z hacia abajo)
+        H = np.vstack([alt * m[0], alt * m[1], m[2]])
+        H.setflags(write=False)
+        return H
+
+    def homography(self, telemetry):
+        """Retorna la homografía (cacheada) para la telemetría dada"""
+        return self._homography(
+            int(round(telemetry['alt'] / self.alt_step_m)),
+            int(round(telemetry.get('roll', 0.0) / self.angle_step_deg)),
+            int(round(telemetry.get('pitch', 0.0) / self.angle_step_deg)),
+            int(round(telemetry.get('yaw', 0.0) / self.angle_step_deg)),
+        )
+
+    def project_boxes(self, boxes, telemetry):
+        """
+        Proyecta todas las cajas (N, 4) en formato (x, y, w, h) en una sola operación.
+        telemetry: dict con 'lat', 'lon' (grados), 'alt' (m sobre el terreno)
+                   y opcionalmente 'roll', 'pitch', 'yaw' (grados)
+        Retorna un array (N, 2) de (lat, lon); NaN si el punto está sobre el horizonte.
+        """
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        if boxes.shape[0] == 0:
+            return np.empty((0, 2))
+
+        # Punto de apoyo: centro inferior de la caja (pies de la persona)
+        pts = np.empty((boxes.shape[0], 3))
+        pts[:, 0] = boxes[:, 0] + boxes[:, 2] * 0.5
+        pts[:, 1] = boxes[:, 1] + boxes[:, 3]
+        pts[:, 2] = 1.0
+
+        ground = pts @ self.homography(telemetry).T
+        with np.errstate(divide='ignore', invalid='ignore'):
+            north = ground[:, 0] / ground[:, 2]
+            east = ground[:, 1] / ground[:, 2]
+        behind = ground[:, 2] <= 0
+        north[behind] = np.nan
+        east[behind] = np.nan
+
+        lat0 = telemetry['lat']
+        out = np.empty((boxes.shape[0], 2))
+        out[:, 0] = lat0 + np.degrees(north / EARTH_RADIUS_M)
+        out[:, 1] = telemetry['lon'] + np.degrees(east / (EARTH_RADIUS_M * math.cos(math.radians(lat0))))
+        return out
+
+    def project_detections(self, detections, telemetry):
+        """Proyecta la salida de DetectionTracker.get_smoothed_detections()"""
+        boxes = [box for box, _conf in detections]
+        latlon = self.project_boxes(boxes, telemetry)
+        return [(det, (float(lat), float(lon))) for det, (lat, lon) in zip(detections, latlon)]
+
+
+def benchmark(n_boxes=20, iterations=5000):
+    """Mide el costo por frame de la proyección (objetivo: < 1 ms)"""
+    projector = GeoProjector()
+    rng = np.random.default_rng(0)
+    boxes = np.column_stack([
+        rng.integers(0, 350, n_boxes), rng.integers(0, 250, n_boxes),
+        rng.integers(10, 50, n_boxes), rng.integers(20, 50, n_boxes),
+    ])
+    telemetry = {'lat': -12.0686, 'lon': -77.0790, 'alt': 30.0, 'roll': 1.2, 'pitch': -2.5, 'yaw': 45.0}
+
+    # Peor caso: la actitud cambia en cada frame (sin aciertos de cache)
+    start = time.perf_counter()
+    for i in range(iterations):
+        telemetry['yaw'] = (i * 0.5) % 360
+        projector.project_boxes(boxes, telemetry)
+    cold_ms = (time.perf_counter() - start) * 1000 / iterations
+
+    # Caso típico: telemetría estable entre frames (homografía cacheada)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        projector.project_boxes(boxes, telemetry)
+    warm_ms = (time.perf_counter() - start) * 1000 / iterations
+
+    print(f"Cajas por frame: {n_boxes}")
+    print(f"  Sin cache:   {cold_ms:.4f} ms/frame")
+    print(f"  Con cache:   {warm_ms:.4f} ms/frame")
+    print(f"  Objetivo < 1 ms: {'✅' if max(cold_ms, warm_ms) < 1.0 else '❌'}")
+    return {'cold_ms': cold_ms, 'warm_ms': warm_ms}
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Preprocesamiento de frames en GPU para YOLO (solo hosts CUDA)
+El frame BGR se copia a un buffer de staging en memoria fijada (pinned) y se
+sube con una copia asíncrona en un stream CUDA propio; el resize, BGR->RGB,
+la normalización a 0-1 y la conversión a FP16 ocurren en la GPU. El tensor
+resultante (1x3xHxW) se entrega directo a ultralytics, que no vuelve a
+letterboxear. Sin CUDA (o sin torch) queda inactivo y se usa el camino de CPU
+"""
+
+import time
+
+try:
+    import torch
+    import torch.nn.functional as F
+except ImportError:
+    torch = None
+
+
+class _StagingSlot:
+    """Buffer pinned + tensor en GPU + evento de fin de copia (uno por frame en vuelo)"""
+
+    def __init__(self, shape, device):
+        self.host = torch.empty(shape, dtype=torch.uint8, pin_memory=True)
+        self.host_np = self.host.numpy()        # Vista NumPy del mismo buffer (se copia sin asignar memoria)
+        self.device_u8 = torch.empty(shape, dtype=torch.uint8, device=device)
+        self.copied = torch.cuda.Event()        # La copia H2D terminó: el buffer pinned se puede reescribir
+        self.ready = torch.cuda.Event()         # El tensor preprocesado está listo para inferir
+        self.output = None
+
+
+class CUDAPreprocessor:
+    """
+    Sube y preprocesa frames para YOLO en la GPU. submit() encola la copia y el
+    preprocesamiento en el stream de copia y retorna de inmediato (la CPU sigue con
+    el resto del frame); tensor() hace que el stream de inferencia espere solo a
+    ese frame. Slots alternados: subir el frame N+1 no espera a que la GPU termine
+    con el N, solo a que su propio buffer pinned se haya copiado
+    """
+
+    def __init__(self, target_size, device='cuda', half=True, slots=2):
+        self.target_size = target_size      # (ancho, alto) de entrada a YOLO (múltiplos de 32: sin letterbox)
+        self.half = half
+        self.enabled = torch is not None and torch.cuda.is_available() and str(device).startswith('cuda')
+        self.device = torch.device(device) if self.enabled else None
+        self.n_slots = slots
+        self._slots = []
+        self._slot_shape = None
+        self._next = 0
+        self._stream = torch.cuda.Stream(device=self.device) if self.enabled else None
+        # Estadísticas
+        self.frames = 0
+        self.reallocations = 0
+        self.submit_time = 0.0               # Tiempo de CPU en submit (sin esperar a la GPU)
+
+    @property
+    def backend(self):
+        return f"cuda ({'fp16' if self.half else 'fp32'}, pinned)" if self.enabled else 'cpu'
+
+    def _slot_for(self, shape):
+        if self._slot_shape != shape:
+            # Cambió la resolución (la ESP32 cambió de calidad): reasignar staging
+            torch.cuda.synchronize(self.device)
+            self._slots = [_StagingSlot(shape, self.device) for _ in range(self.n_slots)]
+            self._slot_shape = shape
+            self.reallocations += 1
+        slot = self._slots[self._next]
+        self._next = (self._next + 1) % self.n_slots
+        return slot
+
+    def submit(self, frame):
+        """
+        Encola la subida y el preprocesamiento de un frame BGR (HxWx3 uint8).
+        Retorna un handle para tensor(), o None si la GPU falló (se desactiva y sigue la CPU)
+        """
+        if not self.enabled:
+            return None
+        start = time.perf_counter()
+        try:
+            slot = self._slot_for(frame.shape)
+            # Antes de reescribir el buffer pinned, su copia anterior tiene que haber terminado
+            slot.copied.synchronize()
+            slot.host_np[...] = frame
+            width, height = self.target_size
+            with torch.cuda.stream(self._stream):
+                slot.device_u8.copy_(slot.host, non_blocking=True)
+                slot.copied.record(self._stream)
+                # HWC BGR uint8 -> 1x3xHxW RGB en 0-1, redimensionado como INTER_AREA
+                image = slot.device_u8.permute(2, 0, 1).flip(0).unsqueeze(0).float()
+                if image.shape[2:] != (height, width):
+                    image = F.interpolate(image, size=(height, width), mode='area')
+                image = image.mul_(1.0 / 255.0)
+                slot.output = image.half() if self.half else image
+                slot.ready.record(self._stream)
+        except RuntimeError as e:  # Errores CUDA (incluida falta de memoria)
+            self.disable(e)
+            return None
+        self.frames += 1
+        self.submit_time += time.perf_counter() - start
+        return slot
+
+    def tensor(self, handle):
+        """Tensor listo para el modelo: el stream actual (inferencia) espera al preprocesamiento de ese frame"""
+        torch.cuda.current_stream(self.device).wait_event(handle.ready)
+        output = handle.output
+        # El tensor se creó en el stream de copia y se usa en el de inferencia
+        output.record_stream(torch.cuda.current_stream(self.device))
+        return output
+
+    def disable(self, reason):
+        """Volver al camino de CPU (p. ej. si la versión de ultralytics no acepta tensores)"""
+        if self.enabled:
+            print(f"[GPU] Preprocesamiento en GPU desactivado ({reason}); usando CPU")
+        self.enabled = False
+        self._slots = []
+        self._slot_shape = None
+
+    def stats(self):
+        return {
+            'backend': self.backend,
+            'frames': self.frames,
+            'submit_ms': 1000 * self.submit_time / self.frames if self.frames else 0.0,
+            'reallocations': self.reallocations,
+        }
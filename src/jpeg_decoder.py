@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+Decodificación JPEG rápida con escalado en el dominio DCT
+Usa libjpeg-turbo vía PyTurboJPEG si está instalado (decodifica directo en un
+buffer reutilizable) y si no OpenCV con IMREAD_REDUCED_*; en ambos casos
+elige la mayor reducción (1/2, 1/4, 1/8) que no baje del tamaño que necesita
+el consumidor más grande (pantalla / YOLO)
+"""
+
+import time
+
+import cv2
+import numpy as np
+
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR, TJFLAG_FASTDCT, TJFLAG_FASTUPSAMPLE
+except ImportError:
+    TurboJPEG = None
+
+# Reducción -> flag de OpenCV equivalente
+_CV_REDUCED = {1: cv2.IMREAD_COLOR, 2: cv2.IMREAD_REDUCED_COLOR_2,
+               4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}
+# Marcadores SOF (inicio de frame) que llevan las dimensiones; C4, C8 y CC son otra cosa
+_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def jpeg_dimensions(data):
+    """(ancho, alto) leídos del segmento SOF sin decodificar; None si el JPEG está truncado o no es válido"""
+    view = memoryview(data)
+    size = len(view)
+    if size < 4 or view[0] != 0xFF or view[1] != 0xD8:
+        return None
+    i = 2
+    while i + 9 < size:
+        if view[i] != 0xFF:
+            return None
+        marker = view[i + 1]
+        if marker == 0xFF:  # Relleno entre segmentos
+            i += 1
+            continue
+        if marker in _SOF_MARKERS:
+            return (view[i + 7] << 8 | view[i + 8], view[i + 5] << 8 | view[i + 6])
+        if marker == 0xDA:  # Inicio de scan sin SOF previo
+            return None
+        i += 2 + (view[i + 2] << 8 | view[i + 3])
+    return None
+
+
+def choose_reduction(width, height, target_size, reductions=(8, 4, 2)):
+    """Mayor divisor con el que la imagen decodificada sigue cubriendo target_size (ancho, alto)"""
+    if target_size is None:
+        return 1
+    target_w, target_h = target_size
+    for r in reductions:
+        if -(-width // r) >= target_w and -(-height // r) >= target_h:
+            return r
+    return 1
+
+
+class JPEGDecoder:
+    """Decodificador BGR con escalado DCT; backend 'turbojpeg' si está disponible, si no 'opencv'"""
+
+    def __init__(self, target_size=None, prefer_turbojpeg=True, fast_dct=True, reuse_buffer=True):
+        self.target_size = target_size   # (ancho, alto) del consumidor más grande; None = tamaño completo
+        self.reuse_buffer = reuse_buffer
+        self.turbo = None
+        if prefer_turbojpeg and TurboJPEG is not None:
+            try:
+                self.turbo = TurboJPEG()
+            except (OSError, RuntimeError) as e:
+                print(f"[WARN] PyTurboJPEG instalado pero sin libturbojpeg ({e}); usando OpenCV")
+        self.backend = 'turbojpeg' if self.turbo is not None else 'opencv'
+        self.flags = (TJFLAG_FASTDCT | TJFLAG_FASTUPSAMPLE) if (self.turbo is not None and fast_dct) else 0
+        self._supports_dst = True
+        self._buffer = None
+        # Estadísticas
+        self.decodes = 0
+        self.failures = 0
+        self.allocations = 0           # Arrays de salida nuevos (con buffer reutilizable solo al cambiar tamaño)
+        self.decode_time = 0.0
+        self.reductions = {1: 0, 2: 0, 4: 0, 8: 0}
+
+    def _output(self, shape):
+        """Buffer de salida reutilizable (se reasigna solo si cambió la resolución)"""
+        if self._buffer is None or self._buffer.shape != shape:
+            self._buffer = np.empty(shape, dtype=np.uint8)
+            self.allocations += 1
+        return self._buffer
+
+    def _decode_turbo(self, data, reduction):
+        scaling = (1, reduction) if reduction > 1 else None
+        if not (self.reuse_buffer and self._supports_dst):
+            self.allocations += 1
+            return self.turbo.decode(data, pixel_format=TJPF_BGR, scaling_factor=scaling, flags=self.flags)
+        width, height = self._dims
+        shape = (-(-height // reduction), -(-width // reduction), 3)
+        try:
+            return self.turbo.decode(data, pixel_format=TJPF_BGR, scaling_factor=scaling, flags=self.flags,
+                                     dst=self._output(shape))
+        except TypeError:
+            self._supports_dst = False  # PyTurboJPEG anterior a 'dst'
+            return self._decode_turbo(data, reduction)
+
+    def decode(self, data):
+        """
+        JPEG (bytes) -> imagen BGR reducida al menos hasta target_size, o None si no se pudo decodificar.
+        Con buffer reutilizable la imagen se sobrescribe en la siguiente llamada: copiarla si se conserva
+        """
+        start = time.perf_counter()
+        if self.turbo is not None:
+            try:
+                width, height = self.turbo.decode_header(data)[:2]
+            except (OSError, ValueError):
+                self.failures += 1
+                return None
+        else:
+            dims = jpeg_dimensions(data)
+            if dims is None:
+                self.failures += 1
+                return None
+            width, height = dims
+        self._dims = (width, height)
+        reduction = choose_reduction(width, height, self.target_size)
+
+        try:
+            if self.turbo is not None:
+                frame = self._decode_turbo(data, reduction)
+            else:
+                frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), _CV_REDUCED[reduction])
+                self.allocations += frame is not None
+        except (OSError, ValueError, cv2.error):
+            frame = None
+        if frame is None or frame.size == 0:
+            self.failures += 1
+            return None
+        self.decodes += 1
+        self.reductions[reduction] += 1
+        self.decode_time += time.perf_counter() - start
+        return frame
+
+    def stats(self):
+        return {
+            'backend': self.backend,
+            'decodes': self.decodes,
+            'failures': self.failures,
+            'avg_ms': 1000 * self.decode_time / self.decodes if self.decodes else 0.0,
+            'allocations': self.allocations,
+            'reductions': dict(self.reductions),
+        }
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Frames JPEG comprimidos con decodificación diferida
+El lector del stream encola los JPEG tal como llegan (bytes + tiempos); el
+bucle principal toma solo el más reciente y lo decodifica recién cuando lo
+necesita. Los frames que quedaron atrás se descartan sin decodificar
+"""
+
+import threading
+from collections import deque
+
+
+class LazyFrame:
+    """JPEG comprimido + metadatos; la imagen se decodifica en el primer acceso a .image"""
+
+    __slots__ = ('data', 'seq', 'arrived_at', 'first_byte_at', '_decoder', '_image', '_decoded')
+
+    def __init__(self, data, decoder, seq, arrived_at, first_byte_at=None):
+        self.data = data
+        self.seq = seq
+        self.arrived_at = arrived_at                      # JPEG completo (perf_counter)
+        self.first_byte_at = first_byte_at if first_byte_at is not None else arrived_at
+        self._decoder = decoder
+        self._image = None
+        self._decoded = False
+
+    @property
+    def size(self):
+        return len(self.data)
+
+    @property
+    def decoded(self):
+        return self._decoded
+
+    @property
+    def image(self):
+        """Imagen BGR (None si el JPEG no se pudo decodificar). Si el decodificador reutiliza
+        su buffer, la imagen solo es válida hasta la próxima decodificación"""
+        if not self._decoded:
+            self._image = self._decoder.decode(self.data)
+            self._decoded = True
+        return self._image
+
+
+class LatestFrameQueue:
+    """Cola productor/consumidor que entrega siempre el frame más nuevo y descarta (comprimidos) los anteriores"""
+
+    def __init__(self, decoder, max_pending=8):
+        self.decoder = decoder
+        self._pending = deque(maxlen=max_pending)
+        self._condition = threading.Condition()
+        self._seq = 0
+        self.closed = False
+        self.error = None
+        # Estadísticas
+        self.pushed = 0
+        self.delivered = 0
+        self.skipped = 0          # Frames viejos descartados sin decodificar (decodificaciones evitadas)
+        self.skipped_bytes = 0
+
+    def __len__(self):
+        return len(self._pending)
+
+    def push(self, data, arrived_at, first_byte_at=None):
+        """Encola un JPEG (desde el hilo lector); retorna la cantidad pendiente"""
+        with self._condition:
+            self._seq += 1
+            if len(self._pending) == self._pending.maxlen:
+                self._drop(self._pending.popleft())
+            self._pending.append(LazyFrame(data, self.decoder, self._seq, arrived_at, first_byte_at))
+            self.pushed += 1
+            self._condition.notify()
+            return len(self._pending)
+
+    def _drop(self, frame):
+        self.skipped += 1
+        self.skipped_bytes += frame.size
+
+    def latest(self, timeout=None):
+        """
+        Iterable con el frame más reciente (o vacío si no llegó nada en 'timeout' o la cola se cerró).
+        Los pendientes más viejos se descartan sin decodificar
+        """
+        with self._condition:
+            if not self._pending and not self.closed:
+                self._condition.wait(timeout)
+            if not self._pending:
+                return ()
+            frame = self._pending.pop()
+            while self._pending:
+                self._drop(self._pending.popleft())
+            self.delivered += 1
+        return (frame,)
+
+    def close(self, error=None):
+        """Fin del stream (el lector terminó); 'error' se re-lanza en el consumidor con raise_error()"""
+        with self._condition:
+            self.closed = True
+            self.error = self.error or error
+            self._condition.notify_all()
+
+    @property
+    def finished(self):
+        return self.closed and not self._pending
+
+    def raise_error(self):
+        if self.error is not None:
+            raise self.error
+
+    def stats(self):
+        return {
+            'pushed': self.pushed,
+            'delivered': self.delivered,
+            'skipped': self.skipped,
+            'skipped_bytes': self.skipped_bytes,
+        }
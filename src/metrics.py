@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""
+Métricas del servicio de detección en formato de texto de Prometheus
+Registro en proceso con contadores, gauges e histogramas (actualización con
+un lock por métrica, barata para el bucle por frame) y un endpoint HTTP
+local mínimo (/metrics) servido desde un hilo de fondo
+"""
+
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + (extra or [])
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+class _Metric:
+    """Base: nombre, ayuda, etiquetas e hijos por combinación de valores de etiquetas"""
+
+    type_name = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children = {}
+        if registry is not None:
+            registry.register(self)
+
+    def labels(self, *values, **kwargs):
+        """Hijo para una combinación de etiquetas (cachear el resultado en el bucle caliente)"""
+        if kwargs:
+            values = tuple(kwargs[name] for name in self.labelnames)
+        key = tuple(str(v) for v in values)
+        if len(key) != len(self.labelnames):
+            raise ValueError(f"{self.name}: se esperaban etiquetas {self.labelnames}")
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _samples(self):
+        """Lista de (sufijo, valores_etiquetas, etiquetas_extra, valor)"""
+        if self.labelnames:
+            items = list(self._children.items())
+        else:
+            items = [((), self)]
+        samples = []
+        for key, child in items:
+            samples.extend((suffix, key, extra, value) for suffix, extra, value in child._child_samples())
+        return samples
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for suffix, key, extra, value in self._samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(self.labelnames, key, extra)} {_format_value(value)}")
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    """Contador monótono"""
+
+    type_name = 'counter'
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self._value = 0
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return Counter(self.name, self.documentation)
+
+    def inc(self, amount=1):
+        if amount < 0:
+            raise ValueError("Un contador solo puede aumentar")
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self):
+        return self._value
+
+    def _child_samples(self):
+        return [('', None, self._value)]
+
+
+class Gauge(_Metric):
+    """Valor que sube y baja"""
+
+    type_name = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self._value = 0
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return Gauge(self.name, self.documentation)
+
+    def set(self, value):
+        self._value = value  # Una asignación es atómica con el GIL
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    @property
+    def value(self):
+        return self._value
+
+    def _child_samples(self):
+        return [('', None, self._value)]
+
+
+class Histogram(_Metric):
+    """Distribución en buckets acumulativos (le) + suma + cantidad"""
+
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), registry=None, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)  # Último = +Inf
+        self._sum = 0.0
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return Histogram(self.name, self.documentation, buckets=self.buckets)
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def _child_samples(self):
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            samples.append(('_bucket', [('le', _format_value(float(bound)))], cumulative))
+        samples.append(('_sum', None, total))
+        samples.append(('_count', None, cumulative))
+        return samples
+
+
+class MetricsRegistry:
+    """Conjunto de métricas expuestas juntas"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Métrica duplicada: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return Counter(name, documentation, labelnames, registry=self)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return Gauge(name, documentation, labelnames, registry=self)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return Histogram(name, documentation, labelnames, registry=self, buckets=buckets)
+
+    def expose(self):
+        """Texto en formato de exposición de Prometheus (versión 0.0.4)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(m.expose() for m in metrics) + '\n'
+
+
+def start_metrics_server(registry, port=9108, host='127.0.0.1'):
+    """Sirve GET /metrics en un hilo de fondo; retorna el servidor (server.shutdown() para detener)"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/metrics', '/'):
+                self.send_error(404)
+                return
+            body = registry.expose().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # Sin logs por request (el scraper consulta cada pocos segundos)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    return server
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+Retransmisión MJPEG/HTTP del video procesado a varios espectadores
+Cada frame se codifica una sola vez (en un hilo aparte) y los mismos bytes se
+comparten con todos los clientes; cada cliente tiene un slot con el último
+frame, así un espectador lento salta frames en vez de frenar el pipeline
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+
+BOUNDARY = 'frame'
+
+
+class _ClientSlot:
+    """Último frame pendiente de un cliente (se sobrescribe si el cliente no alcanzó a enviarlo)"""
+
+    def __init__(self, address):
+        self.address = address
+        self.connected_at = time.time()
+        self.condition = threading.Condition()
+        self.part = None
+        self.seq = 0
+        self.published_at = 0.0
+        self.sent = 0
+        self.dropped = 0       # Frames sobrescritos antes de enviarse
+        self.lag_ms = 0.0      # EMA de publicación -> enviado
+        self.closed = False
+
+    def put(self, part, seq, published_at):
+        with self.condition:
+            if self.part is not None:
+                self.dropped += 1
+            self.part, self.seq, self.published_at = part, seq, published_at
+            self.condition.notify()
+
+    def take(self, timeout):
+        with self.condition:
+            if self.part is None and not self.closed:
+                self.condition.wait(timeout)
+            part, published_at = self.part, self.published_at
+            self.part = None
+            return part, published_at
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+
+
+class MJPEGRestreamServer:
+    """Servidor MJPEG: /stream (multipart), /snapshot.jpg y /stats (JSON con tiempos y lag por cliente)"""
+
+    def __init__(self, host='0.0.0.0', port=8090, quality=80, max_fps=None):
+        self.host = host
+        self.port = port
+        self.quality = quality
+        self.min_interval = 1.0 / max_fps if max_fps else 0.0
+        self.clients = []
+        self.frames_published = 0
+        self.frames_encoded = 0
+        self.encode_ms = 0.0           # EMA del tiempo de codificación
+        self.latest_jpeg = None
+        self._lock = threading.Lock()
+        self._pending = None            # (imagen, tiempo de publicación): slot del codificador
+        self._pending_cond = threading.Condition()
+        self._last_encode_at = 0.0
+        self._running = False
+        self._server = None
+
+    # ===== Publicación =====
+
+    def publish(self, image):
+        """Entrega un frame (BGR) para retransmitir; O(1): la codificación ocurre en otro hilo"""
+        if not self._running:
+            return
+        self.frames_published += 1
+        with self._pending_cond:
+            self._pending = (image, time.perf_counter())
+            self._pending_cond.notify()
+
+    def _encode_loop(self):
+        params = [cv2.IMWRITE_JPEG_QUALITY, self.quality]
+        while self._running:
+            with self._pending_cond:
+                while self._pending is None and self._running:
+                    self._pending_cond.wait(0.5)
+                if not self._running:
+                    return
+                image, published_at = self._pending
+                self._pending = None
+            with self._lock:
+                clients = list(self.clients)
+            if not clients or published_at - self._last_encode_at < self.min_interval:
+                continue  # Nadie mirando (o sobre el FPS máximo): no se codifica
+            self._last_encode_at = published_at
+
+            start = time.perf_counter()
+            ok, buf = cv2.imencode('.jpg', image, params)  # imencode libera el GIL
+            if not ok:
+                continue
+            jpeg = buf.tobytes()
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.encode_ms = elapsed_ms if self.frames_encoded == 0 else 0.9 * self.encode_ms + 0.1 * elapsed_ms
+            self.frames_encoded += 1
+            self.latest_jpeg = jpeg
+
+            # Mismos bytes para todos los clientes
+            part = (f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(jpeg)}\r\n\r\n").encode() \
+                + jpeg + b"\r\n"
+            for slot in clients:
+                slot.put(part, self.frames_encoded, published_at)
+
+    # ===== HTTP =====
+
+    def _serve_stream(self, handler):
+        slot = _ClientSlot(f"{handler.client_address[0]}:{handler.client_address[1]}")
+        handler.send_response(200)
+        handler.send_header('Content-Type', f'multipart/x-mixed-replace; boundary={BOUNDARY}')
+        handler.send_header('Cache-Control', 'no-cache, private')
+        handler.send_header('Pragma', 'no-cache')
+        handler.end_headers()
+        with self._lock:
+            self.clients.append(slot)
+        print(f"[RESTREAM] Cliente conectado: {slot.address} ({len(self.clients)} en total)")
+        try:
+            while self._running:
+                part, published_at = slot.take(timeout=1.0)
+                if part is None:
+                    continue
+                handler.wfile.write(part)
+                handler.wfile.flush()
+                slot.sent += 1
+                lag_ms = (time.perf_counter() - published_at) * 1000
+                slot.lag_ms = lag_ms if slot.sent == 1 else 0.9 * slot.lag_ms + 0.1 * lag_ms
+        except (BrokenPipeError, ConnectionResetError, ConnectionAbortedError, TimeoutError):
+            pass
+        finally:
+            slot.close()
+            with self._lock:
+                if slot in self.clients:
+                    self.clients.remove(slot)
+            print(f"[RESTREAM] Cliente desconectado: {slot.address} ({slot.sent} enviados, "
+                  f"{slot.dropped} saltados, lag {slot.lag_ms:.0f} ms)")
+
+    def stats(self):
+        """Tiempo de codificación y estado de cada cliente"""
+        with self._lock:
+            clients = list(self.clients)
+        now = time.time()
+        return {
+            'frames_published': self.frames_published,
+            'frames_encoded': self.frames_encoded,
+            'encode_ms': round(self.encode_ms, 2),
+            'clients': [{
+                'address': c.address,
+                'connected_sec': round(now - c.connected_at, 1),
+                'sent': c.sent,
+                'dropped': c.dropped,
+                'lag_ms': round(c.lag_ms, 1),
+            } for c in clients],
+        }
+
+    def start(self):
+        """Inicia el servidor HTTP y el hilo codificador (en segundo plano)"""
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split('?')[0]
+                if path in ('/', '/stream'):
+                    server._serve_stream(self)
+                elif path == '/snapshot.jpg':
+                    jpeg = server.latest_jpeg
+                    if jpeg is None:
+                        self.send_error(503, 'Sin frames codificados todavía')
+                        return
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'image/jpeg')
+                    self.send_header('Content-Length', str(len(jpeg)))
+                    self.end_headers()
+                    self.wfile.write(jpeg)
+                elif path == '/stats':
+                    body = json.dumps(server.stats(), indent=2).encode('utf-8')
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                else:
+                    self.send_error(404)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self._running = True
+        threading.Thread(target=self._server.serve_forever, name='restream-http', daemon=True).start()
+        threading.Thread(target=self._encode_loop, name='restream-encoder', daemon=True).start()
+        return self
+
+    def stop(self):
+        if not self._running:
+            return
+        self._running = False
+        with self._pending_cond:
+            self._pending_cond.notify_all()
+        with self._lock:
+            for slot in self.clients:
+                slot.close()
+        self._server.shutdown()
+        self._server.server_close()
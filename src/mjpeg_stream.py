@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+Demultiplexor MJPEG (multipart/x-mixed-replace) del stream de la ESP32-CAM
+Separa los JPEG del flujo HTTP por chunks; lo usan camera_stream.py y las
+herramientas de diagnóstico de utils/ para medir sobre el mismo parser
+"""
+
+import re
+
+DEFAULT_BOUNDARY = b'--1234567890000000000009876543'
+
+_BOUNDARY_RE = re.compile(r'boundary="?([^";]+)"?', re.IGNORECASE)
+
+
+def boundary_from_content_type(content_type, default=DEFAULT_BOUNDARY):
+    """Extrae el boundary ('--xxxx') del header Content-Type, o el default"""
+    match = _BOUNDARY_RE.search(content_type or '')
+    if not match:
+        return default
+    boundary = match.group(1).strip().encode('ascii')
+    return boundary if boundary.startswith(b'--') else b'--' + boundary
+
+
+# Clases de corrupción que el demultiplexor rechaza antes de decodificar
+CORRUPTION_TYPES = (
+    'truncated',      # Llegó el siguiente boundary antes de completar el frame (Content-Length o EOI)
+    'bad_length',     # Content-Length ilegible o mayor que MAX_FRAME_BYTES
+    'bad_headers',    # Headers de la parte multipart sin terminar (sin línea en blanco)
+    'no_soi',         # El cuerpo no empieza con SOI (FF D8)
+    'no_eoi',         # El cuerpo con Content-Length no termina en EOI (FF D9)
+    'bad_markers',    # Cadena de segmentos inválida entre SOI y SOS
+)
+
+SOI = b'\xff\xd8'
+EOI = b'\xff\xd9'
+MAX_PART_HEADERS = 1024  # Bytes máximos de headers por parte multipart
+MAX_FRAME_BYTES = 1 << 20  # Tope de cordura del Content-Length (= LIMITS['buffer_max'][1] de network_tuner)
+
+_CONTENT_LENGTH_RE = re.compile(rb'content-length:[ \t]*([^\r\n]*)', re.IGNORECASE)
+
+
+def jpeg_scan_offset(data, start=0, end=None):
+    """
+    Recorre los segmentos del JPEG que empieza en data[start] (SOI) hasta el SOS y retorna el
+    offset donde comienzan los datos entropía-codificados; -1 si faltan bytes, None si es inválido.
+    Saltar por longitud de segmento evita confundir el EOI de una miniatura EXIF con el del frame
+    """
+    end = len(data) if end is None else end
+    if end - start < 2:
+        return -1
+    if data[start] != 0xFF or data[start + 1] != 0xD8:
+        return None
+    i = start + 2
+    while True:
+        if i + 4 > end:
+            return -1
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:  # Relleno entre segmentos
+            i += 1
+            continue
+        if marker in (0x00, 0x01, 0xD8, 0xD9) or 0xD0 <= marker <= 0xD7:
+            return None  # Marcadores sin longitud no pueden aparecer antes del scan
+        length = data[i + 2] << 8 | data[i + 3]
+        if length < 2:
+            return None
+        i += 2 + length
+        if marker == 0xDA:
+            return i if i <= end else -1
+
+
+class MJPEGDemuxer:
+    """Extrae frames JPEG completos y válidos de los chunks recibidos (los corruptos se cuentan y descartan)"""
+
+    def __init__(self, boundary=DEFAULT_BOUNDARY, buffer_max=65536, buffer_keep=32768, max_frame=MAX_FRAME_BYTES):
+        self.boundary = boundary
+        self.buffer_max = buffer_max    # Si el buffer supera esto se recorta...
+        self.buffer_keep = buffer_keep  # ...conservando solo los últimos bytes
+        self.max_frame = max_frame      # Content-Length mayor que esto se rechaza como bad_length
+        self.buffer = bytearray()
+        self._pending_end = 0  # Fin declarado (Content-Length) del frame incompleto al inicio del buffer
+        # Contadores acumulados
+        self.bytes_in = 0        # Bytes recibidos del socket
+        self.jpeg_bytes = 0      # Bytes que terminaron en un JPEG (goodput)
+        self.frames = 0
+        self.bytes_discarded = 0  # Bytes perdidos por recorte del buffer
+        self.frames_rejected = 0
+        self.bytes_rejected = 0   # Bytes de frames corruptos descartados
+        self.corrupt = dict.fromkeys(CORRUPTION_TYPES, 0)
+
+    def _reject(self, kind, size):
+        self.corrupt[kind] += 1
+        self.frames_rejected += 1
+        self.bytes_rejected += size
+
+    def feed(self, chunk):
+        """Agrega un chunk y retorna la lista de JPEG completos y válidos encontrados"""
+        self.bytes_in += len(chunk)
+
+        # Limitar el tamaño del buffer según configuración de red; un frame con Content-Length
+        # válido en curso no se recorta aunque supere buffer_max (el tuner lo verá en frame_p90)
+        if len(self.buffer) > max(self.buffer_max, self._pending_end):
+            cut = len(self.buffer) - self.buffer_keep
+            self.bytes_discarded += cut
+            del self.buffer[:cut]
+
+        self.buffer += chunk
+
+        frames = []
+        buffer = self.buffer
+        boundary = self.boundary
+        self._pending_end = 0
+        while True:
+            # Sincronizar al boundary que abre la parte (lo anterior es el CRLF de cierre o restos de un recorte)
+            boundary_pos = buffer.find(boundary)
+            if boundary_pos == -1:
+                break
+            if boundary_pos:
+                del buffer[:boundary_pos]
+
+            # Headers de la parte: hasta la línea en blanco
+            headers_end = buffer.find(b'\r\n\r\n', len(boundary), MAX_PART_HEADERS)
+            if headers_end == -1:
+                if len(buffer) < MAX_PART_HEADERS:
+                    break
+                self._reject('bad_headers', MAX_PART_HEADERS)
+                del buffer[:len(boundary)]
+                continue
+            body_start = headers_end + 4
+
+            match = _CONTENT_LENGTH_RE.search(buffer, 0, headers_end + 2)
+            if match:
+                # Framing por Content-Length: exacto aunque el JPEG traiga miniaturas con su propio EOI
+                try:
+                    length = int(match.group(1))
+                except ValueError:
+                    length = -1
+                if length <= 0 or length > self.max_frame:
+                    self._reject('bad_length', body_start)
+                    del buffer[:body_start]
+                    continue
+                body_end = body_start + length
+                # Un boundary dentro del cuerpo declarado: el frame se cortó y empezó otro
+                next_pos = buffer.find(boundary, body_start, body_end)
+                if next_pos != -1:
+                    self._reject('truncated', next_pos - body_start)
+                    del buffer[:next_pos]
+                    continue
+                if len(buffer) < body_end:
+                    self._pending_end = body_end
+                    break
+                kind = self._validate(buffer, body_start, body_end)
+            else:
+                # Sin Content-Length: recorrer segmentos hasta el SOS y buscar el EOI recién en el scan
+                # (dentro de los datos entropía-codificados FF D9 solo puede ser el EOI real)
+                scan = jpeg_scan_offset(buffer, body_start)
+                body_end = -1
+                if scan is not None and scan != -1:
+                    eoi = buffer.find(EOI, scan)
+                    body_end = eoi + 2 if eoi != -1 else -1
+                next_pos = buffer.find(boundary, body_start, body_end if body_end != -1 else len(buffer))
+                if next_pos != -1:
+                    self._reject('truncated' if scan is not None else self._classify_head(buffer, body_start),
+                                 next_pos - body_start)
+                    del buffer[:next_pos]
+                    continue
+                if scan is None:
+                    kind = self._classify_head(buffer, body_start)
+                    self._reject(kind, 0)
+                    del buffer[:body_start]
+                    continue
+                if body_end == -1:
+                    break
+                kind = None
+
+            if kind is not None:
+                self._reject(kind, body_end - body_start)
+            else:
+                jpg_data = bytes(buffer[body_start:body_end])
+                frames.append(jpg_data)
+                self.frames += 1
+                self.jpeg_bytes += len(jpg_data)
+            del buffer[:body_end]
+        return frames
+
+    @staticmethod
+    def _classify_head(buffer, start):
+        return 'no_soi' if buffer[start:start + 2] != SOI else 'bad_markers'
+
+    @classmethod
+    def _validate(cls, buffer, start, end):
+        """Clase de corrupción del JPEG en buffer[start:end] (None si es válido); solo mira headers y extremos"""
+        if buffer[start:start + 2] != SOI:
+            return 'no_soi'
+        # Algunos firmwares rellenan el cuerpo con CRLF o ceros después del EOI
+        tail = end
+        while tail - start > 4 and buffer[tail - 1] in (0x00, 0x0A, 0x0D):
+            tail -= 1
+        if buffer[tail - 2:tail] != EOI:
+            return 'no_eoi'
+        scan = jpeg_scan_offset(buffer, start, tail)
+        if scan is None or scan == -1 or scan > tail - 2:
+            return 'bad_markers'
+        return None
+
+    def corruption_summary(self):
+        """Texto corto con los frames rechazados por clase (vacío si no hubo)"""
+        return ', '.join(f"{kind}={n}" for kind, n in self.corrupt.items() if n)
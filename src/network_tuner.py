@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+"""
+Auto-ajuste de parámetros de red del stream MJPEG
+Mide RTT, throughput y jitter de llegada de frames en ejecución y ajusta
+CHUNK_SIZE, BUFFER_MAX/KEEP, PROCESS_SKIP y timeouts; el último perfil
+bueno se guarda por URL para arrancar desde él la próxima vez
+"""
+
+import json
+import math
+import os
+import socket
+import statistics
+import threading
+import time
+from collections import deque
+from urllib.parse import urlparse
+
+from requests.exceptions import ConnectionError as RequestsConnectionError
+from urllib3.exceptions import ProtocolError, ReadTimeoutError
+
+DEFAULT_PROFILE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'network_profiles.json')
+
+# Perfil inicial cuando no hay nada guardado ni medido
+DEFAULT_PROFILE = {
+    'chunk_size': 4096,
+    'buffer_max': 65536,
+    'buffer_keep': 32768,
+    'process_skip': 1,
+    'timeout_connect': 10,
+    'timeout_read': 30,
+}
+
+# Límites de cada parámetro
+LIMITS = {
+    'chunk_size': (1024, 16384),
+    'buffer_max': (32768, 1 << 20),
+    'process_skip': (1, 4),
+    'timeout_connect': (3, 15),
+    'timeout_read': (5, 30),
+}
+
+
+def _clamp(value, key):
+    lo, hi = LIMITS[key]
+    return max(lo, min(hi, value))
+
+
+def _pow2_floor(value):
+    return 1 << max(0, int(value).bit_length() - 1)
+
+
+def _pow2_ceil(value):
+    return 1 << max(0, int(math.ceil(value)) - 1).bit_length()
+
+
+def measure_tcp_rtt(url, count=3, timeout=3.0):
+    """RTT (ms) por tiempo de conexión TCP al host del stream; mediana de 'count' intentos"""
+    parsed = urlparse(url)
+    address = (parsed.hostname, parsed.port or 80)
+    samples = []
+    for _ in range(count):
+        start = time.perf_counter()
+        try:
+            with socket.create_connection(address, timeout=timeout):
+                pass
+        except ConnectionRefusedError:
+            pass  # El RST también mide ida y vuelta
+        except OSError:
+            continue
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples) if samples else None
+
+
+class NetworkAutoTuner:
+    """Ajuste en lazo cerrado del perfil de red a partir de métricas del stream"""
+
+    def __init__(self, url, profile_path=DEFAULT_PROFILE_PATH, seed_profile=None, window_sec=5.0,
+                 adjust_every_sec=2.0, chunk_latency_ms=5.0, min_frames_to_save=50):
+        self.url = url
+        self.profile_path = profile_path
+        self.window_sec = window_sec
+        self.adjust_every_sec = adjust_every_sec
+        self.chunk_latency_ms = chunk_latency_ms  # Demora máxima que agrega esperar un chunk completo
+        self.min_frames_to_save = min_frames_to_save
+
+        self.profile = dict(DEFAULT_PROFILE)
+        self.profile.update(seed_profile or {})
+        self.source = 'seed' if seed_profile else 'default'
+        stored = self._load_all().get(url)
+        if stored:
+            self.profile.update({k: v for k, v in stored.items() if k in DEFAULT_PROFILE})
+            self.source = 'saved'
+
+        self.rtt_ms = None
+        # Ventanas deslizantes (tiempo, valor)
+        self.byte_window = deque(maxlen=8192)
+        self.frame_window = deque(maxlen=1024)
+        self.busy_window = deque(maxlen=1024)  # (t, segundos de procesamiento, con inferencia)
+        self.total_frames = 0
+        self.last_adjust = None
+        self.last_discarded = 0
+        self.last_metrics = None
+        self.adjustments = 0
+        self._lock = threading.Lock()  # Las ventanas se llenan desde el hilo lector y el bucle principal
+
+    # ===== Persistencia =====
+
+    def _load_all(self):
+        try:
+            with open(self.profile_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self):
+        """Guarda el perfil actual para esta URL (solo si la sesión fue representativa)"""
+        if self.total_frames < self.min_frames_to_save:
+            return False
+        profiles = self._load_all()
+        profiles[self.url] = dict(self.profile, rtt_ms=self.rtt_ms, updated=time.strftime('%Y-%m-%d %H:%M:%S'))
+        try:
+            with open(self.profile_path, 'w', encoding='utf-8') as f:
+                json.dump(profiles, f, indent=2)
+        except OSError as e:
+            print(f"[WARN] No se pudo guardar el perfil de red: {e}")
+            return False
+        return True
+
+    # ===== Medición =====
+
+    def probe_rtt(self):
+        """Mide el RTT antes de conectar y ajusta el timeout de conexión"""
+        self.rtt_ms = measure_tcp_rtt(self.url)
+        if self.rtt_ms is not None:
+            # Varias veces el RTT para el handshake TCP + HTTP, con margen para reintentos
+            self.profile['timeout_connect'] = _clamp(int(math.ceil(3 + self.rtt_ms * 20 / 1000)), 'timeout_connect')
+        return self.rtt_ms
+
+    @property
+    def timeouts(self):
+        return (self.profile['timeout_connect'], self.profile['timeout_read'])
+
+    def on_bytes(self, n, now):
+        with self._lock:
+            self.byte_window.append((now, n))
+
+    def on_frame(self, size, now):
+        with self._lock:
+            self.frame_window.append((now, size))
+            self.total_frames += 1
+
+    def on_processed(self, elapsed, now, inferred=True):
+        """Tiempo que el bucle principal pasó con un frame (inferred: si corrió YOLO en él)"""
+        with self._lock:
+            self.busy_window.append((now, elapsed, inferred))
+
+    def _trim(self, now):
+        limit = now - self.window_sec
+        for window in (self.byte_window, self.frame_window, self.busy_window):
+            while window and window[0][0] < limit:
+                window.popleft()
+
+    def metrics(self, now):
+        """
+        Throughput (B/s), FPS, intervalo medio, jitter, gap máximo, frame p90, ocupación del bucle
+        y tiempo medio por frame con y sin inferencia
+        """
+        with self._lock:
+            self._trim(now)
+            if len(self.frame_window) < 3:
+                return None
+            frame_window = list(self.frame_window)
+            byte_window = list(self.byte_window)
+            busy_window = list(self.busy_window)
+        times = [t for t, _ in frame_window]
+        sizes = sorted(s for _, s in frame_window)
+        intervals = [b - a for a, b in zip(times, times[1:])]
+        span = max(now - byte_window[0][0], 1e-3) if byte_window else self.window_sec
+        mean_interval = statistics.fmean(intervals)
+        inferred = [e for _, e, inf in busy_window if inf]
+        skipped = [e for _, e, inf in busy_window if not inf]
+        return {
+            'throughput_bps': sum(n for _, n in byte_window) / span,
+            'fps': 1.0 / mean_interval if mean_interval > 0 else 0.0,
+            'interval_s': mean_interval,
+            'jitter_s': statistics.pstdev(intervals),
+            'max_gap_s': max(intervals),
+            'frame_p90': sizes[int(0.9 * (len(sizes) - 1))],
+            'busy': sum(e for _, e, _ in busy_window) / (times[-1] - times[0]) if times[-1] > times[0] else 0.0,
+            'infer_s': statistics.fmean(inferred) if inferred else None,
+            'base_s': statistics.fmean(skipped) if skipped else None,
+        }
+
+    # ===== Ajuste =====
+
+    def update(self, now=None, discarded_bytes=None):
+        """
+        Reajusta el perfil cada 'adjust_every_sec'; retorna True si algo cambió.
+        discarded_bytes: contador acumulado de bytes recortados por el demultiplexor
+        """
+        now = time.perf_counter() if now is None else now
+        if self.last_adjust is None:
+            self.last_adjust = now
+            self.last_discarded = discarded_bytes or 0
+            return False
+        if now - self.last_adjust < self.adjust_every_sec:
+            return False
+        self.last_adjust = now
+
+        # Recortes del buffer: un frame no entra (puede que ninguno llegue completo) -> duplicar
+        truncating = discarded_bytes is not None and discarded_bytes > self.last_discarded
+        self.last_discarded = discarded_bytes or 0
+        if truncating and self.profile['buffer_max'] < LIMITS['buffer_max'][1]:
+            self.profile = dict(self.profile, buffer_max=_clamp(self.profile['buffer_max'] * 2, 'buffer_max'))
+            self.profile['buffer_keep'] = self.profile['buffer_max'] // 2
+            self.adjustments += 1
+            return True
+
+        m = self.metrics(now)
+        if m is None:
+            return False
+
+        new = dict(self.profile)
+        # Chunk: leer un chunk completo no debe demorar más de 'chunk_latency_ms'
+        new['chunk_size'] = _clamp(_pow2_floor(m['throughput_bps'] * self.chunk_latency_ms / 1000), 'chunk_size')
+        # Buffer: 2 frames grandes (3 si la llegada es irregular) para no recortar un frame en curso
+        frames = 3 if m['jitter_s'] > 0.5 * m['interval_s'] else 2
+        new['buffer_max'] = _clamp(_pow2_ceil(m['frame_p90'] * frames), 'buffer_max')
+        new['buffer_keep'] = new['buffer_max'] // 2
+        # Timeout de lectura: varias veces el peor hueco observado entre frames
+        new['timeout_read'] = _clamp(int(math.ceil(2 + 4 * m['max_gap_s'])), 'timeout_read')
+        new['process_skip'] = self._choose_skip(m)
+
+        changed = new != self.profile
+        if changed:
+            if new['process_skip'] != self.profile['process_skip']:
+                with self._lock:
+                    self.busy_window.clear()  # La ocupación medida con el skip anterior ya no aplica
+            self.profile = new
+            self.adjustments += 1
+        self.last_metrics = m
+        return changed
+
+    def _choose_skip(self, m):
+        """
+        PROCESS_SKIP con histéresis: ocupación prevista con skip s =
+        (t_base + (t_inferencia - t_base) / s) / intervalo entre frames
+        """
+        skip = self.profile['process_skip']
+        if m['infer_s'] is None:
+            return skip
+        base = m['base_s'] if m['base_s'] is not None else 0.0
+        extra = max(m['infer_s'] - base, 0.0)
+
+        def predicted(s):
+            return (base + extra / s) / m['interval_s']
+
+        if m['busy'] > 0.9:
+            # El menor salto que deja el bucle bajo 80%; si ninguno alcanza, saltar más no ayuda
+            for s in range(skip + 1, LIMITS['process_skip'][1] + 1):
+                if predicted(s) < 0.8:
+                    return s
+        elif skip > 1 and predicted(skip - 1) < 0.6:
+            return skip - 1
+        return skip
+
+    def iter_chunks(self, response):
+        """Como response.iter_content, pero con el chunk_size vigente en cada lectura"""
+        try:
+            while True:
+                chunk = response.raw.read(self.profile['chunk_size'], decode_content=True)
+                if not chunk:
+                    break
+                self.on_bytes(len(chunk), time.perf_counter())
+                yield chunk
+        except (ProtocolError, ReadTimeoutError) as e:
+            raise RequestsConnectionError(e)
+
+    def describe(self):
+        p = self.profile
+        return (f"chunk={p['chunk_size']}B buffer={p['buffer_max'] // 1024}/{p['buffer_keep'] // 1024}KB "
+                f"skip={p['process_skip']} timeout={p['timeout_connect']}/{p['timeout_read']}s")
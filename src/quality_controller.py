@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Control remoto de resolución/calidad JPEG de la ESP32-CAM
+Observa la latencia de red (primer byte -> JPEG completo, más RTT) y el tamaño
+de los frames y sube o baja
+un escalón de (framesize, quality) mediante /control?var=...&val=... del
+firmware CameraWebServer, con histéresis para no oscilar
+"""
+
+import threading
+import time
+from urllib.parse import urlparse, urlunparse
+
+import requests
+
+# Escalones de mejor a más liviano. framesize según esp32-camera (framesize_t),
+# quality JPEG 0-63 (menor = mejor calidad y frames más grandes)
+QUALITY_LEVELS = [
+    {'framesize': 8, 'quality': 10, 'nombre': 'VGA q10'},    # 640x480
+    {'framesize': 8, 'quality': 14, 'nombre': 'VGA q14'},
+    {'framesize': 7, 'quality': 14, 'nombre': 'HVGA q14'},   # 480x320
+    {'framesize': 6, 'quality': 14, 'nombre': 'CIF q14'},    # 400x296
+    {'framesize': 5, 'quality': 16, 'nombre': 'QVGA q16'},   # 320x240
+    {'framesize': 5, 'quality': 24, 'nombre': 'QVGA q24'},
+    {'framesize': 3, 'quality': 30, 'nombre': 'HQVGA q30'},  # 240x176
+]
+
+
+def network_latency_ms(first_byte_s, jpeg_complete_s, rtt_ms=None):
+    """
+    Latencia que depende de la cámara y la red: primer byte -> JPEG completo en el demultiplexor
+    (tramo Red del FrameTracer) más el RTT. Excluye la espera en cola, decodificación, YOLO, tracker
+    y dibujo: dependen del ritmo del loop principal, no de la resolución de la ESP32
+    """
+    latency = (jpeg_complete_s - first_byte_s) * 1000
+    return latency + rtt_ms if rtt_ms is not None else latency
+
+
+def control_url_from_stream(stream_url):
+    """URL de /control a partir de la del stream (el stream en :81 implica control en :80)"""
+    parsed = urlparse(stream_url)
+    netloc = parsed.hostname if parsed.port in (None, 81) else f"{parsed.hostname}:{parsed.port}"
+    return urlunparse((parsed.scheme or 'http', netloc, '/control', '', '', ''))
+
+
+class QualityController:
+    """Baja/sube la calidad del ESP32 según latencia de red y tamaño de frame, con histéresis"""
+
+    def __init__(self, control_url, levels=QUALITY_LEVELS, start_level=3, high_latency_ms=250.0,
+                 low_latency_ms=120.0, max_frame_kb=40.0, down_after_sec=2.0, up_after_sec=10.0,
+                 settle_sec=2.0, alpha=0.2, timeout=2.0):
+        self.control_url = control_url
+        self.levels = levels
+        self.level = start_level
+        self.high_latency_ms = high_latency_ms  # Sobre esto (sostenido) -> bajar calidad
+        self.low_latency_ms = low_latency_ms    # Bajo esto (sostenido más tiempo) -> subir calidad
+        self.max_frame_kb = max_frame_kb        # Frames más grandes que esto también fuerzan a bajar
+        self.down_after_sec = down_after_sec
+        self.up_after_sec = up_after_sec
+        self.settle_sec = settle_sec            # La cámara tarda en aplicar el cambio: ignorar muestras
+        self.alpha = alpha
+        self.timeout = timeout
+
+        self.latency_ema = None
+        self.frame_kb_ema = None
+        self.high_since = None
+        self.low_since = None
+        self.settle_until = 0.0
+        self.changes = 0
+        self.errors = 0
+        self.last_error = None
+        self.applied_level = None
+        self._worker = None
+        self._lock = threading.Lock()
+
+    @property
+    def current(self):
+        return self.levels[self.level]
+
+    def _send(self, var, val):
+        response = requests.get(self.control_url, params={'var': var, 'val': val}, timeout=self.timeout)
+        if response.status_code != 200:
+            raise requests.RequestException(f"/control {var}={val}: código {response.status_code}")
+
+    def _apply(self, level):
+        """Envía framesize y quality (en un hilo: el stream no se bloquea)"""
+        target = self.levels[level]
+        try:
+            # Primero la calidad: si se baja resolución, el frame siguiente ya llega liviano
+            self._send('quality', target['quality'])
+            self._send('framesize', target['framesize'])
+            self.applied_level = level
+        except requests.RequestException as e:
+            self.errors += 1
+            self.last_error = str(e)
+            print(f"[WARN] Control de calidad ESP32 falló: {e}")
+
+    def apply(self, level=None, wait=False):
+        """Aplica un escalón (el actual por defecto); ignora si ya hay un envío en curso"""
+        level = self.level if level is None else level
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive():
+                return False
+            self._worker = threading.Thread(target=self._apply, args=(level,), daemon=True)
+            self._worker.start()
+        if wait:
+            self._worker.join()
+        return True
+
+    def _step(self, delta, now):
+        new_level = min(max(self.level + delta, 0), len(self.levels) - 1)
+        if new_level == self.level or not self.apply(new_level):
+            return False
+        self.level = new_level
+        self.changes += 1
+        # Las métricas anteriores describen el escalón viejo
+        self.latency_ema = None
+        self.frame_kb_ema = None
+        self.high_since = None
+        self.low_since = None
+        self.settle_until = now + self.settle_sec
+        return True
+
+    def observe(self, latency_ms, frame_bytes, now=None):
+        """
+        Registra un frame (latencia de red en ms, ver network_latency_ms, y tamaño del JPEG).
+        Retorna +1 si se subió la calidad, -1 si se bajó, 0 si no hubo cambio.
+        """
+        now = time.perf_counter() if now is None else now
+        if now < self.settle_until:
+            return 0
+        frame_kb = frame_bytes / 1024
+        if self.latency_ema is None:
+            self.latency_ema, self.frame_kb_ema = latency_ms, frame_kb
+        else:
+            self.latency_ema += self.alpha * (latency_ms - self.latency_ema)
+            self.frame_kb_ema += self.alpha * (frame_kb - self.frame_kb_ema)
+
+        too_slow = self.latency_ema > self.high_latency_ms or self.frame_kb_ema > self.max_frame_kb
+        fast = self.latency_ema < self.low_latency_ms and self.frame_kb_ema < 0.6 * self.max_frame_kb
+
+        if not too_slow:
+            self.high_since = None
+        elif self.high_since is None:
+            self.high_since = now
+        if not fast:
+            self.low_since = None
+        elif self.low_since is None:
+            self.low_since = now
+
+        # Bajar reacciona rápido; subir exige más tiempo estable (histéresis temporal)
+        if self.high_since is not None and now - self.high_since >= self.down_after_sec:
+            return -1 if self._step(+1, now) else 0
+        if self.low_since is not None and now - self.low_since >= self.up_after_sec:
+            return 1 if self._step(-1, now) else 0
+        return 0
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Almacén de re-identificación a nivel de vuelo
+Guarda dónde terminaron los tracks recientes (índice espacial en grilla)
+junto con su embedding de apariencia (ver appearance.py), para no contar
+dos veces a la misma persona cuando sale del cuadro y vuelve a entrar
+"""
+
+import math
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class ReIDStore:
+    """Índice espacial (grilla hash) con expiración LRU/TTL de finales de track"""
+
+    def __init__(self, cell_size=100, match_dist=120, min_similarity=0.6,
+                 max_entries=256, ttl_sec=60.0):
+        # match_dist y cell_size en las mismas unidades que las posiciones (píxeles o metros)
+        self.cell_size = cell_size
+        self.match_dist = match_dist
+        self.min_similarity = min_similarity  # Coeficiente de Bhattacharyya mínimo
+        self.max_entries = max_entries
+        self.ttl_sec = ttl_sec
+        self.entries = OrderedDict()  # id: {'pos': (x, y), 'emb': array|None, 'time': t, 'cell': (i, j)}
+        self.grid = {}                # (i, j): set(ids)
+        self._reach = int(math.ceil(match_dist / cell_size))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _cell(self, pos):
+        return (int(pos[0] // self.cell_size), int(pos[1] // self.cell_size))
+
+    def _remove(self, track_id):
+        entry = self.entries.pop(track_id, None)
+        if entry is None:
+            return None
+        ids = self.grid.get(entry['cell'])
+        if ids is not None:
+            ids.discard(track_id)
+            if not ids:
+                del self.grid[entry['cell']]
+        return entry
+
+    def _evict(self, now):
+        # Las entradas más antiguas están al inicio (orden de inserción/refresco)
+        while self.entries:
+            oldest_id, oldest = next(iter(self.entries.items()))
+            if len(self.entries) > self.max_entries or now - oldest['time'] > self.ttl_sec:
+                self._remove(oldest_id)
+            else:
+                break
+
+    def add(self, track_id, pos, emb=None, now=None):
+        """Registra (o refresca) el final de un track"""
+        now = time.time() if now is None else now
+        self._remove(track_id)
+        cell = self._cell(pos)
+        self.entries[track_id] = {'pos': pos, 'emb': emb, 'time': now, 'cell': cell}
+        self.grid.setdefault(cell, set()).add(track_id)
+        self._evict(now)
+
+    def match(self, pos, emb=None, now=None):
+        """
+        Busca un track terminado cercano y con apariencia compatible.
+        Solo revisa las celdas vecinas, no todo el almacén.
+        Retorna el id recuperado (y lo saca del almacén) o None.
+        """
+        now = time.time() if now is None else now
+        self._evict(now)
+        ci, cj = self._cell(pos)
+        best_id, best_cost = None, float('inf')
+        for i in range(ci - self._reach, ci + self._reach + 1):
+            for j in range(cj - self._reach, cj + self._reach + 1):
+                for tid in self.grid.get((i, j), ()):
+                    entry = self.entries[tid]
+                    dist = math.hypot(pos[0] - entry['pos'][0], pos[1] - entry['pos'][1])
+                    if dist > self.match_dist:
+                        continue
+                    cost = dist / self.match_dist
+                    if emb is not None and entry['emb'] is not None:
+                        similarity = float(np.dot(emb, entry['emb']))
+                        if similarity < self.min_similarity:
+                            continue
+                        cost += 1.0 - similarity
+                    if cost < best_cost:
+                        best_id, best_cost = tid, cost
+        if best_id is not None:
+            self._remove(best_id)
+        return best_id
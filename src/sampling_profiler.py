@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Perfilador por muestreo activable en caliente
+Un hilo de fondo toma la pila del hilo del stream cada pocos ms con
+sys._current_frames() (sin instrumentar cada llamada, a diferencia de
+cProfile) y al terminar guarda las pilas en formato collapsed
+("a;b;c N"), listo para flamegraph.pl, speedscope o inferno
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+
+class SamplingProfiler:
+    """Muestreo de pilas por N segundos (o hasta detenerlo) con volcado a archivo .folded"""
+
+    def __init__(self, interval_sec=0.005, duration_sec=10.0, all_threads=False, output_dir='.'):
+        self.interval_sec = interval_sec
+        self.duration_sec = duration_sec    # None = hasta llamar a stop()
+        self.all_threads = all_threads      # También el servidor de métricas, control de calidad, etc.
+        self.output_dir = output_dir
+        self.stacks = Counter()
+        self.samples = 0
+        self.started_at = None
+        self.elapsed = 0.0
+        self.last_output = None
+        self._labels = {}                   # (code, línea) -> "función (archivo:línea)"
+        self._thread = None
+        self._stop = threading.Event()
+        self._target = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _label(self, frame):
+        key = (frame.f_code, frame.f_lineno)
+        label = self._labels.get(key)
+        if label is None:
+            code = frame.f_code
+            # Con número de línea: stream_camera es una sola función grande y así se distingue cada etapa
+            label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+            self._labels[key] = label
+        return label
+
+    def _stack(self, frame):
+        labels = []
+        while frame is not None:
+            labels.append(self._label(frame))
+            frame = frame.f_back
+        labels.reverse()  # Raíz primero
+        return ';'.join(labels)
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        deadline = None if self.duration_sec is None else self.started_at + self.duration_sec
+        next_sample = time.perf_counter()
+        while not self._stop.is_set():
+            frames = sys._current_frames()
+            if self.all_threads:
+                if len(names) != threading.active_count():
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                for ident, frame in frames.items():
+                    if ident != own:
+                        self.stacks[f"{names.get(ident, ident)};{self._stack(frame)}"] += 1
+            else:
+                frame = frames.get(self._target)
+                if frame is None:
+                    break  # El hilo perfilado terminó
+                self.stacks[self._stack(frame)] += 1
+            frames = frame = None  # No retener frames (y sus locales) hasta la próxima muestra
+            self.samples += 1
+
+            now = time.perf_counter()
+            if deadline is not None and now >= deadline:
+                break
+            # Intervalo fijo sin acumular deriva (si una muestra tardó de más, no se recupera en ráfaga)
+            next_sample = max(next_sample + self.interval_sec, now)
+            self._stop.wait(next_sample - now)
+        self.elapsed = time.perf_counter() - self.started_at
+        self.dump()
+
+    def start(self, thread_id=None):
+        """Comienza a muestrear el hilo indicado (por defecto el que llama); False si ya estaba corriendo"""
+        if self.running:
+            return False
+        self.stacks = Counter()
+        self.samples = 0
+        self.last_output = None
+        self._target = threading.get_ident() if thread_id is None else thread_id
+        self._stop.clear()
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        duration = f"{self.duration_sec:g} s" if self.duration_sec is not None else "hasta detenerlo"
+        print(f"[PROFILE] Muestreando cada {self.interval_sec * 1000:.0f} ms ({duration})")
+        return True
+
+    def stop(self, wait=True):
+        """Detiene el muestreo; el volcado lo hace el hilo de muestreo al salir"""
+        if not self.running:
+            return None
+        self._stop.set()
+        if wait and self._thread is not threading.current_thread():
+            self._thread.join()
+        return self.last_output
+
+    def toggle(self, thread_id=None):
+        """Inicia o detiene (tecla / señal); no espera al volcado para no trabar el bucle"""
+        if self.running:
+            self.stop(wait=False)
+        else:
+            self.start(thread_id)
+
+    def top(self, n=5):
+        """Las n líneas con más muestras propias (hoja de la pila)"""
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        return leaves.most_common(n)
+
+    def dump(self, path=None):
+        """Guarda las pilas en formato collapsed; retorna la ruta (None si no hubo muestras)"""
+        if not self.stacks:
+            print("[PROFILE] Sin muestras")
+            return None
+        path = path or os.path.join(self.output_dir, time.strftime('profile_%Y%m%d_%H%M%S.folded'))
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                for stack, count in sorted(self.stacks.items()):
+                    f.write(f"{stack} {count}\n")
+        except OSError as e:
+            print(f"[WARN] No se pudo guardar el perfil: {e}")
+            return None
+        self.last_output = path
+        print(f"[PROFILE] {self.samples} muestras en {self.elapsed:.1f} s -> {path} "
+              "(flamegraph.pl, speedscope.app o inferno)")
+        total = sum(self.stacks.values())
+        for label, count in self.top():
+            print(f"[PROFILE]   {100 * count / total:5.1f}%  {label}")
+        return path
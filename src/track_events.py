@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+Eventos del ciclo de vida de los tracks (pub/sub en proceso)
+DetectionTracker publica cuando un track nace, se confirma, se pierde, se
+recupera o termina (con el tiempo de permanencia). Cada suscriptor tiene su
+propia cola acotada: publicar nunca bloquea al tracker y, si un consumidor se
+atrasa, pierde sus eventos más viejos sin afectar a los demás
+"""
+
+import threading
+from collections import deque
+
+BORN = 'born'              # Track tentativo nuevo (detección de confianza alta sin track)
+CONFIRMED = 'confirmed'    # Track confirmado: persona contada (o re-identificada)
+LOST = 'lost'              # Track confirmado que dejó de asociarse
+RECOVERED = 'recovered'    # Track perdido que volvió a asociarse
+TERMINATED = 'terminated'  # Track eliminado (perdido demasiado tiempo o tentativo descartado)
+EVENT_TYPES = (BORN, CONFIRMED, LOST, RECOVERED, TERMINATED)
+
+
+class Subscription:
+    """Cola acotada de un suscriptor; get()/iteración desde el hilo del consumidor"""
+
+    def __init__(self, bus, name, maxsize, types):
+        self.bus = bus
+        self.name = name
+        self.types = frozenset(types) if types else None
+        self._queue = deque(maxlen=maxsize)
+        self._condition = threading.Condition()
+        self.closed = False
+        # Estadísticas
+        self.received = 0
+        self.dropped = 0          # Eventos descartados por cola llena (el consumidor no alcanzó)
+
+    def __len__(self):
+        return len(self._queue)
+
+    def _put(self, event):
+        with self._condition:
+            if len(self._queue) == self._queue.maxlen:
+                self.dropped += 1
+            self._queue.append(event)
+            self.received += 1
+            self._condition.notify()
+
+    def get(self, timeout=None):
+        """Próximo evento, o None si no llegó ninguno en 'timeout' o la suscripción se cerró"""
+        with self._condition:
+            if not self._queue and not self.closed:
+                self._condition.wait(timeout)
+            return self._queue.popleft() if self._queue else None
+
+    def drain(self):
+        """Todos los eventos pendientes sin esperar (para consumidores que revisan por frame)"""
+        with self._condition:
+            events = list(self._queue)
+            self._queue.clear()
+        return events
+
+    def __iter__(self):
+        """Eventos hasta que la suscripción se cierre"""
+        while True:
+            event = self.get(timeout=1.0)
+            if event is not None:
+                yield event
+            elif self.closed:
+                return
+
+    def close(self):
+        self.bus.unsubscribe(self)
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+
+
+class TrackEventBus:
+    """Pub/sub en proceso de eventos de tracks"""
+
+    def __init__(self):
+        self._subscriptions = []
+        self._lock = threading.Lock()
+        self.published = 0
+
+    @property
+    def active(self):
+        """Hay alguien escuchando (el tracker evita armar eventos si no)"""
+        return bool(self._subscriptions)
+
+    def subscribe(self, name=None, maxsize=256, types=None):
+        """Nueva suscripción con cola de 'maxsize' eventos; 'types' filtra (None = todos)"""
+        subscription = Subscription(self, name or f"sub{len(self._subscriptions) + 1}", maxsize, types)
+        with self._lock:
+            self._subscriptions = self._subscriptions + [subscription]
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions = [s for s in self._subscriptions if s is not subscription]
+
+    def publish(self, event):
+        """Entrega el evento a cada suscriptor interesado; O(suscriptores), nunca bloquea"""
+        self.published += 1
+        for subscription in self._subscriptions:  # Lista inmutable: sin lock al publicar
+            if subscription.types is None or event['type'] in subscription.types:
+                subscription._put(event)
+
+    def close(self):
+        for subscription in list(self._subscriptions):
+            subscription.close()
+
+    def stats(self):
+        return {
+            'published': self.published,
+            'subscribers': [{'name': s.name, 'received': s.received, 'dropped': s.dropped, 'pending': len(s)}
+                            for s in self._subscriptions],
+        }
+
+
+def make_event(event_type, track_id, tinfo, now, frame_index, **extra):
+    """Evento como dict: tipo, id, tiempo, caja, confianza y permanencia (s) desde que nació el track"""
+    event = {
+        'type': event_type,
+        'track_id': track_id,
+        'time': now,
+        'frame': frame_index,
+        'box': tuple(int(v) for v in tinfo['box']),
+        'centroid': tuple(int(v) for v in tinfo['centroid']),
+        'conf': None if tinfo.get('conf') is None else float(tinfo['conf']),
+        'dwell_sec': round(tinfo.get('last_seen', now) - tinfo.get('born_at', now), 3),
+    }
+    event.update(extra)
+    return event
+
+
+def start_consumer(subscription, handler, name='track-events'):
+    """Hilo daemon que pasa cada evento a 'handler' hasta cerrar la suscripción (errores del handler se reportan)"""
+    def loop():
+        for event in subscription:
+            try:
+                handler(event)
+            except Exception as e:
+                print(f"[EVENTS] Error en consumidor {subscription.name}: {e}")
+
+    thread = threading.Thread(target=loop, name=name, daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+Conteo de personas por zonas y líneas
+Polígonos (ej. zona de aterrizaje) y segmentos (ej. perímetro) configurables
+en coordenadas del video mostrado. Cada frame se evalúan los centroides de
+todos los tracks confirmados en una sola pasada NumPy: punto-en-polígono por
+ray casting sobre (tracks x zonas x aristas) e intersección de segmentos
+(desplazamiento del track desde el frame anterior x líneas), sin bucles de
+Python por track ni por zona
+"""
+
+import numpy as np
+
+IN = 'in'    # Cruce de izquierda a derecha mirando de A hacia B (en la imagen, y hacia abajo)
+OUT = 'out'  # Cruce en sentido contrario
+DIRECTIONS = (IN, OUT)
+
+
+def _cross(ax, ay, bx, by, px, py):
+    """Producto cruz (B - A) x (P - A): > 0 si P está a la derecha de A->B en la imagen"""
+    return (bx - ax) * (py - ay) - (by - ay) * (px - ax)
+
+
+def points_in_polygons(points, edges):
+    """
+    Pertenencia de N puntos (N, 2) a Z polígonos con aristas (Z, E, 4) = x0, y0, x1, y1.
+    Polígonos con menos vértices se rellenan con aristas degeneradas (no cruzan ningún rayo).
+    Retorna (N, Z) bool
+    """
+    px = points[:, 0, None, None]
+    py = points[:, 1, None, None]
+    x0, y0, x1, y1 = edges[..., 0], edges[..., 1], edges[..., 2], edges[..., 3]
+    # Rayo horizontal hacia la derecha: la arista lo cruza si sus extremos quedan a ambos lados de py
+    straddles = (y0 > py) != (y1 > py)
+    dy = np.where(y1 == y0, 1.0, y1 - y0)
+    x_cut = x0 + (py - y0) * (x1 - x0) / dy
+    hits = straddles & (px < x_cut)
+    return np.count_nonzero(hits, axis=2) % 2 == 1
+
+
+def line_sides(points, lines, previous=None):
+    """
+    Lado de N puntos (N, 2) respecto de L líneas (L, 4): (N, L) bool, True a la derecha de A->B en la imagen.
+    Un punto sobre la recta conserva 'previous' (el lado del que venía; sin historia cuenta como derecha),
+    así un track que toca la línea y vuelve no la cruza
+    """
+    cross = _cross(lines[:, 0], lines[:, 1], lines[:, 2], lines[:, 3], points[:, 0, None], points[:, 1, None])
+    return np.where(cross == 0, True if previous is None else previous, cross > 0)
+
+
+def segment_crossings(starts, ends, lines, side_start=None, side_end=None):
+    """
+    Cruces de N desplazamientos (inicio/fin (N, 2)) con L líneas (L, 4) = ax, ay, bx, by.
+    side_start/side_end: lados (line_sides) ya arrastrados desde frames anteriores; por defecto se calculan.
+    Retorna (N, L) int8: +1 cruce 'in', -1 cruce 'out', 0 sin cruce
+    """
+    if side_start is None:
+        side_start = line_sides(starts, lines)
+    if side_end is None:
+        side_end = line_sides(ends, lines, side_start)
+    ax, ay, bx, by = lines[:, 0], lines[:, 1], lines[:, 2], lines[:, 3]
+    sx, sy = starts[:, 0, None], starts[:, 1, None]
+    ex, ey = ends[:, 0, None], ends[:, 1, None]
+    # Los extremos de la línea a ambos lados del desplazamiento: el cruce cae dentro del segmento A-B
+    ca = _cross(sx, sy, ex, ey, ax, ay)
+    cb = _cross(sx, sy, ex, ey, bx, by)
+    crossed = (side_start != side_end) & (ca * cb <= 0)
+    return np.where(crossed, np.where(side_end, 1, -1), 0).astype(np.int8)
+
+
+class ZoneCounter:
+    """Ocupación por zona y cruces por línea (acumulados) de los tracks confirmados"""
+
+    def __init__(self, zones=None, lines=None):
+        # zones: {nombre: [(x, y), ...]} (al menos 3 vértices); lines: {nombre: ((ax, ay), (bx, by))}
+        zones = zones or {}
+        lines = lines or {}
+        self.zone_names = list(zones)
+        self.line_names = list(lines)
+        self.polygons = [np.asarray(zones[name], dtype=np.float64).reshape(-1, 2) for name in self.zone_names]
+        for name, polygon in zip(self.zone_names, self.polygons):
+            if len(polygon) < 3:
+                raise ValueError(f"Zona '{name}' necesita al menos 3 vértices")
+        # Aristas (Z, E, 4) rellenadas con aristas degeneradas hasta el polígono más grande
+        n_edges = max((len(p) for p in self.polygons), default=0)
+        self._edges = np.zeros((len(self.polygons), n_edges, 4))
+        for z, polygon in enumerate(self.polygons):
+            self._edges[z, :len(polygon), :2] = polygon
+            self._edges[z, :len(polygon), 2:] = np.roll(polygon, -1, axis=0)
+        self.lines = np.array([np.ravel(lines[name]) for name in self.line_names], dtype=np.float64).reshape(-1, 4)
+        # Contadores
+        self.occupancy = np.zeros(len(self.zone_names), dtype=np.int64)
+        # Entradas: tracks que pasaron de fuera a dentro o aparecieron dentro (confirmados ahí o re-identificados);
+        # salidas: lo inverso, incluido el track que desaparece dentro. Así entradas - salidas = ocupación
+        self.entries = np.zeros(len(self.zone_names), dtype=np.int64)
+        self.exits = np.zeros(len(self.zone_names), dtype=np.int64)
+        self.crossings = np.zeros((len(self.line_names), 2), dtype=np.int64)  # Columnas: 'in', 'out'
+        # Estado del frame anterior, ordenado por id para alinearlo con searchsorted
+        self._prev_ids = np.empty(0, dtype=np.int64)
+        self._prev_points = np.empty((0, 2))
+        self._prev_inside = np.empty((0, len(self.zone_names)), dtype=bool)
+        self._prev_sides = np.empty((0, len(self.line_names)), dtype=bool)  # Lado de cada línea (ver line_sides)
+
+    @property
+    def enabled(self):
+        return bool(self.zone_names or self.line_names)
+
+    def update(self, ids, points):
+        """
+        Evalúa los tracks del frame (ids (N,), centroides (N, 2)).
+        Retorna los cruces de este frame como [(id, línea, 'in'|'out')]
+        """
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        order = np.argsort(ids, kind='stable')
+        ids, points = ids[order], points[order]
+        inside = points_in_polygons(points, self._edges) if self.zone_names else np.empty((len(ids), 0), dtype=bool)
+
+        # Alinear con el frame anterior: solo los tracks que ya existían pueden cruzar líneas
+        if len(self._prev_ids):
+            pos = np.minimum(np.searchsorted(self._prev_ids, ids), len(self._prev_ids) - 1)
+            known = self._prev_ids[pos] == ids
+        else:
+            pos = np.zeros(len(ids), dtype=np.int64)
+            known = np.zeros(len(ids), dtype=bool)
+        pos = pos[known]
+
+        events = []
+        if self.zone_names:
+            was_inside = self._prev_inside[pos]
+            now_inside = inside[known]
+            gone = np.ones(len(self._prev_ids), dtype=bool)
+            gone[pos] = False
+            self.entries += np.count_nonzero(now_inside & ~was_inside, axis=0)
+            self.entries += np.count_nonzero(inside[~known], axis=0)
+            self.exits += np.count_nonzero(was_inside & ~now_inside, axis=0)
+            self.exits += np.count_nonzero(self._prev_inside[gone], axis=0)
+            self.occupancy = np.count_nonzero(inside, axis=0)
+        sides = np.empty((len(ids), 0), dtype=bool)
+        if self.line_names:
+            sides = line_sides(points, self.lines)
+            prev_sides = self._prev_sides[pos]
+            sides[known] = line_sides(points[known], self.lines, prev_sides)
+        if self.line_names and len(pos):
+            crossed = segment_crossings(self._prev_points[pos], points[known], self.lines, prev_sides, sides[known])
+            self.crossings[:, 0] += np.count_nonzero(crossed > 0, axis=0)
+            self.crossings[:, 1] += np.count_nonzero(crossed < 0, axis=0)
+            known_ids = ids[known]
+            for t, l in zip(*np.nonzero(crossed)):
+                events.append((int(known_ids[t]), self.line_names[l], IN if crossed[t, l] > 0 else OUT))
+
+        self._prev_ids, self._prev_points, self._prev_inside, self._prev_sides = ids, points, inside, sides
+        return events
+
+    def update_tracks(self, tracks):
+        """Atajo para DetectionTracker.tracks: evalúa los tracks confirmados por su centroide"""
+        confirmed = [(tid, tinfo['centroid']) for tid, tinfo in tracks.items() if tinfo['confirmed']]
+        ids = [tid for tid, _ in confirmed]
+        points = [centroid for _, centroid in confirmed]
+        return self.update(ids, points)
+
+    def stats(self):
+        return {
+            'zones': {name: {'occupancy': int(self.occupancy[z]), 'entries': int(self.entries[z]),
+                             'exits': int(self.exits[z])}
+                      for z, name in enumerate(self.zone_names)},
+            'lines': {name: {IN: int(self.crossings[l, 0]), OUT: int(self.crossings[l, 1])}
+                      for l, name in enumerate(self.line_names)},
+        }
@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+"""Configuración de pytest: los módulos de src/ y utils/ se importan por nombre, como al ejecutarlos"""
+
+import os
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for _folder in ('src', 'utils'):
+    sys.path.insert(0, os.path.join(REPO_DIR, _folder))
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""Modelo de congestión con canales agrupados de 40/80 MHz"""
+
+import pytest
+
+from channel_congestion import ChannelCongestionModel, bonded_center
+from wifi_backends import _NMCLI_FIELDS_WIDTH, parse_nmcli_wifi_list
+
+
+@pytest.fixture(scope='module')
+def model():
+    return ChannelCongestionModel()
+
+
+@pytest.mark.parametrize('channel, width, center', [
+    (36, 40, 38), (40, 40, 38), (44, 40, 46), (36, 80, 42), (48, 80, 42), (52, 80, 58),
+    (100, 80, 106), (149, 80, 155), (157, 40, 159), (36, 160, 50), (1, 40, 3), (11, 40, 9), (6, 20, 6),
+])
+def test_centro_del_canal_agrupado(channel, width, center):
+    assert bonded_center([channel], [width])[0] == center
+
+
+def test_bss_de_40_mhz_ocupa_ambos_canales_por_igual(model):
+    congestion = model.analyze([{'channel': 36, 'band': '5GHz', 'rssi_dbm': -50, 'width_mhz': 40}], band='5GHz')
+    assert congestion[36]['networks'] == pytest.approx(congestion[40]['networks'], abs=0.02)
+    assert congestion[36]['networks'] > 0.4
+    assert congestion[44]['networks'] < 0.05
+    assert congestion[36]['interference_dbm'] == pytest.approx(congestion[40]['interference_dbm'], abs=0.2)
+
+
+def test_bss_de_80_mhz_cubre_su_bloque(model):
+    congestion = model.analyze([{'channel': 52, 'band': '5GHz', 'rssi_dbm': -50, 'width_mhz': 80}], band='5GHz')
+    block = [congestion[ch]['networks'] for ch in (52, 56, 60, 64)]
+    assert min(block) > 0.2
+    assert congestion[48]['networks'] < 0.05 and congestion[100]['networks'] == 0
+
+
+def test_centro_explicito_de_iw_tiene_prioridad(model):
+    # 2.4 GHz HT40- en el canal 5: el escaneo solo no lo sabe (asume HT40+), iw informa center1
+    networks = [{'channel': 5, 'rssi_dbm': -50, 'width_mhz': 40, 'center_channel': 3}]
+    congestion = model.analyze(networks)
+    assert congestion[3]['networks'] > congestion[7]['networks']
+
+
+def test_ancho_de_nmcli_llega_al_modelo(model):
+    output = " :AA\\:BB\\:CC\\:DD\\:EE\\:01:lab5:36:5180 MHz:80:WPA2:540 Mbit/s:40 MHz\n"
+    networks = parse_nmcli_wifi_list(output, _NMCLI_FIELDS_WIDTH)
+    assert networks[0]['width_mhz'] == 40
+    congestion = model.analyze(networks, band='5GHz')
+    assert congestion[36]['networks'] == pytest.approx(congestion[40]['networks'], abs=0.02)
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""Búsqueda de la ESP32 en la red contra servidores locales de reemplazo"""
+
+import asyncio
+import socket
+
+import pytest
+
+from esp32_scanner import _probe_stream_host, _scan_hosts
+
+MJPEG_HOST, HTML_HOST, CLOSED_HOST, SILENT_HOST = '127.0.0.2', '127.0.0.3', '127.0.0.4', '127.0.0.5'
+BOUNDARY = '123456789000000000000987654321'
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def _serve(host, port, content_type=None):
+    """Servidor HTTP mínimo: responde 200 con 'content_type', o nunca responde si es None"""
+    async def handle(reader, writer):
+        try:
+            await reader.readuntil(b"\r\n\r\n")
+            if content_type is None:
+                await asyncio.sleep(5)  # Acepta la conexión pero no contesta
+                return
+            writer.write(f"HTTP/1.1 200 OK\r\nContent-Type: {content_type}\r\n\r\n".encode('ascii'))
+            if content_type.startswith('multipart'):
+                writer.write(f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: 4\r\n\r\n".encode('ascii')
+                             + b"\xff\xd8\xff\xd9\r\n")
+            else:
+                writer.write(b"<html><body>router</body></html>")
+            await writer.drain()
+        except (OSError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+
+async def _with_servers(coro_factory):
+    port = _free_port()
+    try:
+        servers = [await _serve(MJPEG_HOST, port, f"multipart/x-mixed-replace;boundary={BOUNDARY}"),
+                   await _serve(HTML_HOST, port, "text/html"),
+                   await _serve(SILENT_HOST, port)]
+    except OSError as e:
+        pytest.skip(f"Sin direcciones 127.0.0.x adicionales en este sistema: {e}")
+    try:
+        return await coro_factory(port)
+    finally:
+        for server in servers:
+            server.close()
+            await server.wait_closed()
+
+
+def test_solo_se_reporta_el_host_mjpeg():
+    hosts = [HTML_HOST, CLOSED_HOST, MJPEG_HOST, SILENT_HOST]
+    seen = []
+
+    found = asyncio.run(_with_servers(lambda port: _scan_hosts(
+        hosts, port, '/stream', concurrency=2, timeout=0.5, progress=lambda ip, done, total, ct: seen.append(ip))))
+
+    assert [ip for ip, _ in found] == [MJPEG_HOST]
+    assert found[0][1].startswith('multipart/x-mixed-replace')
+    assert sorted(seen) == sorted(hosts)  # Todos se sondearon (incluido el que no contesta)
+
+
+def test_probe_por_host():
+    async def probes(port):
+        return {host: await _probe_stream_host(host, port, '/stream', timeout=0.5)
+                for host in (MJPEG_HOST, HTML_HOST, CLOSED_HOST, SILENT_HOST)}
+
+    result = asyncio.run(_with_servers(probes))
+    assert result[MJPEG_HOST] == f"multipart/x-mixed-replace;boundary={BOUNDARY}"
+    assert result[HTML_HOST] is None
+    assert result[CLOSED_HOST] is None
+    assert result[SILENT_HOST] is None
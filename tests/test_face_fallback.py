@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""El rostro del fallback asíncrono tiene que terminar como un track visible (y contado)"""
+
+import time
+
+import numpy as np
+
+from detection_tracker import DetectionTracker
+from face_fallback import FaceFallbackWorker
+from reid_store import ReIDStore
+
+PERSONA = ((180, 100, 40, 90), 0.8)
+MAX_NO_DETECT_FRAMES = 10  # Igual que camera_stream.py
+
+
+class CascadaFija:
+    """Haar de prueba: encuentra siempre un rostro en (10, 10) de cada ROI"""
+
+    def detectMultiScale(self, gray, **kwargs):
+        return np.array([(10, 10, 30, 30)])
+
+
+def _rostros_del_fallback(tracker, frame):
+    worker = FaceFallbackWorker(CascadaFija()).start()
+    try:
+        assert worker.submit(frame, tracker.lost_regions(), frame_index=100)
+        for _ in range(200):
+            caras = worker.poll(frame_index=101, max_age_frames=5)
+            if caras is not None:
+                return caras
+            time.sleep(0.01)
+    finally:
+        worker.stop()
+    raise AssertionError("el fallback no respondió")
+
+
+def _perder_persona(tracker):
+    for _ in range(3):
+        tracker.update([PERSONA])
+    assert tracker.last_count == 1
+    # Frames vacíos hasta que camera_stream pide el fallback: el track ya se retiró (max_lost=8)
+    for _ in range(MAX_NO_DETECT_FRAMES):
+        tracker.update([])
+    assert tracker.tracks == {}
+
+
+def test_rostro_del_fallback_crea_track_visible():
+    frame = np.zeros((300, 400, 3), dtype=np.uint8)
+    tracker = DetectionTracker()
+    _perder_persona(tracker)
+
+    caras = _rostros_del_fallback(tracker, frame)
+    num_personas, stats = tracker.update(caras)
+    assert num_personas == 1 and stats['personas_actuales'] == 1
+    assert [conf for _, conf in tracker.get_smoothed_detections()] == [None]
+
+    # Sin más rostros el track sigue visible mientras está perdido
+    num_personas, _ = tracker.update([])
+    assert num_personas == 1
+    assert len(tracker.get_smoothed_detections()) == 1
+
+
+def test_rostro_del_fallback_retoma_el_track_perdido():
+    frame = np.zeros((300, 400, 3), dtype=np.uint8)
+    tracker = DetectionTracker(reid_store=ReIDStore())
+    _perder_persona(tracker)
+    id_original = next(iter(tracker.unique_ids))
+
+    tracker.update(_rostros_del_fallback(tracker, frame))
+    assert list(tracker.tracks) == [id_original]
+    assert tracker.reid_count == 1
+    assert len(tracker.unique_ids) == 1  # La misma persona no se cuenta dos veces
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""LatencyProber contra servidores locales (TCP) y un eco ICMP simulado sobre UDP"""
+
+import asyncio
+import socket
+import threading
+import types
+
+import latency_prober
+from latency_prober import LatencyProber
+
+_REAL_SOCKET = socket.socket
+
+
+def test_tcp_contra_puerto_local():
+    server = _REAL_SOCKET(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(('127.0.0.1', 0))
+    server.listen(4)
+    try:
+        prober = LatencyProber('127.0.0.1', port=server.getsockname()[1], method='tcp')
+        rtt = asyncio.run(prober.probe_once())
+        assert rtt is not None and 0 <= rtt < 1000
+    finally:
+        server.close()
+
+
+def test_icmp_sin_sock_sendto(monkeypatch):
+    """El eco ICMP no depende de loop.sock_sendto (solo existe desde Python 3.11)"""
+    echo = _REAL_SOCKET(socket.AF_INET, socket.SOCK_DGRAM)
+    echo.bind(('127.0.0.1', 0))
+    echo.settimeout(2.0)
+    echo_port = echo.getsockname()[1]
+
+    def responder():
+        # Devuelve la solicitud como respuesta de eco (tipo 0), como hace el kernel con SOCK_DGRAM
+        try:
+            packet, addr = echo.recvfrom(1024)
+        except OSError:
+            return
+        echo.sendto(b'\x00' + packet[1:], addr)
+
+    class SocketEco(_REAL_SOCKET):
+        """Socket UDP que redirige el 'connect' del ping al servidor de eco local"""
+
+        def __init__(self, family, type, proto=0):
+            super().__init__(socket.AF_INET, socket.SOCK_DGRAM)
+
+        def connect(self, address):
+            super().connect((address[0], echo_port))
+
+    thread = threading.Thread(target=responder, daemon=True)
+    thread.start()
+    # Solo el módulo probado ve el socket falso (asyncio sigue usando los reales)
+    fake = types.SimpleNamespace(**{name: getattr(socket, name) for name in dir(socket) if name.isupper()})
+    fake.socket = SocketEco
+    monkeypatch.setattr(latency_prober, 'socket', fake)
+    monkeypatch.delattr(asyncio.selector_events.BaseSelectorEventLoop, 'sock_sendto', raising=False)
+    try:
+        prober = LatencyProber('127.0.0.1', method='icmp')
+        rtt = asyncio.run(prober.probe_once())
+        assert rtt is not None and 0 <= rtt < 1000
+        assert prober._seq == 1
+    finally:
+        thread.join(2.0)
+        echo.close()
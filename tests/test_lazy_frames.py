@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""LatestFrameQueue y LazyFrame con un decodificador que cuenta llamadas"""
+
+import threading
+
+import pytest
+
+from lazy_frames import LatestFrameQueue
+
+
+class DecoderContador:
+    def __init__(self, result='imagen'):
+        self.result = result
+        self.calls = []
+
+    def decode(self, data):
+        self.calls.append(data)
+        return None if data == b'corrupto' else self.result
+
+
+def test_descarta_frames_viejos_sin_decodificar():
+    decoder = DecoderContador()
+    queue = LatestFrameQueue(decoder)
+    for i in range(5):
+        queue.push(b'jpeg%d' % i, arrived_at=float(i), first_byte_at=i - 0.05)
+    (frame,) = queue.latest(timeout=0)
+    assert (frame.data, frame.seq, frame.arrived_at, frame.first_byte_at) == (b'jpeg4', 5, 4.0, 3.95)
+    assert len(queue) == 0
+    # Los cuatro anteriores se descartaron todavía comprimidos
+    assert decoder.calls == [] and not frame.decoded
+
+
+def test_decodifica_una_sola_vez_al_acceder():
+    decoder = DecoderContador()
+    queue = LatestFrameQueue(decoder)
+    queue.push(b'jpeg', arrived_at=1.0)
+    (frame,) = queue.latest(timeout=0)
+    assert frame.first_byte_at == 1.0  # Sin primer byte explícito se usa la llegada
+    assert frame.image == 'imagen' and frame.image == 'imagen'
+    assert frame.decoded and decoder.calls == [b'jpeg']
+
+
+def test_jpeg_ilegible_no_se_reintenta():
+    decoder = DecoderContador()
+    queue = LatestFrameQueue(decoder)
+    queue.push(b'corrupto', arrived_at=0.0)
+    (frame,) = queue.latest(timeout=0)
+    assert frame.image is None and frame.image is None
+    assert decoder.calls == [b'corrupto']
+
+
+def test_estadisticas_y_limite_de_pendientes():
+    queue = LatestFrameQueue(DecoderContador(), max_pending=3)
+    for i in range(5):
+        queue.push(b'x' * (i + 1), arrived_at=float(i))
+    # Cola llena: los dos más viejos se descartan al encolar
+    assert len(queue) == 3
+    assert queue.stats() == {'pushed': 5, 'delivered': 0, 'skipped': 2, 'skipped_bytes': 1 + 2}
+    (frame,) = queue.latest(timeout=0)
+    assert frame.size == 5
+    assert queue.stats() == {'pushed': 5, 'delivered': 1, 'skipped': 4, 'skipped_bytes': 1 + 2 + 3 + 4}
+    assert queue.latest(timeout=0) == ()
+
+
+def test_cierre_despierta_al_consumidor_y_propaga_el_error():
+    queue = LatestFrameQueue(DecoderContador())
+    results = []
+    consumer = threading.Thread(target=lambda: results.append(queue.latest(timeout=5)))
+    consumer.start()
+    error = ConnectionError('stream cortado')
+    queue.close(error)
+    consumer.join(timeout=5)
+    assert results == [()] and queue.finished
+    with pytest.raises(ConnectionError) as raised:
+        queue.raise_error()
+    assert raised.value is error
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""MJPEGDemuxer sobre bytes armados a mano"""
+
+from mjpeg_stream import MAX_FRAME_BYTES, MJPEGDemuxer
+
+BOUNDARY = b'--frame'
+
+
+def segment(marker, payload=b''):
+    """Segmento JPEG con longitud (FF marker + 2 bytes de longitud + payload)"""
+    return bytes([0xFF, marker]) + (len(payload) + 2).to_bytes(2, 'big') + payload
+
+
+def jpeg(scan_size=64, extra=b''):
+    """JPEG mínimo: SOI, APP0 (+ segmentos extra), SOS, datos de scan sin FF y EOI"""
+    scan = bytes((i % 200) + 1 for i in range(scan_size))
+    return b'\xff\xd8' + segment(0xE0, b'JFIF\x00') + extra + segment(0xDA, b'\x01\x01\x00') + scan + b'\xff\xd9'
+
+
+def part(body, length=True, headers=b''):
+    head = BOUNDARY + b'\r\nContent-Type: image/jpeg\r\n'
+    if length is True:
+        head += b'Content-Length: %d\r\n' % len(body)
+    elif length is not None:
+        head += b'Content-Length: ' + length + b'\r\n'
+    return head + headers + b'\r\n' + body + b'\r\n'
+
+
+def feed_chunks(demuxer, data, chunk=4096):
+    frames = []
+    for i in range(0, len(data), chunk):
+        frames += demuxer.feed(data[i:i + chunk])
+    return frames
+
+
+def test_frame_mayor_que_buffer_max():
+    """Un frame válido más grande que el buffer actual se entrega, no se rechaza ni se recorta"""
+    big = jpeg(scan_size=50000)
+    demuxer = MJPEGDemuxer(BOUNDARY, buffer_max=32768, buffer_keep=16384)
+    frames = feed_chunks(demuxer, part(big) + part(jpeg()) + BOUNDARY)
+    assert frames == [big, jpeg()]
+    assert demuxer.frames_rejected == 0 and demuxer.bytes_discarded == 0
+
+
+def test_frame_mayor_que_buffer_max_sin_content_length():
+    """Sin Content-Length no hay tamaño declarado: el recorte se cuenta y el tuner puede agrandar el buffer"""
+    demuxer = MJPEGDemuxer(BOUNDARY, buffer_max=32768, buffer_keep=16384)
+    feed_chunks(demuxer, part(jpeg(scan_size=50000), length=None) + BOUNDARY)
+    assert demuxer.bytes_discarded > 0
+
+
+def test_content_length_sobre_el_tope():
+    demuxer = MJPEGDemuxer(BOUNDARY)
+    frames = demuxer.feed(part(b'', length=b'%d' % (MAX_FRAME_BYTES + 1)) + part(jpeg()) + BOUNDARY)
+    assert frames == [jpeg()]
+    assert demuxer.corrupt['bad_length'] == 1
+
+
+# ===== Clases de rechazo =====
+
+def test_content_length_ilegible():
+    demuxer = MJPEGDemuxer(BOUNDARY)
+    frames = demuxer.feed(part(jpeg(), length=b'abc') + part(jpeg()) + BOUNDARY)
+    assert frames == [jpeg()]
+    assert demuxer.corrupt['bad_length'] == 1 and demuxer.frames_rejected == 1
+
+
+def test_truncado_con_content_length():
+    """El boundary siguiente aparece dentro del cuerpo declarado: el frame se cortó"""
+    body = jpeg()
+    cut = part(body)[:-(len(body) // 2)]
+    demuxer = MJPEGDemuxer(BOUNDARY)
+    frames = demuxer.feed(cut + part(jpeg(scan_size=10)) + BOUNDARY)
+    assert frames == [jpeg(scan_size=10)]
+    assert demuxer.corrupt['truncated'] == 1
+    assert demuxer.bytes_rejected == len(cut) - cut.index(b'\xff\xd8')
+
+
+def test_truncado_sin_content_length():
+    body = jpeg()
+    demuxer = MJPEGDemuxer(BOUNDARY)
+    frames = demuxer.feed(part(body[:-10], length=None) + part(jpeg(scan_size=10), length=None) + BOUNDARY)
+    assert frames == [jpeg(scan_size=10)]
+    assert demuxer.corrupt['truncated'] == 1
+
+
+def test_headers_sin_terminar():
+    demuxer = MJPEGDemuxer(BOUNDARY)
+    garbage = BOUNDARY + b'\r\nContent-Type: image/jpeg\r\n' + b'X' * 2000
+    frames = demuxer.feed(garbage + part(jpeg()) + BOUNDARY)
+    assert frames == [jpeg()]
+    assert demuxer.corrupt['bad_headers'] == 1
+
+
+def test_headers_incompletos_esperan_mas_datos():
+    demuxer = MJPEGDemuxer(BOUNDARY)
+    data = part(jpeg()) + BOUNDARY
+    assert demuxer.feed(data[:30]) == []
+    assert demuxer.feed(data[30:]) == [jpeg()]
+    assert demuxer.frames_rejected == 0
+
+
+def test_sin_soi():
+    demuxer = MJPEGDemuxer(BOUNDARY)
+    frames = demuxer.feed(part(b'GARBAGE' + jpeg()[2:]) + part(b'GARBAGE', length=None) + part(jpeg()) + BOUNDARY)
+    assert frames == [jpeg()]
+    assert demuxer.corrupt['no_soi'] == 2
+
+
+def test_sin_eoi():
+    demuxer = MJPEGDemuxer(BOUNDARY)
+    frames = demuxer.feed(part(jpeg()[:-2] + b'\x12\x34') + part(jpeg()) + BOUNDARY)
+    assert frames == [jpeg()]
+    assert demuxer.corrupt['no_eoi'] == 1
+
+
+def test_relleno_despues_del_eoi_se_acepta():
+    """Algunos firmwares rellenan el cuerpo declarado con CRLF o ceros después del EOI"""
+    body = jpeg() + b'\r\n\x00\x00'
+    demuxer = MJPEGDemuxer(BOUNDARY)
+    assert demuxer.feed(part(body) + BOUNDARY) == [body]
+
+
+def test_segmentos_invalidos_antes_del_sos():
+    bad = b'\xff\xd8\x12\x34' + jpeg()[2:]   # Byte que no es marcador después del SOI
+    restart = b'\xff\xd8\xff\xd0' + jpeg()[2:]  # RST antes del scan
+    demuxer = MJPEGDemuxer(BOUNDARY)
+    frames = demuxer.feed(part(bad) + part(restart) + part(bad, length=None) + part(jpeg()) + BOUNDARY)
+    assert frames == [jpeg()]
+    assert demuxer.corrupt['bad_markers'] == 3
+    assert demuxer.corruption_summary() == 'bad_markers=3'
+
+
+def test_miniatura_exif_con_su_propio_eoi():
+    """El EOI de la miniatura (dentro de APP1) no corta el frame, con o sin Content-Length"""
+    thumbnail = jpeg(scan_size=16)
+    body = jpeg(extra=segment(0xE1, b'Exif\x00\x00' + thumbnail))
+    assert body.index(b'\xff\xd9') < len(body) - 2
+    for length in (True, None):
+        demuxer = MJPEGDemuxer(BOUNDARY)
+        assert demuxer.feed(part(body, length=length) + BOUNDARY) == [body]
+        assert demuxer.frames_rejected == 0
+
+
+def test_sin_content_length_por_chunks():
+    """El recorrido SOI -> SOS -> EOI funciona aunque el frame llegue en trozos de pocos bytes"""
+    body = jpeg(extra=segment(0xE1, b'Exif\x00\x00' + jpeg(scan_size=16)))
+    demuxer = MJPEGDemuxer(BOUNDARY)
+    frames = feed_chunks(demuxer, (part(body, length=None) * 3) + BOUNDARY, chunk=7)
+    assert frames == [body] * 3
+    assert demuxer.jpeg_bytes == 3 * len(body) and demuxer.frames_rejected == 0
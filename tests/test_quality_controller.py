@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""QualityController contra un /control local que imita al CameraWebServer"""
+
+import http.server
+import threading
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from lazy_frames import LatestFrameQueue
+from quality_controller import QUALITY_LEVELS, QualityController, control_url_from_stream, network_latency_ms
+
+
+@pytest.fixture
+def control_server():
+    """Servidor /control que registra cada (var, val) recibido"""
+    received = []
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path != '/control':
+                self.send_error(404)
+                return
+            query = parse_qs(url.query)
+            received.append((query['var'][0], int(query['val'][0])))
+            self.send_response(200)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/control", received
+    server.shutdown()
+    server.server_close()
+
+
+def _feed(controller, latency_ms, seconds, start, frame_bytes=15 * 1024, fps=20):
+    """Frames a 'fps' durante 'seconds'; retorna el primer cambio (+1/-1) y el instante final"""
+    now = start
+    for _ in range(int(seconds * fps)):
+        now += 1.0 / fps
+        change = controller.observe(latency_ms, frame_bytes, now=now)
+        if change:
+            controller._worker.join(timeout=5)
+            return change, now
+    return 0, now
+
+
+def test_latencia_de_red_excluye_el_procesamiento():
+    # Primer byte en t=10.00 s, JPEG completo en 10.08 s: 80 ms + RTT, sin importar la cola ni YOLO
+    assert network_latency_ms(10.0, 10.08, rtt_ms=20) == pytest.approx(100)
+    assert network_latency_ms(10.0, 10.08) == pytest.approx(80)
+
+
+def test_control_url_desde_el_stream():
+    assert control_url_from_stream('http://10.0.0.5:81/stream') == 'http://10.0.0.5/control'
+    assert control_url_from_stream('http://127.0.0.1:8080/stream') == 'http://127.0.0.1:8080/control'
+
+
+def test_baja_y_sube_calidad_via_control(control_server):
+    url, received = control_server
+    controller = QualityController(url, start_level=3)
+
+    # Red lenta sostenida: baja un escalón y envía quality + framesize del nuevo nivel
+    change, now = _feed(controller, latency_ms=400, seconds=5, start=0.0)
+    assert change == -1 and controller.level == 4
+    assert received == [('quality', QUALITY_LEVELS[4]['quality']), ('framesize', QUALITY_LEVELS[4]['framesize'])]
+    assert controller.applied_level == 4 and controller.errors == 0
+
+    # Red rápida sostenida (más que up_after_sec): vuelve a subir
+    received.clear()
+    change, _ = _feed(controller, latency_ms=60, seconds=20, start=now)
+    assert change == 1 and controller.level == 3
+    assert received == [('quality', QUALITY_LEVELS[3]['quality']), ('framesize', QUALITY_LEVELS[3]['framesize'])]
+
+
+def test_procesamiento_lento_no_baja_la_calidad(control_server):
+    url, _ = control_server
+    controller = QualityController(url, start_level=3)
+    # La cámara manda un frame cada 0.35 s que tarda 60 ms en llegar completo; el host tarda 0.4 s
+    # por frame (YOLO + dibujo), así cada frame espera en la cola hasta que el loop se libera
+    queue = LatestFrameQueue(decoder=None)
+    interval, transfer, processing, rtt = 0.35, 0.06, 0.4, 15
+    next_frame, now = 0, 0.0
+    changes, to_dequeue = [], []
+    while now < 60:
+        while next_frame * interval + transfer <= now:
+            first_byte = next_frame * interval
+            queue.push(b'jpeg', arrived_at=first_byte + transfer, first_byte_at=first_byte)
+            next_frame += 1
+        frames = queue.latest(timeout=0)
+        if not frames:
+            now = next_frame * interval + transfer
+            continue
+        (frame,) = frames
+        to_dequeue.append(network_latency_ms(frame.first_byte_at, now, rtt_ms=rtt))
+        now += processing
+        changes.append(controller.observe(network_latency_ms(frame.first_byte_at, frame.arrived_at, rtt_ms=rtt),
+                                          15 * 1024, now=now))
+    # Medido hasta el desencolado, la espera en cola parecería red lenta...
+    assert sum(to_dequeue) / len(to_dequeue) > controller.high_latency_ms
+    # ...pero la red va bien (75 ms): puede subir, nunca bajar
+    assert -1 not in changes and controller.level <= 3
+
+
+def test_error_de_control_no_cambia_el_nivel_aplicado():
+    controller = QualityController('http://127.0.0.1:9/control', start_level=3, timeout=0.5)
+    controller.apply(wait=True)
+    assert controller.errors == 1 and controller.applied_level is None
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""Eventos de ciclo de vida que DetectionTracker publica en el TrackEventBus"""
+
+import threading
+
+from detection_tracker import DetectionTracker
+from track_events import BORN, CONFIRMED, LOST, RECOVERED, TERMINATED, TrackEventBus, start_consumer
+
+PERSONA = ((180, 100, 40, 90), 0.8)
+GRUPO = [((20, 100, 40, 90), 0.8), ((320, 100, 40, 90), 0.8), ((620, 100, 40, 90), 0.8)]
+
+
+def _tipos(events):
+    return [event['type'] for event in events]
+
+
+def test_ciclo_completo_de_un_track():
+    bus = TrackEventBus()
+    sub = bus.subscribe('todos')
+    tracker = DetectionTracker(event_bus=bus)  # min_hits=3, max_lost=8
+
+    for _ in range(3):
+        tracker.update([PERSONA])
+    tracker.update([])
+    tracker.update([PERSONA])
+    for _ in range(tracker.max_lost):
+        tracker.update([])
+
+    events = sub.drain()
+    assert _tipos(events) == [BORN, CONFIRMED, LOST, RECOVERED, LOST, TERMINATED]
+    assert {event['track_id'] for event in events} == {1}
+    assert [event['frame'] for event in events[:4]] == [1, 3, 4, 5]
+    born, confirmed, _, recovered, _, terminated = events
+    assert born['box'] == (180, 100, 40, 90) and born['conf'] == 0.8
+    assert confirmed['reidentified'] is False
+    assert recovered['lost_frames'] == 1
+    assert terminated['confirmed'] is True and terminated['reason'] == 'lost'
+    assert terminated['dwell_sec'] >= 0
+    assert tracker.tracks == {} and bus.published == len(events)
+
+
+def test_tentativo_descartado_no_se_confirma():
+    bus = TrackEventBus()
+    sub = bus.subscribe()
+    tracker = DetectionTracker(event_bus=bus)
+    tracker.update([PERSONA])
+    tracker.update([])
+    events = sub.drain()
+    assert _tipos(events) == [BORN, TERMINATED]
+    assert events[1]['confirmed'] is False and events[1]['reason'] == 'unconfirmed'
+    assert tracker.unique_ids == set()
+
+
+def test_filtro_por_tipo():
+    bus = TrackEventBus()
+    todos = bus.subscribe('todos')
+    conteo = bus.subscribe('conteo', types=(CONFIRMED, TERMINATED))
+    tracker = DetectionTracker(event_bus=bus)
+    for _ in range(3):
+        tracker.update([PERSONA])
+    for _ in range(tracker.max_lost):
+        tracker.update([])
+    assert _tipos(todos.drain()) == [BORN, CONFIRMED, LOST, TERMINATED]
+    assert _tipos(conteo.drain()) == [CONFIRMED, TERMINATED]
+    assert conteo.received == 2 and conteo.dropped == 0
+
+
+def test_cola_acotada_descarta_lo_mas_viejo_sin_afectar_a_otros():
+    bus = TrackEventBus()
+    lento = bus.subscribe('lento', maxsize=2)
+    rapido = bus.subscribe('rapido')
+    tracker = DetectionTracker(event_bus=bus)
+    for _ in range(3):
+        tracker.update(GRUPO)
+
+    # 3 nacimientos + 3 confirmaciones: el suscriptor lento conserva solo las dos últimas
+    assert _tipos(rapido.drain()) == [BORN] * 3 + [CONFIRMED] * 3
+    events = lento.drain()
+    assert _tipos(events) == [CONFIRMED, CONFIRMED]
+    assert [event['track_id'] for event in events] == [2, 3]
+    assert (lento.received, lento.dropped) == (6, 4)
+    stats = {s['name']: s for s in bus.stats()['subscribers']}
+    assert stats['lento']['dropped'] == 4 and stats['rapido']['dropped'] == 0
+
+
+def test_sin_suscriptores_no_se_publica():
+    bus = TrackEventBus()
+    tracker = DetectionTracker(event_bus=bus)
+    for _ in range(3):
+        tracker.update([PERSONA])
+    assert bus.published == 0
+
+    sub = bus.subscribe()
+    sub.close()
+    tracker.update([])
+    assert bus.published == 0 and not bus.active
+
+
+def test_consumidor_en_hilo_sobrevive_a_errores_del_handler():
+    bus = TrackEventBus()
+    sub = bus.subscribe('hilo')
+    recibidos = []
+    listo = threading.Event()
+
+    def handler(event):
+        recibidos.append(event['type'])
+        if event['type'] == BORN:
+            raise ValueError('handler roto')
+        if event['type'] == CONFIRMED:
+            listo.set()
+
+    thread = start_consumer(sub, handler)
+    tracker = DetectionTracker(event_bus=bus)
+    for _ in range(3):
+        tracker.update([PERSONA])
+    assert listo.wait(timeout=5)
+    sub.close()
+    thread.join(timeout=5)
+    assert recibidos == [BORN, CONFIRMED] and not thread.is_alive()
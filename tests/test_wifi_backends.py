@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+"""Parsers de netsh / nmcli / iw / /proc/net/wireless sobre salidas capturadas"""
+
+import pytest
+
+import wifi_backends
+from wifi_backends import (_NMCLI_FIELDS, _NMCLI_FIELDS_WIDTH, parse_iw_channel, parse_iw_link,
+                           parse_netsh_interfaces, parse_netsh_networks, parse_nmcli_wifi_list,
+                           parse_proc_net_wireless)
+
+# ===== Salidas capturadas =====
+
+NETSH_NETWORKS_EN = """
+Interface name : Wi-Fi
+There are 2 networks currently visible.
+
+SSID 1 : PUCP
+    Network type            : Infrastructure
+    Authentication          : WPA2-Enterprise
+    Encryption              : CCMP
+    BSSID 1                 : aa:bb:cc:dd:ee:01
+         Signal             : 86%
+         Radio type         : 802.11ax
+         Band               : 5 GHz
+         Channel            : 36
+         Channel width      : 40 MHz
+         Bss Load:
+             Connected Stations:        12
+             Channel Utilization:       51 (20 %)
+             Medium Available Capacity: 31250
+         Basic rates (Mbps) : 6 12 24
+         Other rates (Mbps) : 9 18 36 48 54
+    BSSID 2                 : aa:bb:cc:dd:ee:02
+         Signal             : 40%
+         Radio type         : 802.11n
+         Band               : 2.4 GHz
+         Channel            : 11
+         Basic rates (Mbps) : 1 2 5.5 11
+         Other rates (Mbps) : 6 9 12 18 24 36 48 54
+
+SSID 2 : Invitados
+    Network type            : Infrastructure
+    Authentication          : Open
+    Encryption              : None
+    BSSID 1                 : aa:bb:cc:dd:ee:03
+         Signal             : 20%
+         Radio type         : 802.11n
+         Channel            : 1
+"""
+
+NETSH_NETWORKS_ES = """
+Nombre de interfaz : Wi-Fi
+Hay 2 redes visibles actualmente.
+
+SSID 1 : redpucp
+    Tipo de red             : Infraestructura
+    Autenticación           : WPA2-Personal
+    Cifrado                 : CCMP
+    BSSID 1                 : aa:bb:cc:dd:ee:10
+         Señal              : 72%
+         Tipo de radio      : 802.11n
+         Banda              : 2,4 GHz
+         Canal              : 6
+         Ancho de canal     : 20 MHz
+         Carga de BSS:
+             Estaciones conectadas:  4
+             Uso del canal:          40 (15 %)
+         Velocidades básicas (Mbps) : 1 2 5.5 11
+
+SSID 2 : Laboratorio
+    Tipo de red             : Infraestructura
+    Autenticación           : WPA2-Personal
+    Cifrado                 : CCMP
+    BSSID 1                 : aa:bb:cc:dd:ee:11
+         Se├▒al              : 55%
+         Tipo de radio      : 802.11ac
+         Banda              : 5 GHz
+         Canal              : 149
+"""
+
+NETSH_INTERFACES_EN = """
+There is 1 interface on the system:
+
+    Name                   : Wi-Fi
+    Description            : Intel(R) Wi-Fi 6 AX201 160MHz
+    Physical address       : 11:22:33:44:55:66
+    State                  : connected
+    SSID                   : PUCP
+    BSSID                  : aa:bb:cc:dd:ee:01
+    Network type           : Infrastructure
+    Radio type             : 802.11ac
+    Authentication         : WPA2-Enterprise
+    Cipher                 : CCMP
+    Connection mode        : Profile
+    Band                   : 5 GHz
+    Channel                : 44
+    Receive rate (Mbps)    : 433.3
+    Transmit rate (Mbps)   : 390
+    Signal                 : 90%
+    Profile                : PUCP
+"""
+
+NETSH_INTERFACES_ES = """
+Hay 1 interfaz en el sistema:
+
+    Nombre                 : Wi-Fi
+    Descripción            : Realtek RTL8821CE 802.11ac PCIe Adapter
+    Estado                 : conectado
+    SSID                   : redpucp
+    BSSID                  : aa:bb:cc:dd:ee:10
+    Tipo de red            : Infraestructura
+    Tipo de radio          : 802.11n
+    Autenticación          : WPA2-Personal
+    Cifrado                : CCMP
+    Modo de conexión       : Perfil
+    Canal                  : 6
+    Velocidad de recepción (Mbps)  : 144,4
+    Velocidad de transmisión (Mbps) : 72,2
+    Señal                  : 70%
+    Perfil                 : redpucp
+"""
+
+# nmcli -t: los ':' dentro de los valores (BSSID, SSID) vienen escapados como '\:'
+NMCLI_WITH_WIDTH = (
+    "*:AA\\:BB\\:CC\\:DD\\:EE\\:01:PUCP:44:5220 MHz:85:WPA2 802.1X:540 Mbit/s:80 MHz\n"
+    " :AA\\:BB\\:CC\\:DD\\:EE\\:02:lab\\:2:6:2437 MHz:60:WPA2:130 Mbit/s:20 MHz\n"
+    " :AA\\:BB\\:CC\\:DD\\:EE\\:03::1:2412 MHz:30::54 Mbit/s:20 MHz\n"
+)
+NMCLI_WITHOUT_WIDTH = " :AA\\:BB\\:CC\\:DD\\:EE\\:04:cafe:--:5745 MHz:50:WPA2:270 Mbit/s\n"
+
+IW_LINK_CONNECTED = """Connected to aa:bb:cc:dd:ee:01 (on wlp2s0)
+	SSID: PUCP
+	freq: 5180.0
+	RX: 123456 bytes (789 packets)
+	TX: 23456 bytes (123 packets)
+	signal: -52 dBm
+	rx bitrate: 866.7 MBit/s VHT-MCS 9 80MHz short GI VHT-NSS 2
+	tx bitrate: 650.0 MBit/s VHT-MCS 7 80MHz short GI VHT-NSS 2
+	bss flags:	short-slot-time
+	dtim period:	1
+	beacon int:	100
+"""
+
+IW_LINK_24_HT20 = """Connected to AA:BB:CC:DD:EE:10 (on wlan0)
+	SSID: redpucp
+	freq: 2437
+	signal: -67 dBm
+	rx bitrate: 72.2 MBit/s MCS 7 short GI
+	tx bitrate: 65.0 MBit/s MCS 6
+"""
+
+IW_LINK_DISCONNECTED = "Not connected.\n"
+
+IW_INFO = """Interface wlp2s0
+	ifindex 3
+	wdev 0x1
+	addr 11:22:33:44:55:66
+	ssid PUCP
+	type managed
+	wiphy 0
+	channel 36 (5180 MHz), width: 80 MHz, center1: 5210 MHz
+	txpower 22.00 dBm
+"""
+
+PROC_NET_WIRELESS = """Inter-| sta-|   Quality        |   Discarded packets               | Missed | WE
+ face | tus | link level noise |  nwid  crypt   frag  retry   misc | beacon | 22
+wlp2s0: 0000   58.  -52.  -256        0      0      0      3     12        0
+ wlan1: 0000   30.  -80.  -256        0      0      0      0      0        0
+"""
+
+
+# ===== netsh =====
+
+def test_netsh_networks_ingles():
+    networks = {n['bssid']: n for n in parse_netsh_networks(NETSH_NETWORKS_EN)}
+    assert len(networks) == 3
+    bss = networks['aa:bb:cc:dd:ee:01']
+    assert bss['ssid'] == 'PUCP'
+    assert (bss['channel'], bss['band'], bss['width_mhz']) == (36, '5GHz', 40)
+    # La utilización del canal (con %) no se confunde con la señal
+    assert bss['signal_percent'] == 86 and bss['rssi_dbm'] == -38
+    bss = networks['aa:bb:cc:dd:ee:02']
+    assert (bss['ssid'], bss['channel'], bss['band'], bss['rssi_dbm']) == ('PUCP', 11, '2.4GHz', -66)
+    assert 'width_mhz' not in bss
+    # Sin línea de banda: se infiere del canal
+    assert networks['aa:bb:cc:dd:ee:03']['band'] == '2.4GHz'
+
+
+def test_netsh_networks_espanol_y_consola_mal_codificada():
+    networks = {n['bssid']: n for n in parse_netsh_networks(NETSH_NETWORKS_ES)}
+    bss = networks['aa:bb:cc:dd:ee:10']
+    assert (bss['ssid'], bss['channel'], bss['band'], bss['width_mhz']) == ('redpucp', 6, '2.4GHz', 20)
+    assert bss['signal_percent'] == 72 and bss['rssi_dbm'] == -46
+    bss = networks['aa:bb:cc:dd:ee:11']
+    assert (bss['channel'], bss['band'], bss['signal_percent']) == (149, '5GHz', 55)
+
+
+def test_netsh_interfaces_ingles():
+    info = parse_netsh_interfaces(NETSH_INTERFACES_EN)
+    assert (info['ssid'], info['bssid'], info['channel'], info['band']) == ('PUCP', 'aa:bb:cc:dd:ee:01', 44, '5GHz')
+    assert info['signal_percent'] == 90 and info['rssi_dbm'] == -36
+    assert (info['rx_rate_mbps'], info['tx_rate_mbps']) == (433.3, 390.0)
+
+
+def test_netsh_interfaces_espanol_con_coma_decimal():
+    info = parse_netsh_interfaces(NETSH_INTERFACES_ES)
+    assert (info['ssid'], info['channel'], info['band']) == ('redpucp', 6, '2.4GHz')
+    assert info['signal_percent'] == 70 and info['rssi_dbm'] == -48
+    assert (info['rx_rate_mbps'], info['tx_rate_mbps']) == (144.4, 72.2)
+
+
+def test_netsh_sin_interfaz():
+    assert parse_netsh_interfaces("There is 0 interface on the system:\n") is None
+
+
+# ===== nmcli =====
+
+def test_nmcli_con_ancho_y_dos_puntos_escapados():
+    networks = parse_nmcli_wifi_list(NMCLI_WITH_WIDTH, _NMCLI_FIELDS_WIDTH)
+    assert [n['bssid'] for n in networks] == ['aa:bb:cc:dd:ee:01', 'aa:bb:cc:dd:ee:02', 'aa:bb:cc:dd:ee:03']
+    in_use, lab, hidden = networks
+    assert in_use['in_use'] and not lab['in_use']
+    assert (in_use['channel'], in_use['band'], in_use['width_mhz']) == (44, '5GHz', 80)
+    assert in_use['signal_percent'] == 85 and in_use['rssi_dbm'] == -57
+    assert lab['ssid'] == 'lab:2'
+    assert (lab['channel'], lab['band'], lab['width_mhz'], lab['rssi_dbm']) == (6, '2.4GHz', 20, -70)
+    assert (hidden['ssid'], hidden['auth']) == ('Oculta', 'Abierta')
+
+
+def test_nmcli_sin_bandwidth_usa_la_frecuencia():
+    (net,) = parse_nmcli_wifi_list(NMCLI_WITHOUT_WIDTH, _NMCLI_FIELDS)
+    assert (net['channel'], net['band']) == (149, '5GHz')
+    assert 'width_mhz' not in net
+    # Con la lista de campos equivocada la línea se ignora en vez de desalinear columnas
+    assert parse_nmcli_wifi_list(NMCLI_WITHOUT_WIDTH, _NMCLI_FIELDS_WIDTH) == []
+
+
+# ===== iw / /proc/net/wireless =====
+
+def test_iw_link_conectado():
+    info = parse_iw_link(IW_LINK_CONNECTED)
+    assert (info['ssid'], info['bssid']) == ('PUCP', 'aa:bb:cc:dd:ee:01')
+    assert (info['channel'], info['band'], info['width_mhz']) == (36, '5GHz', 80)
+    assert info['rssi_dbm'] == -52 and info['signal_percent'] == 63
+    assert (info['rx_rate_mbps'], info['tx_rate_mbps']) == (866.7, 650.0)
+
+
+def test_iw_link_24ghz_ht20():
+    info = parse_iw_link(IW_LINK_24_HT20)
+    assert (info['bssid'], info['channel'], info['band'], info['width_mhz']) == ('aa:bb:cc:dd:ee:10', 6, '2.4GHz', 20)
+    assert info['rssi_dbm'] == -67
+
+
+def test_iw_link_desconectado():
+    assert parse_iw_link(IW_LINK_DISCONNECTED) is None
+
+
+def test_iw_info_ancho_y_centro():
+    assert parse_iw_channel(IW_INFO) == {'width_mhz': 80, 'center_channel': 42}
+
+
+def test_proc_net_wireless():
+    assert parse_proc_net_wireless(PROC_NET_WIRELESS) == {
+        'wlp2s0': {'link_quality': 58.0, 'rssi_dbm': -52},
+        'wlan1': {'link_quality': 30.0, 'rssi_dbm': -80},
+    }
+
+
+# ===== LinuxBackend: campo BANDWIDTH =====
+
+def _nmcli_backend(monkeypatch, error):
+    """LinuxBackend cuyo nmcli falla con 'error' mientras se pida BANDWIDTH"""
+    calls = []
+
+    def fake_run(cmd, encoding='utf-8'):
+        calls.append(cmd[3])
+        if 'BANDWIDTH' in cmd[3]:
+            raise RuntimeError(f"'nmcli' terminó con código 2: {error}")
+        return NMCLI_WITHOUT_WIDTH
+
+    monkeypatch.setattr(wifi_backends, '_run', fake_run)
+    backend = wifi_backends.LinuxBackend()
+    backend.has_nmcli = True
+    return backend, calls
+
+
+def test_nmcli_antiguo_sin_bandwidth(monkeypatch):
+    backend, calls = _nmcli_backend(monkeypatch, "Error: invalid field 'BANDWIDTH'; allowed fields: IN-USE,BSSID,...")
+    (net,) = backend._scan()
+    assert net['channel'] == 149
+    assert backend.nmcli_fields == _NMCLI_FIELDS and len(calls) == 2
+
+
+def test_error_transitorio_de_nmcli_conserva_bandwidth(monkeypatch):
+    backend, calls = _nmcli_backend(monkeypatch, "Error: Wi-Fi radio is disabled.")
+    with pytest.raises(RuntimeError):
+        backend._scan()
+    assert backend.nmcli_fields == _NMCLI_FIELDS_WIDTH and len(calls) == 1
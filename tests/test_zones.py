@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""Geometría vectorizada de zones.py y contadores de ZoneCounter con respuestas conocidas"""
+
+import numpy as np
+import pytest
+
+from zones import IN, OUT, ZoneCounter, line_sides, points_in_polygons, segment_crossings
+
+CUADRADO = [(0, 0), (10, 0), (10, 10), (0, 10)]
+VECINO = [(10, 0), (20, 0), (20, 10), (10, 10)]  # Comparte la arista x=10 con CUADRADO
+TRIANGULO = [(0, 0), (10, 0), (0, 10)]
+HORIZONTAL = np.array([[0, 5, 10, 5]], dtype=np.float64)  # A=(0,5) -> B=(10,5): 'in' es cruzar hacia abajo
+
+
+def _edges(*polygons):
+    counter = ZoneCounter({f"z{i}": p for i, p in enumerate(polygons)})
+    return counter._edges
+
+
+def test_punto_en_poligono():
+    points = np.array([(5, 5), (15, 5), (-1, 5), (5, 11), (9.9, 0.1)], dtype=np.float64)
+    assert points_in_polygons(points, _edges(CUADRADO))[:, 0].tolist() == [True, False, False, False, True]
+
+
+def test_punto_sobre_arista_compartida_pertenece_a_una_sola_zona():
+    """Convención semiabierta: izquierda y arriba adentro, derecha y abajo afuera; sin dobles conteos"""
+    points = np.array([(10, 5), (0, 5), (5, 0), (5, 10), (10, 0), (10, 10)], dtype=np.float64)
+    inside = points_in_polygons(points, _edges(CUADRADO, VECINO))
+    assert inside.tolist() == [[False, True], [True, False], [True, False], [False, False], [False, True],
+                               [False, False]]
+    assert (inside.sum(axis=1) <= 1).all()
+
+
+def test_poligonos_rellenados_con_aristas_degeneradas():
+    """El triángulo comparte arreglo con un hexágono: las aristas de relleno no cambian el resultado"""
+    hexagono = [(30, 0), (40, 0), (45, 8), (40, 16), (30, 16), (25, 8)]
+    edges = _edges(TRIANGULO, hexagono)
+    assert edges.shape == (2, 6, 4)
+    assert (edges[0, 3:] == 0).all()  # Relleno: aristas (0, 0) -> (0, 0)
+    rng = np.random.default_rng(0)
+    points = rng.uniform(-5, 50, size=(500, 2))
+    padded = points_in_polygons(points, edges)
+    assert (padded[:, 0] == points_in_polygons(points, _edges(TRIANGULO))[:, 0]).all()
+    assert (padded[:, 1] == points_in_polygons(points, _edges(hexagono))[:, 0]).all()
+    assert points_in_polygons(np.array([(2.0, 2.0), (8.0, 8.0), (0.0, 0.0)]), edges)[:, 0].tolist() == [True, False, True]
+
+
+def test_cruce_de_segmentos():
+    starts = np.array([(5, 0), (5, 10), (15, 0), (2, 0), (0, 0)], dtype=np.float64)
+    ends = np.array([(5, 10), (5, 0), (15, 10), (8, 3), (10, 10)], dtype=np.float64)
+    # Bajando, subiendo, fuera del segmento A-B, sin llegar a la línea, en diagonal
+    assert segment_crossings(starts, ends, HORIZONTAL)[:, 0].tolist() == [1, -1, 0, 0, 1]
+
+
+def test_tocar_la_linea_no_es_cruce():
+    sides = line_sides(np.array([(5.0, 0.0)]), HORIZONTAL)
+    on_line = line_sides(np.array([(5.0, 5.0)]), HORIZONTAL, sides)
+    assert not sides[0, 0] and not on_line[0, 0]  # Sobre la recta conserva el lado del que venía
+    assert segment_crossings(np.array([(5.0, 0.0)]), np.array([(5.0, 5.0)]), HORIZONTAL)[0, 0] == 0
+
+
+def _lineas(trayectoria, track_id=1):
+    counter = ZoneCounter(lines={'perimetro': ((0, 5), (10, 5))})
+    events = []
+    for point in trayectoria:
+        events += counter.update([track_id], [point])
+    return counter, events
+
+
+def test_track_que_toca_la_linea_y_vuelve():
+    counter, events = _lineas([(5, 0), (5, 3), (5, 5), (5, 5), (5, 2)])
+    assert events == [] and counter.stats()['lines']['perimetro'] == {IN: 0, OUT: 0}
+
+
+def test_track_que_se_detiene_sobre_la_linea_y_la_cruza():
+    counter, events = _lineas([(5, 0), (5, 5), (5, 5), (5, 9), (5, 5), (5, 1)])
+    assert events == [(1, 'perimetro', IN), (1, 'perimetro', OUT)]
+    assert counter.stats()['lines']['perimetro'] == {IN: 1, OUT: 1}
+
+
+def test_track_nuevo_no_cruza_en_su_primer_frame():
+    counter = ZoneCounter(lines={'perimetro': ((0, 5), (10, 5))})
+    counter.update([1], [(5, 0)])
+    assert counter.update([2], [(5, 9)]) == []  # Otro id: no es el desplazamiento del track 1
+    assert counter.update([2, 3], [(5, 1), (5, 9)]) == [(2, 'perimetro', OUT)]
+    assert counter.update([3], [(5, 1)]) == [(3, 'perimetro', OUT)]
+    assert counter.stats()['lines']['perimetro'] == {IN: 0, OUT: 2}
+
+
+def test_entradas_y_salidas_de_zona():
+    counter = ZoneCounter({'aterrizaje': CUADRADO})
+    counter.update([1], [(-5, 5)])
+    counter.update([1], [(5, 5)])              # Entra caminando
+    counter.update([1, 2], [(5, 5), (6, 6)])   # Id nuevo que aparece dentro (confirmado o re-identificado ahí)
+    assert counter.stats()['zones']['aterrizaje'] == {'occupancy': 2, 'entries': 2, 'exits': 0}
+    counter.update([2], [(15, 5)])             # 1 desaparece dentro, 2 sale caminando
+    assert counter.stats()['zones']['aterrizaje'] == {'occupancy': 0, 'entries': 2, 'exits': 2}
+
+
+def test_entradas_menos_salidas_es_la_ocupacion():
+    rng = np.random.default_rng(1)
+    counter = ZoneCounter({'a': CUADRADO, 'b': TRIANGULO, 'c': VECINO})
+    for _ in range(200):
+        ids = rng.choice(30, size=rng.integers(0, 15), replace=False)
+        counter.update(ids, rng.uniform(-5, 25, size=(len(ids), 2)))
+        assert (counter.entries - counter.exits == counter.occupancy).all()
+
+
+def test_zona_con_menos_de_tres_vertices():
+    with pytest.raises(ValueError):
+        ZoneCounter({'mala': [(0, 0), (1, 1)]})
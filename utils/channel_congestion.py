@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+Channel Congestion - Modelo vectorizado de interferencia entre canales WiFi
+Cada red aporta su potencia (RSSI en mW) a través de un kernel de solapamiento
+espectral (máscara OFDM 802.11 de 20/40/80 MHz vista por un receptor de 20 MHz);
+la interferencia por canal es la convolución del histograma de potencia, hecha
+como un único producto con matrices de solapamiento precalculadas
+"""
+
+import numpy as np
+
+# Ráster de canales: frecuencia central = base + 5 MHz * canal
+BANDS = {
+    '2.4GHz': {
+        'base_mhz': 2407,
+        'grid': 16,  # Canales 0..15 (el 14 está en 2484 MHz, fuera del ráster: se redondea)
+        'channels': np.arange(1, 14),
+        'non_overlapping': (1, 6, 11),
+    },
+    '5GHz': {
+        'base_mhz': 5000,
+        'grid': 178,
+        'channels': np.array([36, 40, 44, 48, 52, 56, 60, 64, 100, 104, 108, 112, 116, 120,
+                              124, 128, 132, 136, 140, 144, 149, 153, 157, 161, 165]),
+        'non_overlapping': (36, 40, 44, 48, 149, 153, 157, 161, 165),
+    },
+}
+
+NOISE_FLOOR_DBM = -95.0
+RX_WIDTH_MHZ = 20  # El ESP32 solo usa canales de 20 MHz
+
+
+def _mask_dbr(f_mhz, width_mhz):
+    """Máscara espectral OFDM 802.11 (dBr) escalada al ancho de canal"""
+    points = np.array([0.0, 0.45, 0.55, 1.0, 1.5]) * width_mhz
+    levels = np.array([0.0, 0.0, -20.0, -28.0, -40.0])
+    return np.interp(np.abs(f_mhz), points, levels, right=-40.0)
+
+
+def bonded_center(channels, widths_mhz):
+    """
+    Canal central (ráster de 5 MHz) de las redes con canales agrupados, a partir del canal primario.
+    5 GHz: bloques fijos de 40/80/160 MHz (36-40 -> 38, 36-48 -> 42, 149-161 -> 155...).
+    2.4 GHz a 40 MHz: el escaneo no dice hacia dónde va el secundario; se asume arriba (HT40+)
+    en los canales 1-7 y abajo (HT40-) en los altos, como configuran los routers
+    """
+    channels = np.asarray(channels, dtype=np.float64)
+    widths = np.asarray(widths_mhz, dtype=np.float64)
+    bonded = widths > 20
+    center_24 = np.where(bonded, np.where(channels <= 7, channels + 2, channels - 2), channels)
+    span = widths / 5                                  # Números de canal que abarca el bloque
+    base = np.where(channels >= 149, 149, 36)          # UNII-3 empieza desfasado en 1
+    start = base + np.floor((channels - base) / span) * span
+    center_5 = np.where(bonded, start + span / 2 - 2, channels)
+    return np.where(channels <= 14, center_24, center_5)
+
+
+def overlap_kernel(width_mhz, rx_width_mhz=RX_WIDTH_MHZ, step_mhz=5, resolution_mhz=0.25):
+    """
+    Fracción de la potencia de un transmisor de 'width_mhz' que cae en un receptor
+    de 'rx_width_mhz' desplazado k canales (k = -K..K). Retorna (kernel, K)
+    """
+    extent = 1.5 * width_mhz + rx_width_mhz / 2
+    half = int(np.ceil(extent / step_mhz))
+    f = np.arange(-extent - rx_width_mhz, extent + rx_width_mhz, resolution_mhz)
+    psd = 10 ** (_mask_dbr(f, width_mhz) / 10)
+    psd /= psd.sum()
+    cumulative = np.concatenate(([0.0], np.cumsum(psd)))
+    offsets = np.arange(-half, half + 1) * step_mhz
+    lo = np.searchsorted(f, offsets - rx_width_mhz / 2, side='right')  # Sin los bordes: kernel simétrico
+    hi = np.searchsorted(f, offsets + rx_width_mhz / 2)
+    return cumulative[hi] - cumulative[lo], half
+
+
+class ChannelCongestionModel:
+    """Interferencia por canal a partir de los BSSIDs escaneados (kernels precalculados)"""
+
+    def __init__(self, widths_mhz=(20, 40, 80, 160), noise_floor_dbm=NOISE_FLOOR_DBM):
+        self.noise_floor_dbm = noise_floor_dbm
+        self.widths = np.array(sorted(widths_mhz))
+        # Matriz canal × ráster por banda y ancho: fila c = kernel desplazado al canal c.
+        # La convolución de todas las redes se reduce a un único producto matricial
+        self.overlap = {}
+        for band, spec in BANDS.items():
+            grid = np.arange(spec['grid'])
+            matrices = []
+            for width in self.widths:
+                kernel, half = overlap_kernel(width)
+                offset = spec['channels'][:, None] - grid[None, :] + half
+                valid = (offset >= 0) & (offset < kernel.size)
+                matrices.append(np.where(valid, kernel[np.clip(offset, 0, kernel.size - 1)], 0.0))
+            self.overlap[band] = np.stack(matrices)  # (anchos, canales, ráster)
+
+    def _band_arrays(self, networks, band):
+        """Índice en el ráster (centro del canal agrupado), RSSI y ancho de las redes de la banda"""
+        is_24 = band == '2.4GHz'
+        # Una sola lista plana (mucho más rápido que np.array de tuplas); centro 0 = derivarlo del primario
+        flat = [v for n in networks if n.get('channel') and n.get('band', band) == band
+                for v in (n['channel'], n.get('rssi_dbm', -90), n.get('width_mhz') or 20, n.get('center_channel') or 0)]
+        data = np.array(flat, dtype=np.float64).reshape(-1, 4)
+        channels = data[:, 0]
+        # Redes sin banda explícita: se infiere del número de canal
+        data = data[(channels <= 14) == is_24]
+        if not data.size:
+            return None
+        centers = np.where(data[:, 3] > 0, data[:, 3], bonded_center(data[:, 0], data[:, 2]))
+        if is_24:
+            centers = np.where(data[:, 0] == 14, 15.4, centers)  # 2484 MHz (solo 20 MHz)
+        index = np.clip(np.rint(centers).astype(np.intp), 0, BANDS[band]['grid'] - 1)
+        width_index = np.clip(np.searchsorted(self.widths, data[:, 2]), 0, self.widths.size - 1)
+        return index, data[:, 1], width_index
+
+    def analyze(self, networks, band='2.4GHz'):
+        """
+        Congestión de cada canal de la banda:
+        {canal: {'networks': redes efectivas, 'avg_rssi': dBm, 'interference_dbm': dBm}}
+        """
+        spec = BANDS[band]
+        channels = spec['channels']
+        arrays = self._band_arrays(networks, band)
+        if arrays is None:
+            return {int(ch): {'networks': 0.0, 'avg_rssi': -90, 'interference_dbm': self.noise_floor_dbm}
+                    for ch in channels}
+
+        index, rssi, width_index = arrays
+        grid = spec['grid']
+        bins = width_index * grid + index
+        size = self.widths.size * grid
+        # Histogramas (potencia mW, cantidad, suma de RSSI) por ancho de canal y posición
+        histograms = np.stack([
+            np.bincount(bins, weights=10 ** (rssi / 10), minlength=size),
+            np.bincount(bins, minlength=size).astype(np.float64),
+            np.bincount(bins, weights=rssi, minlength=size),
+        ]).reshape(3, self.widths.size, grid)
+        interference, effective, rssi_weighted = np.einsum('kwg,wcg->kc', histograms, self.overlap[band])
+
+        interference_dbm = 10 * np.log10(interference + 10 ** (self.noise_floor_dbm / 10))
+        # Promedio de RSSI ponderado por solapamiento (solo redes que realmente solapan)
+        overlapping = effective > 0.05
+        avg_rssi = np.full(channels.size, -90.0)
+        avg_rssi[overlapping] = rssi_weighted[overlapping] / effective[overlapping]
+
+        return {
+            int(ch): {'networks': round(e, 2), 'avg_rssi': int(r), 'interference_dbm': round(i, 1)}
+            for ch, e, r, i in zip(channels.tolist(), effective.tolist(), avg_rssi.tolist(), interference_dbm.tolist())
+        }
+
+    def recommend(self, networks, band='2.4GHz', candidates=None):
+        """Canal con menor interferencia entre los candidatos (por defecto los no solapados)"""
+        congestion = self.analyze(networks, band)
+        candidates = candidates or BANDS[band]['non_overlapping']
+        ranking = sorted(candidates, key=lambda ch: (congestion[ch]['interference_dbm'], congestion[ch]['networks']))
+        return {
+            'channel': ranking[0],
+            'interference_dbm': congestion[ranking[0]]['interference_dbm'],
+            'ranking': ranking,
+            'congestion': congestion,
+        }
+
+
+def benchmark(n_networks=300, repeats=1000):
+    """Mide el tiempo de recomendación con 'n_networks' BSSIDs sintéticos"""
+    import time
+
+    rng = np.random.default_rng(0)
+    networks = [{'channel': int(ch), 'rssi_dbm': int(r), 'width_mhz': int(w)}
+                for ch, r, w in zip(rng.integers(1, 14, n_networks), rng.integers(-90, -30, n_networks),
+                                    rng.choice([20, 40], n_networks))]
+    model = ChannelCongestionModel()
+    model.recommend(networks)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        result = model.recommend(networks)
+    elapsed = (time.perf_counter() - start) / repeats
+    print(f"⏱️ {n_networks} redes: {elapsed * 1e6:.0f} µs por recomendación (canal {result['channel']})")
+
+
+if __name__ == "__main__":
+    benchmark()
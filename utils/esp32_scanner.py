@@ -4,17 +4,123 @@ ESP32-CAM Scanner - Diagnóstico de Conexión y Calidad de Señal
 Herramienta especializada para diagnosticar ESP32-CAM en la red WiFi
 """
 
-import subprocess
-import re
 import time
+import asyncio
+import ipaddress
 import requests
-import socket
-from datetime import datetime
 import matplotlib.pyplot as plt
 import numpy as np
-from collections import deque
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait
 import threading
 
+from latency_prober import LatencyProber
+from stream_analyzer import StreamThroughputAnalyzer
+from live_monitor import StreamingMonitor
+from wifi_backends import get_backend
+
+def _expand_hosts(base_ip=None, start=1, end=254, cidr=None):
+    """Lista de IPs a escanear a partir de un CIDR ('10.100.224.0/24') o base + rango"""
+    if cidr:
+        network = ipaddress.ip_network(cidr, strict=False)
+        hosts = list(network.hosts())
+        return [str(ip) for ip in (hosts if hosts else [network.network_address])]
+    return [f"{base_ip}.{i}" for i in range(start, end + 1)]
+
+
+async def _probe_stream_host(ip, port, path, timeout):
+    """
+    Conecta por TCP al puerto del stream y verifica que responda como MJPEG.
+    Retorna el Content-Type si es multipart/x-mixed-replace, o None.
+    """
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return None
+
+    try:
+        request = f"GET {path} HTTP/1.1\r\nHost: {ip}\r\nConnection: close\r\n\r\n"
+        writer.write(request.encode('ascii'))
+        await writer.drain()
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout)
+    except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+        return None
+    finally:
+        writer.close()
+
+    lines = head.decode('latin-1').split("\r\n")
+    if not lines[0].startswith("HTTP/") or " 200" not in lines[0]:
+        return None
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        if name.strip().lower() == "content-type":
+            content_type = value.strip()
+            if content_type.lower().startswith("multipart/x-mixed-replace"):
+                return content_type
+    return None
+
+
+async def _scan_hosts(hosts, port, path, concurrency, timeout, progress=None):
+    """Escanea todas las IPs en paralelo con un límite de conexiones simultáneas"""
+    semaphore = asyncio.Semaphore(concurrency)
+    done = 0
+
+    async def probe(ip):
+        nonlocal done
+        async with semaphore:
+            content_type = await _probe_stream_host(ip, port, path, timeout)
+        done += 1
+        if progress:
+            progress(ip, done, len(hosts), content_type)
+        return ip, content_type
+
+    results = await asyncio.gather(*(probe(ip) for ip in hosts))
+    return [(ip, content_type) for ip, content_type in results if content_type]
+
+
+class DiagnosticTimeline:
+    """Línea de tiempo compartida (thread-safe) donde las sondas concurrentes registran sus muestras"""
+    
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.lock = threading.Lock()
+        self.series = defaultdict(list)  # nombre: [(t_rel, valor), ...]
+    
+    def now(self):
+        return time.perf_counter() - self.t0
+    
+    def add(self, name, value, t=None):
+        with self.lock:
+            self.series[name].append((self.now() if t is None else t, value))
+    
+    def get(self, name):
+        """Retorna (tiempos, valores) como arrays; None se convierte en NaN"""
+        with self.lock:
+            samples = list(self.series.get(name, []))
+        times = np.array([t for t, _ in samples], dtype=np.float64)
+        values = np.array([np.nan if v is None else v for _, v in samples], dtype=np.float64)
+        return times, values
+    
+    def binned(self, name, bin_sec, n_bins):
+        """Promedio de la serie por intervalos de bin_sec (NaN donde no hay muestras)"""
+        times, values = self.get(name)
+        valid = ~np.isnan(values)
+        idx = np.clip((times[valid] // bin_sec).astype(int), 0, n_bins - 1)
+        sums = np.bincount(idx, weights=values[valid], minlength=n_bins)
+        counts = np.bincount(idx, minlength=n_bins)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return sums / counts
+    
+    def correlate(self, a, b, bin_sec=1.0):
+        """Correlación de Pearson entre dos series alineadas por intervalos (None si no hay datos)"""
+        n_bins = max(1, int(np.ceil(self.now() / bin_sec)))
+        xa, xb = self.binned(a, bin_sec, n_bins), self.binned(b, bin_sec, n_bins)
+        both = ~np.isnan(xa) & ~np.isnan(xb)
+        if both.sum() < 3 or np.std(xa[both]) == 0 or np.std(xb[both]) == 0:
+            return None
+        return float(np.corrcoef(xa[both], xb[both])[0, 1])
+
+
 class ESP32Scanner:
     """Escáner y diagnóstico para ESP32-CAM"""
     
@@ -23,6 +129,7 @@ class ESP32Scanner:
         self.stream_url = f"http://{esp32_ip}:{stream_port}/stream"
         self.stream_port = stream_port
         self.monitoring = False
+        self.wifi_backend = None  # Se crea al primer uso (netsh / nmcli / iw)
         
     def change_ip(self, new_ip):
         """Cambia la IP del ESP32 a monitorear"""
@@ -30,55 +137,22 @@ class ESP32Scanner:
         self.stream_url = f"http://{new_ip}:{self.stream_port}/stream"
         print(f"✅ IP cambiada a: {new_ip}")
     
-    def ping_esp32(self, count=4):
-        """Hace ping al ESP32 y retorna estadísticas"""
-        print(f"\n📡 Haciendo ping a {self.esp32_ip}...")
+    def ping_esp32(self, count=4, rate_hz=5.0):
+        """Mide la latencia al ESP32 (en proceso, sin 'ping') y retorna estadísticas"""
+        prober = LatencyProber(self.esp32_ip, self.stream_port)
+        print(f"\n📡 Midiendo latencia a {self.esp32_ip} ({prober.method.upper()})...")
         
         try:
-            # Comando ping para Windows
-            cmd = f"ping -n {count} {self.esp32_ip}"
-            result = subprocess.run(cmd, capture_output=True, text=True, shell=True, encoding='latin-1')
-            
-            output = result.stdout
-            
-            # Parsear resultados
-            stats = {
-                'packets_sent': count,
-                'packets_received': 0,
-                'packet_loss': 100.0,
-                'min_ms': None,
-                'max_ms': None,
-                'avg_ms': None
-            }
-            
-            # Extraer paquetes recibidos
-            received_match = re.search(r'Recibidos = (\d+)|Received = (\d+)', output)
-            if received_match:
-                stats['packets_received'] = int(received_match.group(1) or received_match.group(2))
-            
-            # Calcular pérdida
-            if stats['packets_sent'] > 0:
-                stats['packet_loss'] = ((stats['packets_sent'] - stats['packets_received']) / stats['packets_sent']) * 100
-            
-            # Extraer tiempos (mínimo, máximo, promedio)
-            time_match = re.search(r'Mínimo = (\d+)ms, Máximo = (\d+)ms, Promedio = (\d+)ms|Minimum = (\d+)ms, Maximum = (\d+)ms, Average = (\d+)ms', output)
-            if time_match:
-                if time_match.group(1):  # Español
-                    stats['min_ms'] = int(time_match.group(1))
-                    stats['max_ms'] = int(time_match.group(2))
-                    stats['avg_ms'] = int(time_match.group(3))
-                else:  # Inglés
-                    stats['min_ms'] = int(time_match.group(4))
-                    stats['max_ms'] = int(time_match.group(5))
-                    stats['avg_ms'] = int(time_match.group(6))
+            stats = LatencyProber.summarize(prober.probe(count=count, rate_hz=rate_hz))
             
             # Imprimir resultados
             print("-" * 60)
             if stats['packets_received'] > 0:
                 print(f"✅ Respuesta: {stats['packets_received']}/{stats['packets_sent']} paquetes recibidos")
                 print(f"📊 Pérdida: {stats['packet_loss']:.1f}%")
-                if stats['avg_ms']:
-                    print(f"⏱️  Latencia: Min={stats['min_ms']}ms | Avg={stats['avg_ms']}ms | Max={stats['max_ms']}ms")
+                if stats['avg_ms'] is not None:
+                    print(f"⏱️  Latencia: Min={stats['min_ms']:.2f}ms | Avg={stats['avg_ms']:.2f}ms | Max={stats['max_ms']:.2f}ms")
+                    print(f"📈 Jitter: {stats['jitter_ms']:.2f}ms")
                     
                     # Evaluación
                     if stats['avg_ms'] < 10:
@@ -150,48 +224,44 @@ class ESP32Scanner:
             return False
     
     def measure_throughput(self, duration_sec=10):
-        """Mide el throughput del stream del ESP32"""
+        """Mide el throughput del stream del ESP32 frame a frame (demux MJPEG real)"""
         print(f"\n📊 Midiendo throughput durante {duration_sec} segundos...")
         
         try:
-            response = requests.get(self.stream_url, timeout=5, stream=True)
+            analyzer = StreamThroughputAnalyzer()
             
-            start_time = time.time()
-            total_bytes = 0
-            chunk_count = 0
-            
-            print("Descargando datos...", end='', flush=True)
-            
-            for chunk in response.iter_content(chunk_size=4096):
-                if chunk:
-                    total_bytes += len(chunk)
-                    chunk_count += 1
-                
-                elapsed = time.time() - start_time
-                if elapsed >= duration_sec:
-                    break
-                
-                # Progress indicator
-                if chunk_count % 50 == 0:
-                    print(".", end='', flush=True)
+            def report(elapsed, snap):
+                print(f"[{elapsed:5.1f}s] {snap['fps']:5.1f} FPS | "
+                      f"{snap['throughput_mbps']:5.2f} Mbps | "
+                      f"jitter {snap['jitter_ms'] or 0:6.1f} ms", flush=True)
             
-            response.close()
-            elapsed_time = time.time() - start_time
+            result = analyzer.analyze(self.stream_url, duration_sec=duration_sec, on_report=report)
             
-            # Calcular métricas
+            elapsed_time = result['duration']
+            total_bytes = result['total_bytes']
             total_mb = total_bytes / (1024 * 1024)
-            throughput_mbps = (total_bytes * 8) / (elapsed_time * 1_000_000)  # Mbps
+            throughput_mbps = result['throughput_avg_mbps']
             throughput_kbps = throughput_mbps * 1000
-            fps_estimate = chunk_count / elapsed_time  # Aproximado
             
-            print("\n")
             print("-" * 60)
             print("📊 RESULTADOS DEL TEST DE THROUGHPUT:")
             print(f"   Duración: {elapsed_time:.2f} segundos")
             print(f"   Datos descargados: {total_mb:.2f} MB ({total_bytes:,} bytes)")
-            print(f"   Chunks recibidos: {chunk_count}")
+            print(f"   Frames recibidos: {result['total_frames']}")
             print(f"   Throughput: {throughput_mbps:.2f} Mbps ({throughput_kbps:.0f} Kbps)")
-            print(f"   FPS estimado: {fps_estimate:.1f} frames/s")
+            print(f"   Goodput (JPEG): {result['goodput_mbps']:.2f} Mbps | Overhead: {result['overhead_pct']:.1f}%")
+            print(f"   FPS real: {result['fps_avg']:.1f} frames/s (última ventana: {result['fps']:.1f})")
+            if result['jitter_ms'] is not None:
+                print(f"   Intervalo entre frames: {result['interval_ms']:.1f} ms ± {result['jitter_ms']:.1f} ms (jitter)")
+            if result['frame_size_kb']:
+                sizes = result['frame_size_kb']
+                print(f"   Tamaño de frame: min={sizes['min']:.1f} | p50={sizes['p50']:.1f} | "
+                      f"p90={sizes['p90']:.1f} | max={sizes['max']:.1f} KB")
+            print(f"   Congelamientos (>{analyzer.stall_threshold_sec:.1f}s): {result['stall_count']} "
+                  f"({result['stall_time_s']:.1f}s en total)")
+            if result['frames_rejected']:
+                detalle = ', '.join(f"{kind}={n}" for kind, n in result['corrupt'].items())
+                print(f"   ⚠️  Frames corruptos descartados: {result['frames_rejected']} ({detalle})")
             
             # Evaluación
             if throughput_mbps >= 2.0:
@@ -206,17 +276,22 @@ class ESP32Scanner:
             print(f"   Calidad: {quality}")
             print("-" * 60)
             
-            return {
-                'total_bytes': total_bytes,
-                'duration': elapsed_time,
+            result.update({
                 'throughput_mbps': throughput_mbps,
-                'fps_estimate': fps_estimate
-            }
+                'fps_estimate': result['fps_avg']
+            })
+            return result
             
         except Exception as e:
             print(f"\n❌ Error en test de throughput: {e}")
             return None
     
+    def read_wifi_info(self):
+        """Lee la información de la conexión WiFi actual sin imprimir (None si falla)"""
+        if self.wifi_backend is None:
+            self.wifi_backend = get_backend()
+        return self.wifi_backend.connected_info()
+    
     def get_wifi_signal_strength(self):
         """
         Obtiene la intensidad de señal WiFi del ESP32
@@ -225,59 +300,11 @@ class ESP32Scanner:
         print(f"\n📡 Obteniendo información de señal WiFi...")
         
         try:
-            # Obtener info de la red conectada
-            cmd = "netsh wlan show interfaces"
-            result = subprocess.run(cmd, capture_output=True, text=True, shell=True, encoding='latin-1')
-            
-            if result.returncode != 0:
+            info = self.read_wifi_info()
+            if info is None:
                 print("❌ No se pudo obtener información WiFi")
                 return None
             
-            output = result.stdout
-            
-            # Extraer información
-            info = {}
-            
-            # SSID
-            ssid_match = re.search(r'SSID\s*:\s*(.+)', output)
-            if ssid_match:
-                info['ssid'] = ssid_match.group(1).strip()
-            
-            # Señal
-            signal_match = re.search(r'(Señal|Signal)\s*:\s*(\d+)%', output)
-            if signal_match:
-                signal_percent = int(signal_match.group(2))
-                rssi_dbm = -90 + (signal_percent * 0.6)
-                info['signal_percent'] = signal_percent
-                info['rssi_dbm'] = int(rssi_dbm)
-            
-            # Canal
-            channel_match = re.search(r'(Canal|Channel)\s*:\s*(\d+)', output)
-            if channel_match:
-                info['channel'] = int(channel_match.group(2))
-            
-            # Velocidad
-            rx_match = re.search(r'(Velocidad de recepción|Receive rate)\s*\(Mbps\)\s*:\s*([\d.]+)', output)
-            if rx_match:
-                info['rx_rate_mbps'] = float(rx_match.group(2))
-            
-            tx_match = re.search(r'(Velocidad de transmisión|Transmit rate)\s*\(Mbps\)\s*:\s*([\d.]+)', output)
-            if tx_match:
-                info['tx_rate_mbps'] = float(tx_match.group(2))
-            
-            # Tipo de radio (banda)
-            radio_match = re.search(r'(Tipo de radio|Radio type)\s*:\s*(.+)', output)
-            if radio_match:
-                radio = radio_match.group(2).strip()
-                info['radio_type'] = radio
-                
-                # Detectar banda basado en canal
-                if 'channel' in info:
-                    if info['channel'] <= 14:
-                        info['band'] = '2.4GHz'
-                    else:
-                        info['band'] = '5GHz'
-            
             if info:
                 print("-" * 60)
                 print("🔗 INFORMACIÓN DE CONEXIÓN WiFi:")
@@ -323,44 +350,32 @@ class ESP32Scanner:
             print(f"❌ Error al obtener señal WiFi: {e}")
             return None
     
-    def find_esp32_in_network(self, base_ip="10.100.224", start=1, end=254):
+    def find_esp32_in_network(self, base_ip="10.100.224", start=1, end=254, cidr=None,
+                              concurrency=128, timeout=1.0):
         """
         Escanea la red local buscando el ESP32-CAM
-        Advertencia: Puede tomar varios minutos
+        Conexiones TCP asíncronas al puerto del stream (una /24 toma pocos segundos)
+        y verificación del Content-Type MJPEG en los que responden.
+        Acepta un CIDR (ej: '10.100.224.0/24') o base_ip + rango.
         """
-        print(f"\n🔍 Buscando ESP32-CAM en la red {base_ip}.{start}-{end}...")
-        print("⚠️  Esto puede tomar varios minutos...\n")
-        
-        found_devices = []
-        
-        for i in range(start, end + 1):
-            ip = f"{base_ip}.{i}"
-            
-            # Progress indicator
-            if i % 10 == 0:
-                print(f"Escaneando: {ip}...", end='\r')
-            
-            try:
-                # Ping rápido (1 segundo timeout)
-                cmd = f"ping -n 1 -w 1000 {ip}"
-                result = subprocess.run(cmd, capture_output=True, text=True, shell=True, encoding='latin-1')
-                
-                if "TTL=" in result.stdout or "TTL =" in result.stdout:
-                    # Dispositivo responde, intentar conexión HTTP
-                    try:
-                        response = requests.get(f"http://{ip}:{self.stream_port}/stream", timeout=2, stream=True)
-                        response.close()
-                        
-                        print(f"✅ ESP32-CAM encontrado en {ip}                    ")
-                        found_devices.append(ip)
-                        
-                    except:
-                        pass  # No es un ESP32-CAM
-            
-            except:
-                pass
+        hosts = _expand_hosts(base_ip, start, end, cidr)
+        target = cidr if cidr else f"{base_ip}.{start}-{end}"
+        print(f"\n🔍 Buscando ESP32-CAM en la red {target} ({len(hosts)} IPs, puerto {self.stream_port})...")
+        print(f"⚙️  Conexiones simultáneas: {concurrency} | Timeout: {timeout}s\n")
+        
+        def progress(ip, done, total, content_type):
+            if content_type:
+                print(f"✅ ESP32-CAM encontrado en {ip} ({content_type})                    ")
+            elif done % 10 == 0 or done == total:
+                print(f"Escaneando: {done}/{total}...", end='\r')
+        
+        start_time = time.time()
+        found = asyncio.run(_scan_hosts(hosts, self.stream_port, "/stream", concurrency, timeout, progress))
+        found_devices = [ip for ip, _ in found]
+        elapsed = time.time() - start_time
         
         print("\n" + "-" * 60)
+        print(f"⏱️  Escaneo completado en {elapsed:.1f} segundos")
         if found_devices:
             print(f"🎯 {len(found_devices)} ESP32-CAM encontrado(s):")
             for device in found_devices:
@@ -375,90 +390,95 @@ class ESP32Scanner:
         
         return found_devices
     
-    def monitor_connection_realtime(self, duration_sec=60, interval_sec=2):
-        """Monitorea la conexión al ESP32 en tiempo real"""
+    def monitor_connection_realtime(self, duration_sec=60, interval_sec=2, dashboard='text',
+                                    capacity=3600, export_path=None):
+        """
+        Monitorea la conexión al ESP32 en tiempo real
+        Las sondas corren en un hilo de fondo hacia buffers circulares (memoria acotada
+        aunque el monitoreo dure horas); dashboard='text' o 'plot' (gráfico en vivo)
+        """
         print(f"\n📊 Monitoreando conexión a ESP32 ({self.esp32_ip}) por {duration_sec} segundos...")
         print("Presiona Ctrl+C para detener\n")
         
-        timestamps = []
-        ping_times = []
-        packet_loss = []
-        
+        prober = LatencyProber(self.esp32_ip, self.stream_port, timeout=max(1.0, interval_sec))
+        totals = {'sent': 0, 'received': 0}
+        
+        def source(push, stop_event):
+            def on_sample(_t, ping_ms):
+                totals['sent'] += 1
+                totals['received'] += ping_ms is not None
+                push({'rtt_ms': ping_ms, 'loss_pct': 0 if ping_ms is not None else 100})
+            # Un solo event loop para todas las sondas (soporta 10-100 Hz)
+            asyncio.run(prober.run(rate_hz=1.0 / interval_sec, duration_sec=duration_sec,
+                                   callback=on_sample, stop_event=stop_event))
+        
+        def format_sample(t, values):
+            ping_ms = values['rtt_ms']
+            if np.isnan(ping_ms):
+                return f"[{t:6.1f}s] ❌ Ping:    TIMEOUT"
+            return f"[{t:6.1f}s] ✅ Ping: {f'{ping_ms:.2f}ms':>10}"
+        
+        monitor = StreamingMonitor(source, ['rtt_ms', 'loss_pct'], capacity=capacity,
+                                   labels={'rtt_ms': 'RTT (ms)', 'loss_pct': 'Pérdida (%)'}).start()
         try:
-            start_time = time.time()
-            iteration = 0
-            
-            while time.time() - start_time < duration_sec:
-                # Ping al ESP32
-                cmd = f"ping -n 1 {self.esp32_ip}"
-                result = subprocess.run(cmd, capture_output=True, text=True, shell=True, encoding='latin-1')
-                
-                current_time = time.time() - start_time
-                timestamps.append(current_time)
-                
-                # Parsear resultado
-                time_match = re.search(r'tiempo[<=](\d+)ms|time[<=](\d+)ms', result.stdout)
-                if time_match:
-                    ping_ms = int(time_match.group(1) or time_match.group(2))
-                    ping_times.append(ping_ms)
-                    packet_loss.append(0)
-                    status = "✅"
-                else:
-                    ping_times.append(None)
-                    packet_loss.append(100)
-                    ping_ms = None
-                    status = "❌"
-                
-                # Imprimir estado
-                ping_str = f"{ping_ms}ms" if ping_ms else "TIMEOUT"
-                print(f"[{current_time:6.1f}s] {status} Ping: {ping_str:>10}")
-                
-                iteration += 1
-                time.sleep(interval_sec)
-            
-            # Estadísticas finales
-            valid_pings = [p for p in ping_times if p is not None]
-            total_loss = sum(packet_loss) / len(packet_loss)
-            
-            print("\n" + "="*60)
-            print("📊 ESTADÍSTICAS DEL MONITOREO")
-            print("="*60)
-            print(f"Duración: {timestamps[-1]:.1f} segundos")
-            print(f"Pings enviados: {len(ping_times)}")
-            print(f"Pings exitosos: {len(valid_pings)}")
-            print(f"Pérdida de paquetes: {total_loss:.1f}%")
-            
-            if valid_pings:
-                print(f"\nLatencia (ms):")
-                print(f"  Promedio: {np.mean(valid_pings):.1f} ms")
-                print(f"  Mínima: {np.min(valid_pings)} ms")
-                print(f"  Máxima: {np.max(valid_pings)} ms")
-                print(f"  Desviación: {np.std(valid_pings):.2f} ms")
-                
-                # Evaluación
-                avg_ping = np.mean(valid_pings)
-                if avg_ping < 10 and total_loss < 1:
-                    quality = "🟢 EXCELENTE - Conexión muy estable"
-                elif avg_ping < 50 and total_loss < 5:
-                    quality = "🟢 BUENA - Conexión estable"
-                elif avg_ping < 100 and total_loss < 10:
-                    quality = "🟡 REGULAR - Conexión aceptable"
-                elif avg_ping < 200 and total_loss < 20:
-                    quality = "🟠 DÉBIL - Conexión inestable"
-                else:
-                    quality = "🔴 CRÍTICA - Conexión muy inestable"
-                
-                print(f"\n💡 Calidad de conexión: {quality}")
+            if dashboard == 'plot':
+                monitor.run_plot_dashboard(duration_sec, ylims={'rtt_ms': (0, 100), 'loss_pct': (0, 100)},
+                                           title=f'Latencia al ESP32-CAM ({self.esp32_ip})')
+            else:
+                # Alta frecuencia: no imprimir cada muestra, solo la línea de estado
+                monitor.run_text_dashboard(duration_sec, format_sample=format_sample if interval_sec >= 0.2 else None)
+        except KeyboardInterrupt:
+            print("\n\n⚠️ Monitoreo interrumpido por el usuario")
+        finally:
+            monitor.stop()
+        
+        series = monitor.export(export_path)
+        timestamps = series['t']
+        rtts = series['rtt_ms']
+        if totals['sent'] == 0:
+            return series
+        
+        # Estadísticas finales (totales de toda la corrida; latencias de la ventana en memoria)
+        valid_pings = rtts[~np.isnan(rtts)]
+        total_loss = (totals['sent'] - totals['received']) / totals['sent'] * 100
+        
+        print("\n" + "="*60)
+        print("📊 ESTADÍSTICAS DEL MONITOREO")
+        print("="*60)
+        print(f"Duración: {monitor.elapsed():.1f} segundos")
+        print(f"Pings enviados: {totals['sent']}")
+        print(f"Pings exitosos: {totals['received']}")
+        print(f"Pérdida de paquetes: {total_loss:.1f}%")
+        
+        if valid_pings.size:
+            print(f"\nLatencia (ms, últimas {rtts.size} muestras):")
+            print(f"  Promedio: {np.mean(valid_pings):.1f} ms")
+            print(f"  Mínima: {np.min(valid_pings):.2f} ms")
+            print(f"  Máxima: {np.max(valid_pings):.2f} ms")
+            print(f"  Desviación: {np.std(valid_pings):.2f} ms")
             
-            print("="*60 + "\n")
+            # Evaluación
+            avg_ping = np.mean(valid_pings)
+            if avg_ping < 10 and total_loss < 1:
+                quality = "🟢 EXCELENTE - Conexión muy estable"
+            elif avg_ping < 50 and total_loss < 5:
+                quality = "🟢 BUENA - Conexión estable"
+            elif avg_ping < 100 and total_loss < 10:
+                quality = "🟡 REGULAR - Conexión aceptable"
+            elif avg_ping < 200 and total_loss < 20:
+                quality = "🟠 DÉBIL - Conexión inestable"
+            else:
+                quality = "🔴 CRÍTICA - Conexión muy inestable"
             
-            # Graficar
-            self._plot_monitoring_results(timestamps, ping_times, packet_loss)
+            print(f"\n💡 Calidad de conexión: {quality}")
         
-        except KeyboardInterrupt:
-            print("\n\n⚠️ Monitoreo interrumpido por el usuario")
-            if ping_times:
-                self._plot_monitoring_results(timestamps, ping_times, packet_loss)
+        print("="*60 + "\n")
+        
+        # Graficar (el dashboard gráfico ya mostró la serie en vivo)
+        if dashboard != 'plot':
+            ping_times = [None if np.isnan(v) else v for v in rtts]
+            self._plot_monitoring_results(timestamps, ping_times, series['loss_pct'])
+        return series
     
     def _plot_monitoring_results(self, timestamps, ping_times, packet_loss):
         """Grafica los resultados del monitoreo"""
@@ -489,40 +509,123 @@ class ESP32Scanner:
         plt.tight_layout()
         plt.show()
     
-    def full_diagnostic(self):
-        """Ejecuta un diagnóstico completo del ESP32"""
+    def full_diagnostic(self, duration_sec=10, probe_rate_hz=5.0, signal_interval_sec=1.0):
+        """
+        Ejecuta un diagnóstico completo del ESP32
+        Primero el test HTTP (el CameraWebServer atiende un solo cliente de /stream a la vez);
+        después las sondas corren simultáneamente sobre una línea de tiempo compartida:
+        latencia durante el test de throughput y muestreo de señal durante ambos,
+        así se ven las correlaciones.
+        """
         print("\n" + "="*70)
         print("🔧 DIAGNÓSTICO COMPLETO ESP32-CAM")
         print("="*70)
         print(f"IP: {self.esp32_ip}")
         print(f"Stream URL: {self.stream_url}")
+        print(f"Duración: {duration_sec}s (latencia + throughput + señal en paralelo, tras el test HTTP)")
         print("="*70)
         
+        start_time = time.time()
         results = {}
-        
-        # Test 1: Ping
-        print("\n[1/5] Test de Ping...")
-        results['ping'] = self.ping_esp32(count=10)
-        time.sleep(1)
-        
-        # Test 2: Conexión HTTP
-        print("\n[2/5] Test de Conexión HTTP...")
+        # Conexión de prueba a /stream cerrada antes de abrir la del throughput
         results['http'] = self.test_http_connection()
-        time.sleep(1)
         
-        # Test 3: Señal WiFi
-        print("\n[3/5] Información de Señal WiFi...")
-        results['wifi_signal'] = self.get_wifi_signal_strength()
-        time.sleep(1)
+        timeline = DiagnosticTimeline()
+        stop_signal = threading.Event()
         
-        # Test 4: Throughput
-        print("\n[4/5] Test de Throughput...")
-        results['throughput'] = self.measure_throughput(duration_sec=10)
-        time.sleep(1)
+        def latency_probe():
+            prober = LatencyProber(self.esp32_ip, self.stream_port)
+            
+            def on_sample(_t, rtt):
+                # Registrar en el instante de envío de la sonda
+                timeline.add('rtt_ms', rtt, timeline.now() - (rtt or 0) / 1000)
+            
+            samples = asyncio.run(prober.run(rate_hz=probe_rate_hz, duration_sec=duration_sec, callback=on_sample))
+            return LatencyProber.summarize(samples)
         
-        # Test 5: Monitoreo breve
-        print("\n[5/5] Monitoreo de Estabilidad (20 segundos)...")
-        self.monitor_connection_realtime(duration_sec=20, interval_sec=1)
+        def throughput_probe():
+            analyzer = StreamThroughputAnalyzer(window_sec=2.0)
+            offset = timeline.now()
+            
+            def on_report(elapsed, snap):
+                timeline.add('fps', snap['fps'], offset + elapsed)
+                timeline.add('throughput_mbps', snap['throughput_mbps'], offset + elapsed)
+            
+            try:
+                result = analyzer.analyze(self.stream_url, duration_sec=duration_sec, report_every=0.5, on_report=on_report)
+            except Exception as e:
+                print(f"❌ Error en test de throughput: {e}")
+                return None
+            for stall_start, stall_len in result['stalls']:
+                timeline.add('stall_s', stall_len, offset + stall_start)
+            result['throughput_mbps'] = result['throughput_avg_mbps']
+            result['fps_estimate'] = result['fps_avg']
+            return result
+        
+        def signal_probe():
+            last_info = None
+            while True:
+                try:
+                    info = self.read_wifi_info()
+                except Exception:
+                    info = None
+                if info:
+                    last_info = info
+                    timeline.add('rssi_dbm', info.get('rssi_dbm'))
+                    timeline.add('rx_rate_mbps', info.get('rx_rate_mbps'))
+                if stop_signal.wait(signal_interval_sec):
+                    return last_info
+        
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            f_ping = pool.submit(latency_probe)
+            f_throughput = pool.submit(throughput_probe)
+            f_signal = pool.submit(signal_probe)
+            
+            # Estado en vivo mientras corren las sondas
+            while wait([f_ping, f_throughput], timeout=1.0).not_done:
+                _, rtts = timeline.get('rtt_ms')
+                _, fps = timeline.get('fps')
+                _, rssi = timeline.get('rssi_dbm')
+                recent_rtt = rtts[-int(probe_rate_hz):]
+                rtt_str = f"{np.nanmean(recent_rtt):6.1f} ms" if np.any(~np.isnan(recent_rtt)) else "   ---   "
+                fps_str = f"{fps[-1]:5.1f}" if fps.size else "  ---"
+                rssi_str = f"{rssi[-1]:.0f} dBm" if rssi.size and not np.isnan(rssi[-1]) else "N/A"
+                print(f"[{timeline.now():5.1f}s] RTT: {rtt_str} | FPS: {fps_str} | Señal: {rssi_str}")
+            stop_signal.set()
+            
+            results['ping'] = f_ping.result()
+            results['throughput'] = f_throughput.result()
+            results['wifi_signal'] = f_signal.result()
+        
+        print(f"\n⏱️  Tiempo total del diagnóstico: {time.time() - start_time:.1f} segundos")
+        
+        # Correlaciones sobre la línea de tiempo compartida
+        print("\n" + "="*70)
+        print("🔗 CORRELACIONES (intervalos de 1s)")
+        print("="*70)
+        for a, b, label in (('rtt_ms', 'rssi_dbm', 'RTT vs Señal'),
+                            ('rtt_ms', 'fps', 'RTT vs FPS'),
+                            ('fps', 'rssi_dbm', 'FPS vs Señal')):
+            r = timeline.correlate(a, b)
+            print(f"   {label:<14}: {'r = ' + format(r, '+.2f') if r is not None else 'sin datos suficientes'}")
+        
+        # Picos de RTT y lo que pasaba en ese momento
+        times, rtts = timeline.get('rtt_ms')
+        valid = ~np.isnan(rtts)
+        if valid.sum() >= 5:
+            median = np.median(rtts[valid])
+            spikes = times[valid & (rtts > max(2 * median, median + 20))]
+            if spikes.size:
+                rssi_times, rssi_values = timeline.get('rssi_dbm')
+                rssi_median = np.nanmedian(rssi_values) if rssi_values.size else np.nan
+                print(f"\n   ⚠️  {spikes.size} picos de RTT (> {max(2 * median, median + 20):.0f} ms):")
+                for t in spikes[:5]:
+                    note = ""
+                    if rssi_times.size:
+                        nearest = np.argmin(np.abs(rssi_times - t))
+                        if rssi_values[nearest] <= rssi_median - 5:
+                            note = f" ← coincide con caída de señal ({rssi_values[nearest]:.0f} dBm)"
+                    print(f"      t={t:5.1f}s{note}")
         
         # Resumen final
         print("\n" + "="*70)
@@ -531,7 +634,8 @@ class ESP32Scanner:
         
         # Conectividad
         if results['ping'] and results['ping']['packets_received'] > 0:
-            print("✅ Conectividad: OK")
+            ping = results['ping']
+            print(f"✅ Conectividad: OK (RTT prom. {ping['avg_ms']:.1f} ms, pérdida {ping['packet_loss']:.1f}%)")
         else:
             print("❌ Conectividad: FALLO")
         
@@ -552,12 +656,47 @@ class ESP32Scanner:
         # Throughput
         if results['throughput']:
             mbps = results['throughput']['throughput_mbps']
+            fps = results['throughput']['fps_avg']
             if mbps >= 1.0:
-                print(f"✅ Throughput: BUENO ({mbps:.2f} Mbps)")
+                print(f"✅ Throughput: BUENO ({mbps:.2f} Mbps, {fps:.1f} FPS)")
             else:
-                print(f"⚠️  Throughput: BAJO ({mbps:.2f} Mbps)")
+                print(f"⚠️  Throughput: BAJO ({mbps:.2f} Mbps, {fps:.1f} FPS)")
         
         print("="*70 + "\n")
+        
+        self._plot_diagnostic_timeline(timeline)
+        return results
+    
+    def _plot_diagnostic_timeline(self, timeline):
+        """Grafica todas las sondas sobre el mismo eje de tiempo"""
+        fig, (ax1, ax2, ax3) = plt.subplots(3, 1, figsize=(12, 9), sharex=True)
+        
+        times, rtts = timeline.get('rtt_ms')
+        lost = np.isnan(rtts)
+        ax1.scatter(times[~lost], rtts[~lost], s=12, color='blue', alpha=0.6)
+        ax1.scatter(times[lost], np.zeros(lost.sum()), s=20, color='red', marker='x', label='Sin respuesta')
+        ax1.set_ylabel('RTT (ms)', fontsize=12)
+        ax1.set_title('Diagnóstico Concurrente ESP32-CAM', fontsize=14, fontweight='bold')
+        ax1.grid(True, alpha=0.3)
+        ax1.legend()
+        
+        times, fps = timeline.get('fps')
+        ax2.plot(times, fps, linewidth=2, color='green', label='FPS')
+        for t, stall in zip(*timeline.get('stall_s')):
+            ax2.axvspan(t, t + stall, color='red', alpha=0.2)
+        ax2.set_ylabel('FPS', fontsize=12)
+        ax2.grid(True, alpha=0.3)
+        
+        times, rssi = timeline.get('rssi_dbm')
+        ax3.plot(times, rssi, linewidth=2, color='purple', marker='o', markersize=4)
+        ax3.axhline(y=-70, color='orange', linestyle='--', alpha=0.7, label='Regular')
+        ax3.set_xlabel('Tiempo (segundos)', fontsize=12)
+        ax3.set_ylabel('Señal (dBm)', fontsize=12)
+        ax3.grid(True, alpha=0.3)
+        ax3.legend()
+        
+        plt.tight_layout()
+        plt.show()
 
 
 def main():
@@ -596,7 +735,7 @@ def main():
         print("  4. 📊 Test de throughput")
         print("  5. 📶 Información de señal WiFi")
         print("  6. 📈 Monitoreo en tiempo real")
-        print("  7. 🔍 Buscar ESP32 en la red (lento)")
+        print("  7. 🔍 Buscar ESP32 en la red")
         print("  8. 🔄 Cambiar IP del ESP32")
         print("  9. ❌ Salir")
         print("-"*70)
@@ -625,14 +764,20 @@ def main():
         elif opcion == '6':
             duration = input("Duración del monitoreo en segundos (default: 60): ").strip()
             duration = int(duration) if duration else 60
-            interval = input("Intervalo entre muestras en segundos (default: 2): ").strip()
-            interval = int(interval) if interval else 2
-            scanner.monitor_connection_realtime(duration, interval)
+            interval = input("Intervalo entre muestras en segundos (default: 2, admite 0.01-0.1 para 10-100 Hz): ").strip()
+            interval = float(interval) if interval else 2
+            dashboard = input("Dashboard: 1=texto, 2=gráfico en vivo (default: 1): ").strip()
+            export_path = input("Exportar series a CSV (ruta, vacío = no): ").strip()
+            scanner.monitor_connection_realtime(duration, interval, dashboard='plot' if dashboard == '2' else 'text',
+                                                export_path=export_path or None)
         
         elif opcion == '7':
-            base = input("Base de IP (default: 10.100.224): ").strip()
+            base = input("Base de IP o CIDR (default: 10.100.224): ").strip()
             base = base if base else "10.100.224"
-            scanner.find_esp32_in_network(base)
+            if '/' in base:
+                scanner.find_esp32_in_network(cidr=base)
+            else:
+                scanner.find_esp32_in_network(base)
         
         elif opcion == '8':
             new_ip = input("Nueva IP del ESP32: ").strip()
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+Latency Prober - Medición de latencia en proceso (sin ejecutar 'ping')
+Mide RTT por tiempo de conexión TCP o con ICMP sin privilegios (Linux),
+con resolución sub-milisegundo y sondeo de alta frecuencia (10-100 Hz)
+sobre un único event loop de asyncio
+"""
+
+import asyncio
+import os
+import socket
+import struct
+import time
+
+import numpy as np
+
+
+def _icmp_checksum(data):
+    """Checksum de Internet (RFC 1071)"""
+    if len(data) % 2:
+        data += b'\x00'
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def icmp_available():
+    """True si el sistema permite sockets ICMP sin privilegios (net.ipv4.ping_group_range)"""
+    try:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+    except (OSError, AttributeError):
+        return False
+    sock.close()
+    return True
+
+
+class LatencyProber:
+    """Sondeo de latencia por TCP connect o ICMP echo sin privilegios"""
+
+    def __init__(self, host, port=81, method='auto', timeout=1.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        if method == 'auto':
+            method = 'icmp' if icmp_available() else 'tcp'
+        if method not in ('tcp', 'icmp'):
+            raise ValueError(f"Método desconocido: {method}")
+        self.method = method
+        self._seq = 0
+        self._ident = os.getpid() & 0xFFFF
+
+    async def _probe_tcp(self):
+        loop = asyncio.get_running_loop()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        try:
+            start = time.perf_counter_ns()
+            try:
+                await asyncio.wait_for(loop.sock_connect(sock, (self.host, self.port)), self.timeout)
+            except ConnectionRefusedError:
+                pass  # Un RST también es una respuesta: el host está vivo y el RTT es válido
+            return (time.perf_counter_ns() - start) / 1e6
+        except (OSError, asyncio.TimeoutError):
+            return None
+        finally:
+            sock.close()
+
+    async def _probe_icmp(self):
+        loop = asyncio.get_running_loop()
+        self._seq = (self._seq + 1) & 0xFFFF
+        seq = self._seq
+        header = struct.pack("!BBHHH", 8, 0, 0, self._ident, seq)
+        payload = struct.pack("!d", time.time()) + b'esp32cam'
+        packet = struct.pack("!BBHHH", 8, 0, _icmp_checksum(header + payload), self._ident, seq) + payload
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+        sock.setblocking(False)
+        try:
+            # Socket conectado + sock_sendall: loop.sock_sendto solo existe desde Python 3.11
+            sock.connect((self.host, 0))
+            start = time.perf_counter_ns()
+            await loop.sock_sendall(sock, packet)
+            deadline = start + self.timeout * 1e9
+            while True:
+                remaining = (deadline - time.perf_counter_ns()) / 1e9
+                if remaining <= 0:
+                    return None
+                reply = await asyncio.wait_for(loop.sock_recv(sock, 1024), remaining)
+                # Socket DGRAM: la respuesta llega sin cabecera IP (el kernel fija el identificador)
+                if len(reply) >= 8:
+                    reply_type, _, _, _, reply_seq = struct.unpack("!BBHHH", reply[:8])
+                    if reply_type == 0 and reply_seq == seq:
+                        return (time.perf_counter_ns() - start) / 1e6
+        except (OSError, asyncio.TimeoutError):
+            return None
+        finally:
+            sock.close()
+
+    async def probe_once(self):
+        """Una medición de RTT en ms (float) o None si no hubo respuesta"""
+        if self.method == 'icmp':
+            return await self._probe_icmp()
+        return await self._probe_tcp()
+
+    async def run(self, rate_hz=10.0, count=None, duration_sec=None, callback=None, stop_event=None):
+        """
+        Sondea a frecuencia fija sobre el event loop actual.
+        Cada sonda se lanza en su propia tarea, así una respuesta lenta no frena la cadencia.
+        callback(t_rel, rtt_ms) se llama al completar cada sonda.
+        Retorna la lista de (t_rel, rtt_ms) en orden de envío.
+        """
+        loop = asyncio.get_running_loop()
+        period = 1.0 / rate_hz
+        start = loop.time()
+        tasks = []
+
+        async def one(t_rel):
+            rtt = await self.probe_once()
+            if callback:
+                callback(t_rel, rtt)
+            return t_rel, rtt
+
+        i = 0
+        while True:
+            if count is not None and i >= count:
+                break
+            if duration_sec is not None and i * period >= duration_sec:
+                break
+            if stop_event is not None and stop_event.is_set():
+                break
+            target = start + i * period
+            delay = target - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.ensure_future(one(target - start)))
+            i += 1
+
+        return list(await asyncio.gather(*tasks))
+
+    def probe(self, count=4, rate_hz=5.0):
+        """Versión síncrona: envía 'count' sondas y retorna las muestras (t_rel, rtt_ms)"""
+        return asyncio.run(self.run(rate_hz=rate_hz, count=count))
+
+    @staticmethod
+    def summarize(samples):
+        """Estadísticas tipo ping a partir de las muestras (t_rel, rtt_ms)"""
+        rtts = np.array([rtt for _, rtt in samples if rtt is not None], dtype=np.float64)
+        sent = len(samples)
+        stats = {
+            'packets_sent': sent,
+            'packets_received': int(rtts.size),
+            'packet_loss': ((sent - rtts.size) / sent) * 100 if sent else 100.0,
+            'min_ms': None,
+            'max_ms': None,
+            'avg_ms': None,
+            'jitter_ms': None
+        }
+        if rtts.size:
+            stats['min_ms'] = float(rtts.min())
+            stats['max_ms'] = float(rtts.max())
+            stats['avg_ms'] = float(rtts.mean())
+            # Jitter: variación media entre RTTs consecutivos (RFC 3550, simplificado)
+            stats['jitter_ms'] = float(np.mean(np.abs(np.diff(rtts)))) if rtts.size > 1 else 0.0
+        return stats
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+Live Monitor - Monitoreo en vivo con memoria acotada
+Muestrea en un hilo de fondo hacia buffers circulares de tamaño fijo y
+muestra un dashboard de texto o un gráfico con blitting a frecuencia
+estable; las series se pueden exportar en cualquier momento
+"""
+
+import csv
+import sys
+import threading
+import time
+
+import numpy as np
+
+
+class RingBuffer:
+    """Buffer circular de tamaño fijo (tiempo + N campos) sobre un array NumPy"""
+
+    def __init__(self, capacity, fields):
+        self.capacity = capacity
+        self.fields = list(fields)
+        self.data = np.full((capacity, len(self.fields) + 1), np.nan)
+        self.index = 0   # Próxima posición de escritura
+        self.count = 0   # Muestras válidas (<= capacity)
+        self.total = 0   # Muestras recibidas en toda la corrida
+        self.lock = threading.Lock()
+
+    def append(self, t, values):
+        row = [t] + [np.nan if values.get(f) is None else values[f] for f in self.fields]
+        with self.lock:
+            self.data[self.index] = row
+            self.index = (self.index + 1) % self.capacity
+            self.count = min(self.count + 1, self.capacity)
+            self.total += 1
+
+    def snapshot(self):
+        """Copia en orden cronológico: (tiempos, {campo: valores})"""
+        with self.lock:
+            if self.count < self.capacity:
+                data = self.data[:self.count].copy()
+            else:
+                data = np.roll(self.data, -self.index, axis=0)
+        return data[:, 0], {f: data[:, i + 1] for i, f in enumerate(self.fields)}
+
+
+def poll_source(sample_fn, interval_sec):
+    """Fuente que llama a sample_fn() cada interval_sec (cadencia absoluta, sin deriva)"""
+    def source(push, stop_event):
+        next_time = time.perf_counter()
+        while not stop_event.is_set():
+            values = sample_fn()
+            if values:
+                push(values)
+            next_time += interval_sec
+            stop_event.wait(max(0.0, next_time - time.perf_counter()))
+    return source
+
+
+class StreamingMonitor:
+    """Muestreo en segundo plano + dashboards en vivo + exportación bajo demanda"""
+
+    def __init__(self, source, fields, capacity=3600, labels=None):
+        # source(push, stop_event): corre en el hilo de fondo y llama push(dict) por muestra
+        self.source = source
+        self.fields = list(fields)
+        self.labels = labels or {}
+        self.buffer = RingBuffer(capacity, self.fields)
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.t0 = None
+
+    def push(self, values, t=None):
+        t = time.perf_counter() - self.t0 if t is None else t
+        self.buffer.append(t, values)
+
+    def start(self):
+        self.t0 = time.perf_counter()
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.source, args=(self.push, self.stop_event), daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=5)
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def elapsed(self):
+        return time.perf_counter() - self.t0 if self.t0 is not None else 0.0
+
+    def export(self, path=None):
+        """Retorna las series actuales; si se da 'path' las guarda en CSV"""
+        times, series = self.buffer.snapshot()
+        if path:
+            with open(path, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['t_s'] + self.fields)
+                for i in range(times.size):
+                    writer.writerow([f"{times[i]:.3f}"] + ['' if np.isnan(series[k][i]) else series[k][i] for k in self.fields])
+            print(f"💾 Series exportadas a {path} ({times.size} muestras)")
+        return {'t': times, **series}
+
+    def _wait_frame(self, next_frame, period, duration_sec):
+        """Mantiene una frecuencia de refresco estable; False al terminar"""
+        if duration_sec is not None and self.elapsed() >= duration_sec:
+            return False
+        if not self.running:
+            return False
+        delay = next_frame - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        return True
+
+    def run_text_dashboard(self, duration_sec=None, refresh_hz=4.0, format_sample=None):
+        """
+        Dashboard de texto con redibujado incremental: imprime solo las muestras
+        nuevas y reescribe en el lugar la línea de estado
+        """
+        period = 1.0 / refresh_hz
+        printed = 0
+        next_frame = time.perf_counter()
+        while self._wait_frame(next_frame, period, duration_sec):
+            next_frame += period
+            times, series = self.buffer.snapshot()
+            new = min(self.buffer.total - printed, times.size)
+            sys.stdout.write("\r\x1b[2K")
+            if format_sample:
+                for i in range(times.size - new, times.size):
+                    sys.stdout.write(format_sample(times[i], {k: v[i] for k, v in series.items()}) + "\n")
+            printed = self.buffer.total
+            status = " | ".join(
+                f"{self.labels.get(k, k)}: {np.nanmean(v[-20:]):.1f}" for k, v in series.items()
+                if v.size and not np.all(np.isnan(v[-20:])))
+            sys.stdout.write(f"⏱️ {self.elapsed():6.1f}s | {status}")
+            sys.stdout.flush()
+        sys.stdout.write("\n")
+
+    def run_plot_dashboard(self, duration_sec=None, fps=10.0, window_sec=60.0, ylims=None, title=None):
+        """
+        Gráfico en vivo con blitting: eje x fijo ('segundos atrás') para no redibujar
+        ejes en cada frame; solo se redibuja todo si los datos salen del rango Y
+        """
+        import matplotlib.pyplot as plt
+
+        plt.ion()
+        fig, axes = plt.subplots(len(self.fields), 1, figsize=(12, 2.5 * len(self.fields)), sharex=True, squeeze=False)
+        axes = axes[:, 0]
+        lines = []
+        ylims = dict(ylims or {})
+        for ax, field in zip(axes, self.fields):
+            (line,) = ax.plot([], [], linewidth=2, animated=True)
+            ax.set_xlim(-window_sec, 0)
+            ax.set_ylim(*ylims.get(field, (0, 1)))
+            ax.set_ylabel(self.labels.get(field, field), fontsize=11)
+            ax.grid(True, alpha=0.3)
+            lines.append(line)
+        axes[-1].set_xlabel('Segundos atrás', fontsize=11)
+        if title:
+            axes[0].set_title(title, fontsize=14, fontweight='bold')
+        fig.tight_layout()
+        plt.show(block=False)
+        fig.canvas.draw()
+        background = fig.canvas.copy_from_bbox(fig.bbox)
+
+        period = 1.0 / fps
+        next_frame = time.perf_counter()
+        while plt.fignum_exists(fig.number) and self._wait_frame(next_frame, period, duration_sec):
+            next_frame += period
+            times, series = self.buffer.snapshot()
+            now = self.elapsed()
+            visible = times >= now - window_sec
+            rescale = False
+            for ax, line, field in zip(axes, lines, self.fields):
+                values = series[field][visible]
+                line.set_data(times[visible] - now, values)
+                finite = values[~np.isnan(values)]
+                if finite.size:
+                    lo, hi = ax.get_ylim()
+                    if finite.min() < lo or finite.max() > hi:
+                        margin = max(1.0, 0.1 * (finite.max() - finite.min()))
+                        ax.set_ylim(min(lo, finite.min() - margin), max(hi, finite.max() + margin))
+                        rescale = True
+            if rescale:
+                # Cambió un eje: redibujar todo una vez y capturar el nuevo fondo
+                fig.canvas.draw()
+                background = fig.canvas.copy_from_bbox(fig.bbox)
+            fig.canvas.restore_region(background)
+            for ax, line in zip(axes, lines):
+                ax.draw_artist(line)
+            fig.canvas.blit(fig.bbox)
+            fig.canvas.flush_events()
+        plt.ioff()
@@ -5,257 +5,47 @@ Analiza todas las redes WiFi visibles desde la laptop
 Detecta congestión, interferencias y calidad de señal
 """
 
-import subprocess
-import re
-import time
-from datetime import datetime
 from collections import defaultdict
 import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
 import numpy as np
 
+from live_monitor import StreamingMonitor, poll_source
+from wifi_backends import get_backend
+from channel_congestion import ChannelCongestionModel
+
 class WiFiAnalyzer:
-    """Analizador de señales WiFi para Windows"""
+    """Analizador de señales WiFi (Windows: netsh | Linux: nmcli / iw)"""
     
-    def __init__(self):
+    def __init__(self, backend=None):
+        self.backend = backend or get_backend()
+        self.congestion_model = ChannelCongestionModel()
         self.networks = {}
         self.channel_usage = defaultdict(list)
         self.scan_history = []
         
-    def scan_networks(self):
-        """Escanea todas las redes WiFi disponibles usando netsh"""
+    def scan_networks(self, max_age=None):
+        """Escanea todas las redes WiFi disponibles (resultado cacheado por el backend)"""
         try:
-            # Ejecutar comando netsh para escanear redes
-            cmd = "netsh wlan show networks mode=bssid"
-            # Usar cp850 (DOS Latin 1) que es la codificación de cmd en español
-            result = subprocess.run(cmd, capture_output=True, text=True, shell=True, encoding='cp850')
-            
-            if result.returncode != 0:
-                print("❌ Error al escanear redes WiFi")
-                return []
-            
-            return self._parse_netsh_output(result.stdout)
-            
+            return self.backend.scan_networks(max_age=max_age)
         except Exception as e:
             print(f"❌ Error en scan_networks: {e}")
             return []
     
-    def _parse_netsh_output(self, output):
-        """Parsea la salida de netsh wlan show networks"""
-        networks = []
-        current_ssid = None
-        current_bssid_data = None
-        
-        lines = output.split('\n')
-        
-        for line in lines:
-            original_line = line
-            line = line.strip()
-            
-            # SSID - Inicio de nueva red
-            if line.startswith('SSID'):
-                ssid_match = re.search(r'SSID \d+ : (.+)', line)
-                if ssid_match:
-                    # Guardar BSSID anterior si existe
-                    if current_bssid_data and 'bssid' in current_bssid_data and current_ssid:
-                        network_entry = {'ssid': current_ssid}
-                        network_entry.update(current_bssid_data)
-                        networks.append(network_entry)
-                    
-                    current_ssid = ssid_match.group(1).strip()
-                    current_bssid_data = None  # Reset para nueva red
-            
-            # Tipo de red
-            elif ('Tipo de red' in line or 'Network type' in line) and current_bssid_data is not None:
-                match = re.search(r':\s*(.+)', line)
-                if match:
-                    current_bssid_data['type'] = match.group(1).strip()
-            
-            # Autenticación
-            elif ('Autenticación' in line or 'Authentication' in line) and current_bssid_data is not None:
-                match = re.search(r':\s*(.+)', line)
-                if match:
-                    current_bssid_data['auth'] = match.group(1).strip()
-            
-            # Cifrado
-            elif ('Cifrado' in line or 'Encryption' in line) and current_bssid_data is not None:
-                match = re.search(r':\s*(.+)', line)
-                if match:
-                    current_bssid_data['encryption'] = match.group(1).strip()
-            
-            # BSSID - Inicio de nuevo punto de acceso
-            elif 'BSSID' in line:
-                # Guardar BSSID anterior si existe
-                if current_bssid_data and 'bssid' in current_bssid_data and current_ssid:
-                    network_entry = {'ssid': current_ssid}
-                    network_entry.update(current_bssid_data)
-                    networks.append(network_entry)
-                
-                # Iniciar nuevo BSSID
-                match = re.search(r'BSSID \d+\s*:\s*(.+)', line)
-                if match:
-                    current_bssid_data = {'bssid': match.group(1).strip()}
-            
-            # Señal - buscar líneas con % que no sean "Uso del canal" ni "Mbps"
-            elif '%' in line and 'Uso del canal' not in line and 'Mbps' not in line and current_bssid_data is not None:
-                # La línea puede ser "         Señal             : 20%" o "         Se├▒al             : 20%"
-                match = re.search(r'(\d+)\s*%', line)
-                if match:
-                    signal_percent = int(match.group(1))
-                    # Convertir % a dBm aproximado
-                    # 100% ≈ -30dBm, 0% ≈ -90dBm
-                    rssi_dbm = -90 + (signal_percent * 0.6)
-                    current_bssid_data['signal_percent'] = signal_percent
-                    current_bssid_data['rssi_dbm'] = int(rssi_dbm)
-            
-            # Banda - Extraer 2.4 o 5 GHz
-            elif ('Banda' in line or 'Band' in line) and current_bssid_data is not None:
-                if '2,4 GHz' in line or '2.4 GHz' in line:
-                    current_bssid_data['band'] = '2.4GHz'
-                elif '5 GHz' in line:
-                    current_bssid_data['band'] = '5GHz'
-            
-            # Canal
-            elif ('Canal' in line or 'Channel' in line) and current_bssid_data is not None:
-                # Evitar líneas de "Uso del canal"
-                if 'Uso del canal' not in line and 'channel usage' not in line.lower():
-                    match = re.search(r':\s*(\d+)', line)
-                    if match:
-                        current_bssid_data['channel'] = int(match.group(1))
-        
-        # Agregar el último BSSID si existe
-        if current_bssid_data and 'bssid' in current_bssid_data and current_ssid:
-            network_entry = {'ssid': current_ssid}
-            network_entry.update(current_bssid_data)
-            networks.append(network_entry)
-        
-        # Post-procesamiento: inferir banda del canal si no está presente
-        for net in networks:
-            if 'band' not in net and 'channel' in net:
-                ch = net['channel']
-                if 1 <= ch <= 14:
-                    net['band'] = '2.4GHz'
-                elif ch >= 36:
-                    net['band'] = '5GHz'
-        
-        return networks
-    
-    def get_connected_network_info(self):
+    def get_connected_network_info(self, max_age=None):
         """Obtiene información detallada de la red WiFi conectada actualmente"""
         try:
-            cmd = "netsh wlan show interfaces"
-            result = subprocess.run(cmd, capture_output=True, text=True, shell=True, encoding='cp850')
-            
-            if result.returncode != 0:
-                return None
-            
-            info = {}
-            for line in result.stdout.split('\n'):
-                line = line.strip()
-                
-                # SSID (evitar BSSID)
-                if ('SSID' in line or 'ssid' in line.lower()) and 'BSSID' not in line and 'bssid' not in line.lower():
-                    match = re.search(r':\s*(.+)', line)
-                    if match:
-                        ssid = match.group(1).strip()
-                        if ssid:  # Evitar SSIDs vacíos
-                            info['ssid'] = ssid
-                
-                # BSSID
-                elif 'BSSID' in line:
-                    match = re.search(r':\s*(.+)', line)
-                    if match:
-                        info['bssid'] = match.group(1).strip()
-                
-                # Canal
-                elif 'Canal' in line or 'Channel' in line:
-                    match = re.search(r':\s*(\d+)', line)
-                    if match:
-                        info['channel'] = int(match.group(1))
-                
-                # Señal - con espacios variables
-                elif 'Señal' in line or 'Signal' in line:
-                    match = re.search(r'(\d+)\s*%', line)
-                    if match:
-                        signal_percent = int(match.group(1))
-                        rssi_dbm = -90 + (signal_percent * 0.6)
-                        info['signal_percent'] = signal_percent
-                        info['rssi_dbm'] = int(rssi_dbm)
-                
-                # Velocidad de recepción
-                elif 'Velocidad de recepción' in line or 'Receive rate' in line:
-                    match = re.search(r':\s*([\d.]+)', line)
-                    if match:
-                        info['rx_rate_mbps'] = float(match.group(1))
-                
-                # Velocidad de transmisión
-                elif 'Velocidad de transmisión' in line or 'Transmit rate' in line:
-                    match = re.search(r':\s*([\d.]+)', line)
-                    if match:
-                        info['tx_rate_mbps'] = float(match.group(1))
-                
-                # Tipo de radio
-                elif 'Tipo de radio' in line or 'Radio type' in line:
-                    match = re.search(r':\s*(.+)', line)
-                    if match:
-                        radio = match.group(1).strip()
-                        info['radio_type'] = radio
-                        # Detectar banda
-                        if '802.11a' in radio or '802.11ac' in radio or '802.11ax' in radio:
-                            # 802.11ax puede ser dual-band, usar canal
-                            if 'channel' in info:
-                                info['band'] = '2.4GHz' if info['channel'] <= 14 else '5GHz'
-                            else:
-                                info['band'] = '5GHz'
-                        elif '802.11n' in radio or '802.11g' in radio or '802.11b' in radio:
-                            # 802.11n puede ser 2.4 o 5GHz, usar canal
-                            if 'channel' in info:
-                                info['band'] = '2.4GHz' if info['channel'] <= 14 else '5GHz'
-                            else:
-                                info['band'] = '2.4GHz'
-                        else:
-                            info['band'] = 'Desconocida'
-            
-            return info if info else None
-            
+            return self.backend.connected_info(max_age=max_age)
         except Exception as e:
             print(f"❌ Error al obtener info de red conectada: {e}")
             return None
     
     def analyze_24ghz_congestion(self, networks):
-        """Analiza la congestión en canales 2.4GHz"""
-        channel_count = defaultdict(int)
-        channel_signals = defaultdict(list)
-        
-        for net in networks:
-            if 'channel' in net and net['channel'] <= 14:  # 2.4GHz
-                ch = net['channel']
-                channel_count[ch] += 1
-                if 'rssi_dbm' in net:
-                    channel_signals[ch].append(net['rssi_dbm'])
-        
-        # Calcular congestión considerando solapamiento de canales
-        # En 2.4GHz, cada canal afecta ±2 canales
-        congestion = {}
-        for ch in range(1, 14):
-            total_networks = 0
-            avg_signal = []
-            
-            for offset in range(-2, 3):  # Canales adyacentes
-                neighbor_ch = ch + offset
-                if neighbor_ch in channel_count:
-                    # Peso mayor para canal exacto
-                    weight = 1.0 if offset == 0 else 0.3
-                    total_networks += channel_count[neighbor_ch] * weight
-                    if neighbor_ch in channel_signals:
-                        avg_signal.extend(channel_signals[neighbor_ch])
-            
-            congestion[ch] = {
-                'networks': total_networks,
-                'avg_rssi': int(np.mean(avg_signal)) if avg_signal else -90
-            }
-        
-        return congestion
+        """Analiza la congestión en canales 2.4GHz (solapamiento espectral ponderado por RSSI)"""
+        return self.congestion_model.analyze(networks, '2.4GHz')
+    
+    def analyze_5ghz_congestion(self, networks):
+        """Analiza la congestión en canales 5GHz"""
+        return self.congestion_model.analyze(networks, '5GHz')
     
     def print_summary(self):
         """Imprime un resumen del análisis de redes"""
@@ -326,28 +116,17 @@ class WiFiAnalyzer:
             congestion = self.analyze_24ghz_congestion(networks_24)
             print("\n📊 CONGESTIÓN DE CANALES 2.4GHz:")
             print("-"*70)
-            print("Canal | Redes | Señal Promedio | Estado")
+            print("Canal | Redes | Señal Promedio | Interferencia | Estado")
             print("-"*70)
             
             # Canales recomendados: 1, 6, 11 (no se solapan)
             recommended = [1, 6, 11]
             for ch in recommended:
-                if ch in congestion:
-                    networks_count = congestion[ch]['networks']
-                    avg_rssi = congestion[ch]['avg_rssi']
-                    
-                    if networks_count < 2:
-                        status = "🟢 LIBRE"
-                    elif networks_count < 4:
-                        status = "🟡 MEDIO"
-                    else:
-                        status = "🔴 CONGESTIONADO"
-                    
-                    print(f"  {ch:>2}  | {networks_count:>5.1f} | {avg_rssi:>10} dBm    | {status}")
+                self._print_congestion_row(ch, congestion[ch])
             
-            # Mejor canal
-            best_ch = min(recommended, key=lambda x: congestion.get(x, {'networks': 999})['networks'])
-            print(f"\n💡 Mejor canal recomendado: {best_ch}")
+            # Mejor canal para el AP del ESP32 (solo 2.4GHz): menor interferencia total
+            best = self.congestion_model.recommend(networks_24, '2.4GHz', recommended)
+            print(f"\n💡 Mejor canal recomendado: {best['channel']} ({best['interference_dbm']:.1f} dBm de interferencia)")
         
         # Análisis 5GHz
         if networks_5:
@@ -365,9 +144,30 @@ class WiFiAnalyzer:
                 rssi = net.get('rssi_dbm', -90)
                 
                 print(f"{ssid:<25} {channel:>6} {signal:>7}% {rssi:>7} dBm")
+            
+            best = self.congestion_model.recommend(networks_5, '5GHz')
+            congestion = best['congestion']
+            print("\n📊 CONGESTIÓN DE CANALES 5GHz (canales más limpios):")
+            print("-"*70)
+            print("Canal | Redes | Señal Promedio | Interferencia | Estado")
+            print("-"*70)
+            for ch in best['ranking'][:5]:
+                self._print_congestion_row(ch, congestion[ch])
         
         print("\n" + "="*70 + "\n")
     
+    def _print_congestion_row(self, ch, stats):
+        """Fila de la tabla de congestión de un canal"""
+        networks_count = stats['networks']
+        if networks_count < 2:
+            status = "🟢 LIBRE"
+        elif networks_count < 4:
+            status = "🟡 MEDIO"
+        else:
+            status = "🔴 CONGESTIONADO"
+        
+        print(f"  {ch:>3} | {networks_count:>5.1f} | {stats['avg_rssi']:>10} dBm    | {stats['interference_dbm']:>9.1f} dBm | {status}")
+    
     def plot_channel_usage(self):
         """Genera gráfico de uso de canales 2.4GHz"""
         networks = self.scan_networks()
@@ -414,60 +214,79 @@ class WiFiAnalyzer:
         plt.tight_layout()
         plt.show()
     
-    def monitor_signal_realtime(self, duration_sec=60, interval_sec=2):
-        """Monitorea la señal de la red conectada en tiempo real"""
+    def monitor_signal_realtime(self, duration_sec=60, interval_sec=2, dashboard='text',
+                                capacity=3600, export_path=None):
+        """
+        Monitorea la señal de la red conectada en tiempo real
+        Muestreo en hilo de fondo hacia buffers circulares (memoria acotada);
+        dashboard='text' o 'plot' (gráfico en vivo con blitting)
+        """
         print(f"\n📊 Monitoreando señal WiFi por {duration_sec} segundos...")
         print("Presiona Ctrl+C para detener\n")
         
-        timestamps = []
-        signals = []
-        rx_rates = []
-        tx_rates = []
+        def sample():
+            info = self.get_connected_network_info()
+            if not info:
+                return None
+            return {
+                'signal_percent': info.get('signal_percent', 0),
+                'rssi_dbm': info.get('rssi_dbm', -90),
+                'rx_rate_mbps': info.get('rx_rate_mbps', 0),
+                'tx_rate_mbps': info.get('tx_rate_mbps', 0)
+            }
         
+        def format_sample(t, values):
+            return (f"[{t:6.1f}s] "
+                    f"Señal: {values['signal_percent']:>3.0f}% ({values['rssi_dbm']:>3.0f} dBm) | "
+                    f"RX: {values['rx_rate_mbps']:>6.1f} Mbps | "
+                    f"TX: {values['tx_rate_mbps']:>6.1f} Mbps")
+        
+        monitor = StreamingMonitor(
+            poll_source(sample, interval_sec),
+            ['rssi_dbm', 'rx_rate_mbps', 'tx_rate_mbps', 'signal_percent'],
+            capacity=capacity,
+            labels={'rssi_dbm': 'Señal (dBm)', 'rx_rate_mbps': 'RX (Mbps)',
+                    'tx_rate_mbps': 'TX (Mbps)', 'signal_percent': 'Señal (%)'}
+        ).start()
         try:
-            start_time = time.time()
-            while time.time() - start_time < duration_sec:
-                info = self.get_connected_network_info()
-                
-                if info:
-                    current_time = time.time() - start_time
-                    timestamps.append(current_time)
-                    signals.append(info.get('rssi_dbm', -90))
-                    rx_rates.append(info.get('rx_rate_mbps', 0))
-                    tx_rates.append(info.get('tx_rate_mbps', 0))
-                    
-                    print(f"[{current_time:6.1f}s] "
-                          f"Señal: {info.get('signal_percent', 0):>3}% ({info.get('rssi_dbm', -90):>3} dBm) | "
-                          f"RX: {info.get('rx_rate_mbps', 0):>6.1f} Mbps | "
-                          f"TX: {info.get('tx_rate_mbps', 0):>6.1f} Mbps")
-                
-                time.sleep(interval_sec)
-            
-            # Estadísticas finales
-            if signals:
-                print("\n" + "="*70)
-                print("📊 ESTADÍSTICAS DEL MONITOREO")
-                print("="*70)
-                print(f"Duración: {timestamps[-1]:.1f} segundos")
-                print(f"Muestras: {len(signals)}")
-                print(f"\nSeñal (dBm):")
-                print(f"  Promedio: {np.mean(signals):.1f} dBm")
-                print(f"  Mínima: {np.min(signals)} dBm")
-                print(f"  Máxima: {np.max(signals)} dBm")
-                print(f"  Desviación: {np.std(signals):.2f} dBm")
-                print(f"\nVelocidad RX (Mbps):")
-                print(f"  Promedio: {np.mean(rx_rates):.1f} Mbps")
-                print(f"  Mínima: {np.min(rx_rates):.1f} Mbps")
-                print(f"  Máxima: {np.max(rx_rates):.1f} Mbps")
-                print("="*70 + "\n")
-                
-                # Graficar
-                self._plot_monitoring_results(timestamps, signals, rx_rates, tx_rates)
-        
+            if dashboard == 'plot':
+                monitor.run_plot_dashboard(duration_sec, ylims={'rssi_dbm': (-90, -30), 'signal_percent': (0, 100)},
+                                           title='Monitoreo de Señal WiFi en Tiempo Real')
+            else:
+                monitor.run_text_dashboard(duration_sec, format_sample=format_sample)
         except KeyboardInterrupt:
             print("\n\n⚠️ Monitoreo interrumpido por el usuario")
-            if signals:
+        finally:
+            monitor.stop()
+        
+        series = monitor.export(export_path)
+        timestamps = series['t']
+        signals = series['rssi_dbm']
+        rx_rates = series['rx_rate_mbps']
+        tx_rates = series['tx_rate_mbps']
+        
+        # Estadísticas finales
+        if signals.size:
+            print("\n" + "="*70)
+            print("📊 ESTADÍSTICAS DEL MONITOREO")
+            print("="*70)
+            print(f"Duración: {monitor.elapsed():.1f} segundos")
+            print(f"Muestras: {monitor.buffer.total} (en memoria: {signals.size})")
+            print(f"\nSeñal (dBm):")
+            print(f"  Promedio: {np.mean(signals):.1f} dBm")
+            print(f"  Mínima: {np.min(signals):.0f} dBm")
+            print(f"  Máxima: {np.max(signals):.0f} dBm")
+            print(f"  Desviación: {np.std(signals):.2f} dBm")
+            print(f"\nVelocidad RX (Mbps):")
+            print(f"  Promedio: {np.mean(rx_rates):.1f} Mbps")
+            print(f"  Mínima: {np.min(rx_rates):.1f} Mbps")
+            print(f"  Máxima: {np.max(rx_rates):.1f} Mbps")
+            print("="*70 + "\n")
+            
+            # Graficar (el dashboard gráfico ya mostró la serie en vivo)
+            if dashboard != 'plot':
                 self._plot_monitoring_results(timestamps, signals, rx_rates, tx_rates)
+        return series
     
     def _plot_monitoring_results(self, timestamps, signals, rx_rates, tx_rates):
         """Grafica los resultados del monitoreo"""
@@ -525,8 +344,11 @@ def main():
                 duration = input("Duración del monitoreo en segundos (default: 60): ").strip()
                 duration = int(duration) if duration else 60
                 interval = input("Intervalo entre muestras en segundos (default: 2): ").strip()
-                interval = int(interval) if interval else 2
-                analyzer.monitor_signal_realtime(duration, interval)
+                interval = float(interval) if interval else 2
+                dashboard = input("Dashboard: 1=texto, 2=gráfico en vivo (default: 1): ").strip()
+                export_path = input("Exportar series a CSV (ruta, vacío = no): ").strip()
+                analyzer.monitor_signal_realtime(duration, interval, dashboard='plot' if dashboard == '2' else 'text',
+                                                 export_path=export_path or None)
             except ValueError:
                 print("❌ Valores inválidos, usando defaults (60s, intervalo 2s)")
                 analyzer.monitor_signal_realtime(60, 2)
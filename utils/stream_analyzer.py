@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+Stream Analyzer - Throughput del stream MJPEG medido por frame
+Usa el mismo demultiplexor que camera_stream.py para reportar FPS real,
+jitter de llegada, distribución de tamaños, goodput vs overhead y
+episodios de congelamiento, en ventanas deslizantes (memoria constante)
+"""
+
+import importlib.util
+import os
+import sys
+import time
+from collections import deque
+
+import numpy as np
+import requests
+
+_MJPEG_STREAM_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'mjpeg_stream.py')
+
+
+def _load_mjpeg_stream():
+    """
+    Módulo src/mjpeg_stream.py (el parser de camera_stream.py), cargado recién al medir.
+    Si src/ no está en el path se carga desde su archivo, así los scripts de utils/ corren sin configurar nada
+    """
+    try:
+        import mjpeg_stream
+    except ImportError:
+        spec = importlib.util.spec_from_file_location('mjpeg_stream', _MJPEG_STREAM_PATH)
+        mjpeg_stream = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(mjpeg_stream)
+        sys.modules['mjpeg_stream'] = mjpeg_stream
+    return mjpeg_stream
+
+
+class StreamThroughputAnalyzer:
+    """Métricas por frame sobre una ventana deslizante de tiempo"""
+
+    def __init__(self, window_sec=5.0, stall_threshold_sec=0.5, max_window_frames=1000, max_stalls=100):
+        self.window_sec = window_sec
+        self.stall_threshold_sec = stall_threshold_sec
+        # Ventanas deslizantes (acotadas también en cantidad por seguridad)
+        self.frame_window = deque(maxlen=max_window_frames)  # (t, size_bytes)
+        self.byte_window = deque(maxlen=max_window_frames * 8)  # (t, bytes_in)
+        self.stalls = deque(maxlen=max_stalls)  # (t_inicio, duración_s)
+        # Acumulados de toda la corrida
+        self.start_time = None
+        self.last_frame_time = None
+        self.total_frames = 0
+        self.total_bytes = 0
+        self.total_jpeg_bytes = 0
+        self.stall_count = 0
+        self.stall_time = 0.0
+
+    def _trim(self, now):
+        limit = now - self.window_sec
+        while self.frame_window and self.frame_window[0][0] < limit:
+            self.frame_window.popleft()
+        while self.byte_window and self.byte_window[0][0] < limit:
+            self.byte_window.popleft()
+
+    def on_bytes(self, n, now):
+        """Registra bytes recibidos del socket (incluye headers multipart)"""
+        if self.start_time is None:
+            self.start_time = now
+        self.total_bytes += n
+        self.byte_window.append((now, n))
+
+    def on_frame(self, size, now):
+        """Registra un JPEG completo demultiplexado"""
+        if self.start_time is None:
+            self.start_time = now
+        reference = self.last_frame_time if self.last_frame_time is not None else self.start_time
+        gap = now - reference
+        if gap >= self.stall_threshold_sec:
+            self.stalls.append((reference - self.start_time, gap))
+            self.stall_count += 1
+            self.stall_time += gap
+        self.last_frame_time = now
+        self.total_frames += 1
+        self.total_jpeg_bytes += size
+        self.frame_window.append((now, size))
+        self._trim(now)
+
+    def snapshot(self, now=None):
+        """Métricas de la ventana actual + acumulados"""
+        now = time.time() if now is None else now
+        self._trim(now)
+        times = np.array([t for t, _ in self.frame_window], dtype=np.float64)
+        sizes = np.array([s for _, s in self.frame_window], dtype=np.float64)
+        window_bytes = sum(n for _, n in self.byte_window)
+        span = min(self.window_sec, now - self.start_time) if self.start_time is not None else 0.0
+
+        snap = {
+            'fps': 0.0,
+            'interval_ms': None,
+            'jitter_ms': None,
+            'frame_size_kb': None,
+            'throughput_mbps': (window_bytes * 8) / (span * 1e6) if span > 0 else 0.0,
+            'goodput_mbps': float(sizes.sum() * 8) / (span * 1e6) if span > 0 else 0.0,
+            'overhead_pct': 0.0,
+            'total_frames': self.total_frames,
+            'total_bytes': self.total_bytes,
+            'stall_count': self.stall_count,
+            'stall_time_s': self.stall_time,
+            'stalls': list(self.stalls),
+        }
+        if times.size >= 2:
+            intervals = np.diff(times)
+            snap['fps'] = float((times.size - 1) / (times[-1] - times[0])) if times[-1] > times[0] else 0.0
+            snap['interval_ms'] = float(intervals.mean() * 1000)
+            snap['jitter_ms'] = float(intervals.std() * 1000)
+        if sizes.size:
+            p50, p90 = np.percentile(sizes, [50, 90])
+            snap['frame_size_kb'] = {
+                'min': float(sizes.min()) / 1024, 'p50': float(p50) / 1024,
+                'p90': float(p90) / 1024, 'max': float(sizes.max()) / 1024
+            }
+        if self.total_bytes:
+            snap['overhead_pct'] = (1 - self.total_jpeg_bytes / self.total_bytes) * 100
+        return snap
+
+    def analyze(self, url, duration_sec=10, chunk_size=4096, timeout=5, report_every=1.0, on_report=None):
+        """Descarga el stream 'duration_sec' segundos demultiplexando cada frame"""
+        response = requests.get(url, timeout=timeout, stream=True)
+        try:
+            mjpeg_stream = _load_mjpeg_stream()
+            boundary = mjpeg_stream.boundary_from_content_type(response.headers.get('Content-Type'))
+            demuxer = mjpeg_stream.MJPEGDemuxer(boundary, buffer_max=1 << 20, buffer_keep=1 << 19)
+            start = time.time()
+            next_report = start + report_every
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                now = time.time()
+                if chunk:
+                    self.on_bytes(len(chunk), now)
+                    for jpg in demuxer.feed(chunk):
+                        self.on_frame(len(jpg), now)
+                if on_report and now >= next_report:
+                    on_report(now - start, self.snapshot(now))
+                    next_report += report_every
+                if now - start >= duration_sec:
+                    break
+        finally:
+            response.close()
+        end = time.time()
+        # Un congelamiento en curso al terminar también cuenta
+        if self.start_time is not None:
+            reference = self.last_frame_time if self.last_frame_time is not None else self.start_time
+            if end - reference >= self.stall_threshold_sec:
+                self.stalls.append((reference - self.start_time, end - reference))
+                self.stall_count += 1
+                self.stall_time += end - reference
+        result = self.snapshot(end)
+        result['duration'] = end - (self.start_time or end)
+        # Frames rechazados por el demultiplexor (truncados, sin EOI, etc.) por clase
+        result['frames_rejected'] = demuxer.frames_rejected
+        result['corrupt'] = {kind: n for kind, n in demuxer.corrupt.items() if n}
+        # Promedios de toda la corrida (las demás métricas son de la última ventana)
+        result['fps_avg'] = self.total_frames / result['duration'] if result['duration'] > 0 else 0.0
+        result['throughput_avg_mbps'] = (self.total_bytes * 8) / (result['duration'] * 1e6) if result['duration'] > 0 else 0.0
+        return result
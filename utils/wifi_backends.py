@@ -0,0 +1,462 @@
+# -*- coding: utf-8 -*-
+"""
+WiFi Backends - Acceso multiplataforma a la información WiFi
+Windows: netsh wlan | Linux: nmcli / iw / /proc/net/wireless
+Los parsers usan expresiones compiladas una sola vez y los resultados del
+escaneo se cachean con TTL para no re-escanear más rápido que la radio
+"""
+
+import platform
+import re
+import shutil
+import subprocess
+import threading
+import time
+
+# ===== Utilidades comunes =====
+
+_KEY_VALUE_RE = re.compile(r'^\s*([^:]+?)\s*:\s*(.*?)\s*$')
+_PERCENT_RE = re.compile(r'(\d+)\s*%')
+_NUMBER_RE = re.compile(r'[-+]?\d+(?:[.,]\d+)?')
+_WIDTH_RE = re.compile(r'(\d+)\s*MHz', re.IGNORECASE)
+
+
+def parse_width(value):
+    """Ancho de canal en MHz a partir de '40 MHz' / '80MHz' (None si no hay)"""
+    match = _WIDTH_RE.search(value or '')
+    return int(match.group(1)) if match else None
+
+
+def percent_to_dbm(signal_percent):
+    """Conversión aproximada usada por netsh: 100% ≈ -30 dBm, 0% ≈ -90 dBm"""
+    return int(-90 + signal_percent * 0.6)
+
+
+def band_from_channel(channel):
+    if 1 <= channel <= 14:
+        return '2.4GHz'
+    if channel >= 32:
+        return '5GHz'
+    return None
+
+
+def channel_from_freq(freq_mhz):
+    """Canal WiFi a partir de la frecuencia central (MHz)"""
+    freq_mhz = int(freq_mhz)
+    if freq_mhz == 2484:
+        return 14
+    if 2412 <= freq_mhz < 2484:
+        return (freq_mhz - 2407) // 5
+    if 5000 <= freq_mhz < 5925:
+        return (freq_mhz - 5000) // 5
+    return None
+
+
+def _run(cmd, encoding='utf-8'):
+    result = subprocess.run(cmd, capture_output=True, text=True, encoding=encoding, errors='replace')
+    if result.returncode != 0:
+        detail = (result.stderr or '').strip()
+        raise RuntimeError(f"'{' '.join(cmd)}' terminó con código {result.returncode}" + (f": {detail}" if detail else ''))
+    return result.stdout
+
+
+class WiFiBackend:
+    """Interfaz común con cache TTL; las subclases implementan _scan() y _connected()"""
+
+    name = 'base'
+
+    def __init__(self, scan_ttl_sec=10.0, connected_ttl_sec=1.0):
+        # Una radio típica no entrega escaneos nuevos más rápido que cada ~5-10 s
+        self.scan_ttl_sec = scan_ttl_sec
+        self.connected_ttl_sec = connected_ttl_sec
+        self._cache = {}  # clave: (timestamp, valor)
+        self._lock = threading.Lock()
+
+    def _cached(self, key, ttl, producer, max_age=None):
+        ttl = ttl if max_age is None else max_age
+        now = time.monotonic()
+        with self._lock:
+            hit = self._cache.get(key)
+            if hit is not None and now - hit[0] < ttl:
+                return hit[1]
+        value = producer()
+        with self._lock:
+            self._cache[key] = (time.monotonic(), value)
+        return value
+
+    def scan_networks(self, max_age=None):
+        """Lista de BSSIDs visibles: dicts con ssid, bssid, channel, band, signal_percent, rssi_dbm, auth..."""
+        return self._cached('scan', self.scan_ttl_sec, self._scan, max_age)
+
+    def connected_info(self, max_age=None):
+        """Dict con la información de la red conectada, o None"""
+        return self._cached('connected', self.connected_ttl_sec, self._connected, max_age)
+
+    def invalidate(self):
+        with self._lock:
+            self._cache.clear()
+
+    def _scan(self):
+        raise NotImplementedError
+
+    def _connected(self):
+        raise NotImplementedError
+
+
+# ===== Windows: netsh =====
+
+_NETSH_KEYS = {
+    'tipo de red': 'type', 'network type': 'type',
+    'autenticación': 'auth', 'authentication': 'auth',
+    'cifrado': 'encryption', 'encryption': 'encryption',
+    'señal': 'signal', 'signal': 'signal',
+    'banda': 'band', 'band': 'band',
+    'canal': 'channel', 'channel': 'channel',
+    'tipo de radio': 'radio_type', 'radio type': 'radio_type',
+    'ancho de canal': 'width', 'ancho del canal': 'width', 'channel width': 'width',
+    'velocidad de recepción (mbps)': 'rx_rate_mbps', 'receive rate (mbps)': 'rx_rate_mbps',
+    'velocidad de transmisión (mbps)': 'tx_rate_mbps', 'transmit rate (mbps)': 'tx_rate_mbps',
+    'ssid': 'ssid', 'bssid': 'bssid', 'ap bssid': 'bssid',
+}
+_NETSH_NUMBERED_RE = re.compile(r'^(B?SSID)\s+\d+$', re.IGNORECASE)
+_NETSH_USAGE_RE = re.compile(r'uso del canal|channel utilization|channel usage', re.IGNORECASE)
+
+
+def _netsh_key(raw_key):
+    """Normaliza la etiqueta de netsh (español/inglés) a un nombre de campo"""
+    numbered = _NETSH_NUMBERED_RE.match(raw_key)
+    if numbered:
+        return numbered.group(1).lower() + '#'
+    return _NETSH_KEYS.get(raw_key.lower())
+
+
+def _netsh_band(value):
+    if '2,4' in value or '2.4' in value:
+        return '2.4GHz'
+    if '5 GHz' in value or '5GHz' in value:
+        return '5GHz'
+    return None
+
+
+def parse_netsh_networks(output):
+    """Parsea 'netsh wlan show networks mode=bssid'"""
+    networks = []
+    current_ssid = None
+    current = None
+
+    def flush():
+        if current and 'bssid' in current and current_ssid:
+            entry = {'ssid': current_ssid}
+            entry.update(current)
+            networks.append(entry)
+
+    for line in output.splitlines():
+        match = _KEY_VALUE_RE.match(line)
+        if not match:
+            continue
+        raw_key, value = match.groups()
+        key = _netsh_key(raw_key)
+
+        if key is None:
+            # Consola con codificación incorrecta ("Se├▒al"): la señal es la única línea con %
+            if (current is not None and _PERCENT_RE.search(value) and 'Mbps' not in value
+                    and not _NETSH_USAGE_RE.search(raw_key)):
+                key = 'signal'
+            else:
+                continue
+
+        if key == 'ssid#':
+            flush()
+            current_ssid = value
+            current = None
+        elif key == 'bssid#':
+            flush()
+            current = {'bssid': value}
+        elif current is None:
+            continue
+        elif key == 'signal':
+            percent = _PERCENT_RE.search(value)
+            if percent:
+                current['signal_percent'] = int(percent.group(1))
+                current['rssi_dbm'] = percent_to_dbm(current['signal_percent'])
+        elif key == 'band':
+            band = _netsh_band(value)
+            if band:
+                current['band'] = band
+        elif key == 'channel':
+            number = _NUMBER_RE.match(value)
+            if number:
+                current['channel'] = int(number.group(0))
+        elif key == 'width':
+            width = parse_width(value)
+            if width:
+                current['width_mhz'] = width
+        elif key in ('type', 'auth', 'encryption'):
+            current[key] = value
+    flush()
+
+    for net in networks:
+        if 'band' not in net and 'channel' in net:
+            band = band_from_channel(net['channel'])
+            if band:
+                net['band'] = band
+    return networks
+
+
+def parse_netsh_interfaces(output):
+    """Parsea 'netsh wlan show interfaces'"""
+    info = {}
+    for line in output.splitlines():
+        match = _KEY_VALUE_RE.match(line)
+        if not match:
+            continue
+        raw_key, value = match.groups()
+        key = _netsh_key(raw_key)
+        if (key is None and _PERCENT_RE.search(value) and 'Mbps' not in value
+                and not _NETSH_USAGE_RE.search(raw_key)):
+            key = 'signal'
+
+        if key == 'ssid' and value:
+            info['ssid'] = value
+        elif key == 'bssid':
+            info['bssid'] = value
+        elif key == 'channel':
+            number = _NUMBER_RE.match(value)
+            if number:
+                info['channel'] = int(number.group(0))
+        elif key == 'signal':
+            percent = _PERCENT_RE.search(value)
+            if percent:
+                info['signal_percent'] = int(percent.group(1))
+                info['rssi_dbm'] = percent_to_dbm(info['signal_percent'])
+        elif key in ('rx_rate_mbps', 'tx_rate_mbps'):
+            number = _NUMBER_RE.match(value)
+            if number:
+                info[key] = float(number.group(0).replace(',', '.'))
+        elif key == 'radio_type':
+            info['radio_type'] = value
+        elif key == 'width':
+            width = parse_width(value)
+            if width:
+                info['width_mhz'] = width
+
+    if 'radio_type' in info or 'channel' in info:
+        band = band_from_channel(info['channel']) if 'channel' in info else None
+        if band is None:
+            radio = info.get('radio_type', '')
+            if '802.11a' in radio or '802.11ac' in radio or '802.11ax' in radio:
+                band = '5GHz'
+            elif '802.11' in radio:
+                band = '2.4GHz'
+            else:
+                band = 'Desconocida'
+        info['band'] = band
+    return info or None
+
+
+class NetshBackend(WiFiBackend):
+    """Windows (netsh wlan), salida en cp850 para consolas en español"""
+
+    name = 'netsh'
+
+    def _scan(self):
+        return parse_netsh_networks(_run(['netsh', 'wlan', 'show', 'networks', 'mode=bssid'], encoding='cp850'))
+
+    def _connected(self):
+        return parse_netsh_interfaces(_run(['netsh', 'wlan', 'show', 'interfaces'], encoding='cp850'))
+
+
+# ===== Linux: nmcli / iw / /proc/net/wireless =====
+
+_NMCLI_SPLIT_RE = re.compile(r'(?<!\\):')
+_NMCLI_FIELDS = ['IN-USE', 'BSSID', 'SSID', 'CHAN', 'FREQ', 'SIGNAL', 'SECURITY', 'RATE']
+_NMCLI_FIELDS_WIDTH = _NMCLI_FIELDS + ['BANDWIDTH']  # BANDWIDTH solo existe en NetworkManager >= 1.46
+_IW_LINK_RE = {
+    'bssid': re.compile(r'^Connected to ([0-9a-fA-F:]{17})', re.MULTILINE),
+    'ssid': re.compile(r'^\s*SSID:\s*(.+)$', re.MULTILINE),
+    'freq': re.compile(r'^\s*freq:\s*(\d+)', re.MULTILINE),
+    'rssi_dbm': re.compile(r'^\s*signal:\s*(-?\d+)\s*dBm', re.MULTILINE),
+    'rx_rate_mbps': re.compile(r'^\s*rx bitrate:\s*([\d.]+)\s*MBit/s', re.MULTILINE),
+    'tx_rate_mbps': re.compile(r'^\s*tx bitrate:\s*([\d.]+)\s*MBit/s', re.MULTILINE),
+}
+# 'iw dev <iface> info' (y algunas versiones de 'link'): "channel 36 (5180 MHz), width: 80 MHz, center1: 5210 MHz"
+_IW_WIDTH_RE = re.compile(r'\bwidth:\s*(\d+)\s*MHz')
+_IW_CENTER_RE = re.compile(r'\bcenter1:\s*(\d+)\s*MHz')
+# Sin esas líneas, el bitrate indica el ancho ("VHT-MCS 9 80MHz", "MCS 7 40MHz"); sin indicación es 20 MHz
+# (HT20 y tasas legacy 802.11a/g)
+_IW_BITRATE_WIDTH_RE = re.compile(r'^\s*[rt]x bitrate:.*?\b(40|80|160)MHz', re.MULTILINE)
+_IW_BITRATE_RE = re.compile(r'^\s*[rt]x bitrate:', re.MULTILINE)
+_PROC_WIRELESS_RE = re.compile(r'^\s*(\w+):\s+\w+\s+([-\d.]+)\.?\s+([-\d.]+)\.?', re.MULTILINE)
+
+
+def nmcli_signal_to_dbm(signal_percent):
+    """NetworkManager calcula el % como 2 * (dBm + 100), acotado a 0-100"""
+    return int(signal_percent / 2 - 100)
+
+
+def parse_nmcli_wifi_list(output, fields=_NMCLI_FIELDS):
+    """Parsea 'nmcli -t -f IN-USE,BSSID,SSID,CHAN,FREQ,SIGNAL,SECURITY,RATE[,BANDWIDTH] dev wifi list'"""
+    networks = []
+    for line in output.splitlines():
+        if not line.strip():
+            continue
+        values = [v.replace('\\:', ':') for v in _NMCLI_SPLIT_RE.split(line)]
+        if len(values) != len(fields):
+            continue
+        row = dict(zip(fields, values))
+        net = {'ssid': row['SSID'] or 'Oculta', 'bssid': row['BSSID'].lower(), 'in_use': row['IN-USE'] == '*'}
+        channel = _NUMBER_RE.match(row['CHAN'])
+        if channel:
+            net['channel'] = int(channel.group(0))
+        elif _NUMBER_RE.match(row['FREQ']):
+            net['channel'] = channel_from_freq(_NUMBER_RE.match(row['FREQ']).group(0))
+        if 'channel' in net and net['channel']:
+            band = band_from_channel(net['channel'])
+            if band:
+                net['band'] = band
+        signal = _NUMBER_RE.match(row['SIGNAL'])
+        if signal:
+            net['signal_percent'] = int(signal.group(0))
+            net['rssi_dbm'] = nmcli_signal_to_dbm(net['signal_percent'])
+        net['auth'] = row['SECURITY'] or 'Abierta'
+        rate = _NUMBER_RE.match(row['RATE'])
+        if rate:
+            net['rate_mbps'] = float(rate.group(0))
+        width = parse_width(row.get('BANDWIDTH'))
+        if width:
+            net['width_mhz'] = width
+        networks.append(net)
+    return networks
+
+
+def parse_iw_channel(output):
+    """Ancho y canal central de 'iw dev <iface> info' o 'link': {'width_mhz', 'center_channel'} (vacío si no hay)"""
+    info = {}
+    width = _IW_WIDTH_RE.search(output)
+    if width:
+        info['width_mhz'] = int(width.group(1))
+        center = _IW_CENTER_RE.search(output)
+        if center and channel_from_freq(center.group(1)):
+            info['center_channel'] = channel_from_freq(center.group(1))
+    else:
+        bitrate = _IW_BITRATE_WIDTH_RE.search(output)
+        if bitrate:
+            info['width_mhz'] = int(bitrate.group(1))
+        elif _IW_BITRATE_RE.search(output):
+            info['width_mhz'] = 20
+    return info
+
+
+def parse_iw_link(output):
+    """Parsea 'iw dev <iface> link'"""
+    if 'Not connected' in output:
+        return None
+    info = {}
+    for key, regex in _IW_LINK_RE.items():
+        match = regex.search(output)
+        if match:
+            info[key] = match.group(1).strip()
+    if not info:
+        return None
+    if 'bssid' in info:
+        info['bssid'] = info['bssid'].lower()
+    if 'freq' in info:
+        channel = channel_from_freq(info.pop('freq'))
+        if channel:
+            info['channel'] = channel
+            info['band'] = band_from_channel(channel)
+    if 'rssi_dbm' in info:
+        info['rssi_dbm'] = int(info['rssi_dbm'])
+        # Misma escala que netsh para que los umbrales y gráficos sean comparables
+        info['signal_percent'] = max(0, min(100, int(round((info['rssi_dbm'] + 90) / 0.6))))
+    for key in ('rx_rate_mbps', 'tx_rate_mbps'):
+        if key in info:
+            info[key] = float(info[key])
+    info.update(parse_iw_channel(output))
+    return info
+
+
+def parse_proc_net_wireless(output):
+    """Parsea /proc/net/wireless: {interfaz: {'link_quality': q, 'rssi_dbm': nivel}}"""
+    result = {}
+    for match in _PROC_WIRELESS_RE.finditer(output):
+        iface, quality, level = match.groups()
+        result[iface] = {'link_quality': float(quality), 'rssi_dbm': int(float(level))}
+    return result
+
+
+class LinuxBackend(WiFiBackend):
+    """Linux: escaneo con nmcli, enlace con iw (o nmcli + /proc/net/wireless)"""
+
+    name = 'linux'
+
+    def __init__(self, interface=None, **kwargs):
+        super().__init__(**kwargs)
+        self.interface = interface
+        self.has_nmcli = shutil.which('nmcli') is not None
+        self.has_iw = shutil.which('iw') is not None
+        self.nmcli_fields = _NMCLI_FIELDS_WIDTH
+
+    def _wireless_interfaces(self):
+        try:
+            with open('/proc/net/wireless') as f:
+                return list(parse_proc_net_wireless(f.read()))
+        except OSError:
+            return []
+
+    def _iface(self):
+        if self.interface is None:
+            interfaces = self._wireless_interfaces()
+            self.interface = interfaces[0] if interfaces else None
+        return self.interface
+
+    def _scan(self):
+        if not self.has_nmcli:
+            raise RuntimeError("nmcli no disponible (instalar NetworkManager)")
+        try:
+            output = _run(['nmcli', '-t', '-f', ','.join(self.nmcli_fields), 'dev', 'wifi', 'list', '--rescan', 'auto'])
+        except RuntimeError as e:
+            # NetworkManager anterior a 1.46 rechaza el campo BANDWIDTH: escanear sin el ancho (se asume 20 MHz).
+            # Otros errores (radio apagada, permisos, timeout) son transitorios y no deben perder el ancho
+            if self.nmcli_fields == _NMCLI_FIELDS or 'BANDWIDTH' not in str(e):
+                raise
+            self.nmcli_fields = _NMCLI_FIELDS
+            return self._scan()
+        return parse_nmcli_wifi_list(output, self.nmcli_fields)
+
+    def _connected(self):
+        iface = self._iface()
+        if self.has_iw and iface:
+            info = parse_iw_link(_run(['iw', 'dev', iface, 'link']))
+            if info:
+                if 'center_channel' not in info:
+                    try:
+                        info.update(parse_iw_channel(_run(['iw', 'dev', iface, 'info'])))
+                    except RuntimeError:
+                        pass
+                return info
+        if not self.has_nmcli:
+            return None
+        # Sin iw: red en uso según nmcli (de la cache de escaneo) + nivel real del kernel
+        in_use = [n for n in self.scan_networks() if n.get('in_use')]
+        if not in_use:
+            return None
+        info = dict(in_use[0])
+        try:
+            with open('/proc/net/wireless') as f:
+                levels = parse_proc_net_wireless(f.read())
+            if iface in levels:
+                info['rssi_dbm'] = levels[iface]['rssi_dbm']
+        except OSError:
+            pass
+        return info
+
+
+def get_backend(**kwargs):
+    """Backend adecuado para el sistema operativo actual"""
+    system = platform.system()
+    if system == 'Windows':
+        return NetshBackend(**kwargs)
+    if system == 'Linux':
+        return LinuxBackend(**kwargs)
+    raise RuntimeError(f"Sistema no soportado para análisis WiFi: {system}")